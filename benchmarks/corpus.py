@@ -0,0 +1,178 @@
+# benchmarks/corpus.py
+
+import argparse
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+# Gerador de um acervo sintético de fotos para os benchmarks: arquivos JPEG e
+# TIFF pequenos, com datas EXIF válidas (CreateDate, frações de segundo e fuso)
+# e nomes nos padrões encontrados na prática (câmeras e fotógrafos).
+
+FORMATS = ("jpeg", "tiff", "mixed")
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# Tags gravadas (mesmos códigos lidos pelo exif_reader).
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_MODIFY_DATE = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_CREATE_DATE = 0x9004
+TAG_OFFSET_TIME_DIGITIZED = 0x9012
+TAG_SUBSEC_TIME_DIGITIZED = 0x9292
+TIFF_TYPE_ASCII = 2
+TIFF_TYPE_LONG = 4
+
+# Nomes de fotógrafos, incluindo casos que parse_photographer_name rejeita
+# (curto demais) e que sanitize_for_filename precisa limpar (acentos, espaços).
+PHOTOGRAPHERS = ["Ana", "João Silva", "Maria_Clara", "Pedro Álvares", "Lu", "Zé"]
+CAMERA_PREFIXES = ["IMG", "DSC", "DSCF", "PXL"]
+CAMERAS = [("Canon", "EOS R6"), ("NIKON CORPORATION", "NIKON Z 6"), ("FUJIFILM", "X-T4"), ("Google", "Pixel 7")]
+BURST_PROBABILITY = 0.2
+# Segmento de comentário do JPEG, usado para simular os dados da imagem.
+JPEG_COM = 0xFFFE
+MAX_SEGMENT_DATA = 65533
+
+
+class SyntheticPhoto(NamedTuple):
+    """Uma foto gerada e os valores gravados no seu EXIF."""
+    name: str
+    create_date: str
+    subsec: str
+    offset: str
+
+
+def build_tiff(ifd0: Dict[int, str], exif_ifd: Dict[int, str]) -> bytes:
+    """
+    Monta uma estrutura TIFF little-endian com o IFD0 e o ExifIFD contendo as
+    tags ASCII indicadas (código -> texto).
+    """
+    ifd0_items = sorted(ifd0.items()) + [(TAG_EXIF_IFD, None)]
+    exif_items = sorted(exif_ifd.items())
+    ifd0_offset = 8
+    exif_offset = ifd0_offset + 2 + 12 * len(ifd0_items) + 4
+    data_offset = exif_offset + 2 + 12 * len(exif_items) + 4
+    data = bytearray()
+
+    def entries(items) -> bytes:
+        out = bytearray(struct.pack("<H", len(items)))
+        for tag, text in items:
+            if text is None:
+                out += struct.pack("<HHII", tag, TIFF_TYPE_LONG, 1, exif_offset)
+                continue
+            raw = text.encode("ascii") + b"\0"
+            if len(raw) <= 4:
+                out += struct.pack("<HHI", tag, TIFF_TYPE_ASCII, len(raw)) + raw.ljust(4, b"\0")
+            else:
+                out += struct.pack("<HHII", tag, TIFF_TYPE_ASCII, len(raw), data_offset + len(data))
+                data.extend(raw)
+        return bytes(out + b"\0\0\0\0")
+
+    header = b"II*\0" + struct.pack("<I", ifd0_offset)
+    body = entries(ifd0_items) + entries(exif_items)
+    return header + body + bytes(data)
+
+
+def build_jpeg(tiff: bytes, payload_size: int) -> bytes:
+    """
+    Monta um JPEG com o bloco EXIF (APP1) e 'payload_size' bytes de
+    preenchimento em segmentos de comentário.
+    """
+    app1 = b"Exif\0\0" + tiff
+    parts = [b"\xff\xd8", b"\xff\xe1", struct.pack(">H", len(app1) + 2), app1]
+    remaining = payload_size
+    while remaining > 0:
+        size = min(remaining, MAX_SEGMENT_DATA)
+        parts += [struct.pack(">HH", JPEG_COM, size + 2), b"\0" * size]
+        remaining -= size
+    parts.append(b"\xff\xd9")
+    return b"".join(parts)
+
+
+def _file_name(rng: random.Random, index: int, width: int, extension: str) -> str:
+    roll = rng.random()
+    if roll < 0.45:
+        # Câmera: IMG_0001.JPG (o prefixo de 3 letras é aceito como "nome")
+        return f"{rng.choice(CAMERA_PREFIXES)}_{index:0{width}d}{extension.upper()}"
+    if roll < 0.85:
+        # Fotógrafo: "João Silva_0001.jpg"
+        return f"{rng.choice(PHOTOGRAPHERS)}_{index:0{width}d}{extension}"
+    if roll < 0.95:
+        # Data no nome: começa com dígito e é rejeitado como fotógrafo
+        return f"20240501_{index:0{width}d}{extension}"
+    # Sem underscore: DSC01234.JPG
+    return f"DSC{index:0{width}d}{extension.upper()}"
+
+
+def generate(directory: str, count: int, file_format: str = "mixed", seed: int = 0,
+             payload_size: int = 2048) -> List[SyntheticPhoto]:
+    """
+    Grava 'count' fotos sintéticas em 'directory'. O resultado é determinístico
+    para a mesma semente.
+
+    As datas avançam de alguns segundos a alguns minutos entre as fotos, com
+    rajadas (várias fotos no mesmo segundo, distinguidas pela fração de
+    segundo). Os nomes não seguem a ordem de captura.
+
+    Args:
+        directory: Pasta de destino (criada se não existir).
+        count: Número de fotos.
+        file_format: "jpeg", "tiff" ou "mixed" (80% JPEG).
+        seed: Semente do gerador aleatório.
+        payload_size: Bytes de preenchimento de cada arquivo, além do EXIF.
+
+    Returns:
+        As fotos geradas, na ordem de captura.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Formato desconhecido: '{file_format}'. Use um de: {', '.join(FORMATS)}.")
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    width = max(4, len(str(count)))
+    indices = list(range(count))
+    rng.shuffle(indices)
+
+    photos = []
+    moment = datetime(2024, 5, 1, 8, 0, 0)
+    subsec_ms = 0
+    for index in indices:
+        if rng.random() < BURST_PROBABILITY and subsec_ms < 900:
+            subsec_ms += rng.randint(20, 100)
+        else:
+            moment += timedelta(seconds=rng.randint(1, 180))
+            subsec_ms = rng.randint(0, 899)
+        is_jpeg = file_format == "jpeg" or (file_format == "mixed" and rng.random() < 0.8)
+        extension = ".jpg" if is_jpeg else ".tif"
+        create_date = moment.strftime(EXIF_DATE_FORMAT)
+        photo = SyntheticPhoto(_file_name(rng, index, width, extension), create_date, f"{subsec_ms:03d}", "-03:00")
+
+        make, model = rng.choice(CAMERAS)
+        tiff = build_tiff(
+            {TAG_MAKE: make, TAG_MODEL: model, TAG_MODIFY_DATE: create_date},
+            {TAG_DATE_TIME_ORIGINAL: create_date, TAG_CREATE_DATE: create_date,
+             TAG_SUBSEC_TIME_DIGITIZED: photo.subsec, TAG_OFFSET_TIME_DIGITIZED: photo.offset},
+        )
+        content = build_jpeg(tiff, payload_size) if is_jpeg else tiff + b"\0" * payload_size
+        with open(os.path.join(directory, photo.name), "wb") as fh:
+            fh.write(content)
+        photos.append(photo)
+    return photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um acervo sintético de fotos com datas EXIF.")
+    parser.add_argument("directory", help="Pasta de destino.")
+    parser.add_argument("--count", type=int, default=1000, help="Número de fotos (padrão: 1000).")
+    parser.add_argument("--format", choices=FORMATS, default="mixed", help="Formato dos arquivos (padrão: mixed).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador aleatório.")
+    parser.add_argument("--payload-size", type=int, default=2048, help="Bytes de preenchimento por arquivo.")
+    args = parser.parse_args()
+    photos = generate(args.directory, args.count, args.format, args.seed, args.payload_size)
+    print(f"{len(photos)} fotos geradas em {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+# benchmarks/fake_drive.py
+
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import exif_reader
+
+# Servidor HTTP local que imita o subconjunto da API do Google Drive v3 usado
+# pelo OLAF (files.list, files.get, get_media com Range, files.update, lote e
+# changes), servindo os arquivos de uma pasta local. Permite injetar latência,
+# erros de limite de taxa e limite de banda, para testar o modo Drive sem rede.
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".tif": "image/tiff", ".tiff": "image/tiff",
+              ".png": "image/png", ".heic": "image/heic"}
+DEFAULT_MIME_TYPE = "application/octet-stream"
+# Prefixo que o cliente usa quando o endpoint aponta para o domínio do Google.
+API_PREFIX = "/drive/v3"
+BATCH_PATH = "/batch/drive/v3"
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class Response(NamedTuple):
+    """Resposta HTTP montada pelo FakeDrive."""
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def json_response(payload, status: int = 200) -> Response:
+    return Response(status, {"Content-Type": "application/json; charset=UTF-8"}, json.dumps(payload).encode())
+
+
+def error_response(status: int, reason: str, message: str) -> Response:
+    return json_response({"error": {"code": status, "message": message,
+                                    "errors": [{"domain": "usageLimits", "reason": reason, "message": message}]}},
+                         status)
+
+
+class TokenBucket:
+    """
+    Balde de fichas compartilhado entre as threads do servidor, usado tanto
+    para o limite de banda (fichas = bytes) quanto para a cota de requisições.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float = 1.0) -> bool:
+        """Consome as fichas se houver saldo; não espera."""
+        with self.lock:
+            self._refill()
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def take(self, amount: float):
+        """Consome as fichas, esperando o tempo necessário para acumulá-las."""
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            deficit = -self.tokens
+        if deficit > 0:
+            time.sleep(deficit / self.rate)
+
+
+class FaultConfig(NamedTuple):
+    """Condições simuladas pelo servidor."""
+    latency: float = 0.0         # segundos adicionados a cada requisição HTTP
+    jitter: float = 0.0          # variação aleatória máxima da latência, em segundos
+    error_rate: float = 0.0      # probabilidade de responder 429 (rateLimitExceeded) a uma operação
+    quota_qps: float = 0.0       # operações por segundo acima das quais responde 403 (userRateLimitExceeded)
+    bandwidth: float = 0.0       # limite de banda dos downloads, em bytes por segundo (todas as conexões)
+    seed: Optional[int] = None
+
+
+class FakeDrive:
+    """
+    Estado do Drive simulado: a árvore de pastas e arquivos lida do disco,
+    os nomes atuais (alterados por files.update) e o histórico de mudanças.
+    """
+
+    def __init__(self, root_dir: str, folder_id: str = "root", faults: FaultConfig = FaultConfig(),
+                 page_limit: int = MAX_PAGE_SIZE):
+        """
+        Args:
+            root_dir: Pasta local servida. Subpastas viram pastas do Drive.
+            folder_id: ID da pasta raiz.
+            faults: Latência, erros e limites simulados.
+            page_limit: Tamanho máximo das páginas de files.list (valores
+                        menores forçam mais paginação).
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.folder_id = folder_id
+        self.faults = faults
+        self.page_limit = page_limit
+        self.random = random.Random(faults.seed)
+        self.quota = TokenBucket(faults.quota_qps) if faults.quota_qps else None
+        self.bandwidth = TokenBucket(faults.bandwidth) if faults.bandwidth else None
+        self.lock = threading.Lock()
+        self.items: Dict[str, dict] = {}
+        self.paths: Dict[str, str] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.changes: List[str] = []
+        self.stats: Counter = Counter()
+        self._known_paths: Dict[str, str] = {}
+        self.rescan()
+
+    # --- Árvore de arquivos ---
+
+    def rescan(self) -> int:
+        """
+        Lê a pasta servida e adiciona os arquivos e pastas novos, registrando-os
+        no histórico de mudanças.
+
+        Returns:
+            O número de itens adicionados.
+        """
+        added = 0
+        with self.lock:
+            self._known_paths.setdefault(self.root_dir, self.folder_id)
+            self.children.setdefault(self.folder_id, [])
+            for directory, subdirs, files in os.walk(self.root_dir):
+                subdirs.sort()
+                parent_id = self._known_paths[directory]
+                for name in subdirs + sorted(files):
+                    path = os.path.join(directory, name)
+                    if path in self._known_paths:
+                        continue
+                    is_folder = os.path.isdir(path)
+                    item_id = f"{'folder' if is_folder else 'file'}{len(self._known_paths):07d}"
+                    self._known_paths[path] = item_id
+                    stat = os.stat(path)
+                    item = {
+                        "id": item_id,
+                        "name": name,
+                        "mimeType": FOLDER_MIME_TYPE if is_folder else
+                        MIME_TYPES.get(os.path.splitext(name)[1].lower(), DEFAULT_MIME_TYPE),
+                        "parents": [parent_id],
+                        "trashed": False,
+                        "modifiedTime": datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                        .isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+                    }
+                    if is_folder:
+                        self.children.setdefault(item_id, [])
+                    else:
+                        item["size"] = str(stat.st_size)
+                    self.items[item_id] = item
+                    self.paths[item_id] = path
+                    self.children[parent_id].append(item_id)
+                    self.changes.append(item_id)
+                    added += 1
+        return added
+
+    def _file_resource(self, item_id: str, fields: str) -> dict:
+        item = dict(self.items[item_id])
+        path = self.paths[item_id]
+        if item["mimeType"] != FOLDER_MIME_TYPE:
+            if "md5Checksum" in fields:
+                item["md5Checksum"] = self._cached(item_id, "md5Checksum", lambda: _md5(path))
+            if "imageMediaMetadata" in fields:
+                capture_time = self._cached(item_id, "captureTime", lambda: _capture_time(path))
+                if capture_time:
+                    item["imageMediaMetadata"] = {"time": capture_time}
+        return item
+
+    def _cached(self, item_id: str, key: str, compute):
+        item = self.items[item_id]
+        if key not in item.setdefault("_cache", {}):
+            item["_cache"][key] = compute()
+        return item["_cache"][key]
+
+    # --- Operações da API ---
+
+    def handle(self, method: str, url: str, headers, body: bytes) -> Response:
+        """
+        Responde a uma requisição (inclusive às partes de um lote).
+        """
+        parts = urlsplit(url)
+        path = parts.path
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+
+        if path == BATCH_PATH and method == "POST":
+            return self.batch(headers.get("Content-Type", ""), body)
+        if path.startswith("/admin/"):
+            return self.admin(method, path)
+
+        operation = self._operation(method, path, query)
+        if operation is None:
+            return error_response(404, "notFound", f"Rota não simulada: {method} {path}")
+        self.stats[operation] += 1
+        injected = self._inject_error()
+        if injected is not None:
+            self.stats[f"{operation}_errors"] += 1
+            return injected
+
+        match = re.fullmatch(r"/files/([^/]+)", path)
+        if operation == "files.list":
+            return self.list_files(query)
+        if operation == "files.get_media":
+            return self.media(match.group(1), headers.get("Range"))
+        if operation == "files.get":
+            return self.get_file(match.group(1), query.get("fields", ""))
+        if operation == "files.update":
+            return self.update(match.group(1), body, query.get("fields", ""))
+        if operation == "changes.getStartPageToken":
+            return json_response({"kind": "drive#startPageToken", "startPageToken": str(len(self.changes) + 1)})
+        return self.list_changes(query)
+
+    @staticmethod
+    def _operation(method: str, path: str, query: Dict[str, str]) -> Optional[str]:
+        if path == "/files" and method == "GET":
+            return "files.list"
+        if re.fullmatch(r"/files/[^/]+", path):
+            if method == "GET":
+                return "files.get_media" if query.get("alt") == "media" else "files.get"
+            if method == "PATCH":
+                return "files.update"
+        if path == "/changes/startPageToken" and method == "GET":
+            return "changes.getStartPageToken"
+        if path == "/changes" and method == "GET":
+            return "changes.list"
+        return None
+
+    def _inject_error(self) -> Optional[Response]:
+        if self.quota is not None and not self.quota.try_take():
+            return error_response(403, "userRateLimitExceeded", "User rate limit exceeded.")
+        if self.faults.error_rate and self.random.random() < self.faults.error_rate:
+            return error_response(429, "rateLimitExceeded", "Rate limit exceeded.")
+        return None
+
+    def list_files(self, query: Dict[str, str]) -> Response:
+        q = query.get("q", "")
+        parent = re.search(r"'([^']+)' in parents", q)
+        mime_equal = re.search(r"mimeType\s*=\s*'([^']+)'", q)
+        mime_different = re.search(r"mimeType\s*!=\s*'([^']+)'", q)
+        with self.lock:
+            candidates = self.children.get(parent.group(1), []) if parent else list(self.items)
+            matches = [
+                item_id for item_id in candidates
+                if not self.items[item_id]["trashed"]
+                and (not mime_equal or self.items[item_id]["mimeType"] == mime_equal.group(1))
+                and (not mime_different or self.items[item_id]["mimeType"] != mime_different.group(1))
+            ]
+        page_size = min(int(query.get("pageSize", 100)), self.page_limit)
+        offset = int(query.get("pageToken") or 0)
+        fields = query.get("fields", "")
+        result = {"files": [self._file_resource(item_id, fields) for item_id in matches[offset:offset + page_size]]}
+        if offset + page_size < len(matches):
+            result["nextPageToken"] = str(offset + page_size)
+        return json_response(_strip_private(result))
+
+    def get_file(self, file_id: str, fields: str) -> Response:
+        if file_id not in self.items:
+            return error_response(404, "notFound", f"File not found: {file_id}.")
+        return json_response(_strip_private(self._file_resource(file_id, fields)))
+
+    def media(self, file_id: str, range_header: Optional[str]) -> Response:
+        if file_id not in self.paths or self.items[file_id]["mimeType"] == FOLDER_MIME_TYPE:
+            return error_response(404, "notFound", f"File not found: {file_id}.")
+        path = self.paths[file_id]
+        size = os.path.getsize(path)
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header or "")
+        with open(path, "rb") as fh:
+            if not match:
+                return Response(200, {"Content-Type": self.items[file_id]["mimeType"]}, fh.read())
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            if start >= size:
+                return Response(416, {"Content-Range": f"bytes */{size}"}, b"")
+            fh.seek(start)
+            content = fh.read(end - start + 1)
+        return Response(206, {"Content-Type": self.items[file_id]["mimeType"],
+                              "Content-Range": f"bytes {start}-{end}/{size}"}, content)
+
+    def update(self, file_id: str, body: bytes, fields: str) -> Response:
+        if file_id not in self.items:
+            return error_response(404, "notFound", f"File not found: {file_id}.")
+        changes = json.loads(body or b"{}")
+        with self.lock:
+            if "name" in changes:
+                self.items[file_id]["name"] = changes["name"]
+            self.changes.append(file_id)
+        return json_response(_strip_private(self._file_resource(file_id, fields)))
+
+    def list_changes(self, query: Dict[str, str]) -> Response:
+        start = int(query.get("pageToken", 1)) - 1
+        page_size = min(int(query.get("pageSize", 100)), self.page_limit)
+        fields = query.get("fields", "")
+        with self.lock:
+            ids = self.changes[start:start + page_size]
+            end = start + len(ids)
+            total = len(self.changes)
+        result = {"changes": [{"kind": "drive#change", "changeType": "file", "fileId": item_id, "removed": False,
+                               "file": self._file_resource(item_id, fields)} for item_id in ids]}
+        if end < total:
+            result["nextPageToken"] = str(end + 1)
+        else:
+            result["newStartPageToken"] = str(total + 1)
+        return json_response(_strip_private(result))
+
+    def batch(self, content_type: str, body: bytes) -> Response:
+        """
+        Responde a uma requisição em lote (multipart/mixed), executando cada
+        parte separadamente; cada parte pode sofrer um erro injetado.
+        """
+        self.stats["batch"] += 1
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        output = []
+        for part in message.iter_parts():
+            content_id = part.get("Content-ID", "").strip("<>")
+            raw = part.get_payload(decode=True) or part.get_payload().encode()
+            head, _, inner_body = raw.replace(b"\r\n", b"\n").partition(b"\n\n")
+            request_line, *header_lines = head.decode().split("\n")
+            method, url = request_line.split(" ")[:2]
+            inner_headers = dict(line.split(": ", 1) for line in header_lines if ": " in line)
+            response = self.handle(method, url, inner_headers, inner_body.strip())
+            output.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {response.status} {_reason(response.status)}\r\n"
+                + "".join(f"{key}: {value}\r\n" for key, value in response.headers.items())
+                + f"\r\n{response.body.decode()}\r\n"
+            )
+        output.append(f"--{boundary}--\r\n")
+        return Response(200, {"Content-Type": f"multipart/mixed; boundary={boundary}"}, "".join(output).encode())
+
+    def admin(self, method: str, path: str) -> Response:
+        """
+        Rotas auxiliares: GET /admin/stats (contadores) e POST /admin/rescan
+        (publica os arquivos adicionados à pasta depois do início).
+        """
+        if path == "/admin/stats" and method == "GET":
+            return json_response(dict(self.stats))
+        if path == "/admin/rescan" and method == "POST":
+            return json_response({"added": self.rescan()})
+        return error_response(404, "notFound", f"Rota não simulada: {method} {path}")
+
+
+def _md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _capture_time(path: str) -> Optional[str]:
+    record = exif_reader.read_exif_file(path) or {}
+    return record.get("DateTimeOriginal") or record.get("CreateDate")
+
+
+def _strip_private(value):
+    # Remove os campos internos (ex: "_cache") das respostas
+    if isinstance(value, dict):
+        return {key: _strip_private(item) for key, item in value.items() if not key.startswith("_")}
+    if isinstance(value, list):
+        return [_strip_private(item) for item in value]
+    return value
+
+
+def _reason(status: int) -> str:
+    return BaseHTTPRequestHandler.responses.get(status, ("",))[0]
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 mantém as conexões abertas, como a API real
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug(f"fake_drive: {format % args}")
+
+    def _dispatch(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        drive: FakeDrive = self.server.drive
+        faults = drive.faults
+        if faults.latency or faults.jitter:
+            time.sleep(faults.latency + drive.random.uniform(0, faults.jitter))
+        response = drive.handle(method, self.path, self.headers, body)
+
+        self.send_response(response.status)
+        for key, value in response.headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        if method == "HEAD":
+            return
+        for start in range(0, len(response.body), STREAM_CHUNK_SIZE):
+            chunk = response.body[start:start + STREAM_CHUNK_SIZE]
+            if drive.bandwidth is not None:
+                drive.bandwidth.take(len(chunk))
+            self.wfile.write(chunk)
+        drive.stats["bytes_sent"] += len(response.body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+
+class FakeDriveServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP do Drive simulado. O endpoint a informar ao
+    GoogleDriveClient (api_endpoint ou GDRIVE_API_ENDPOINT) é 'url'.
+    """
+    daemon_threads = True
+
+    def __init__(self, drive: FakeDrive, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), FakeDriveHandler)
+        self.drive = drive
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start_background(self) -> threading.Thread:
+        """
+        Atende as requisições em uma thread em segundo plano; encerre com shutdown().
+        """
+        thread = threading.Thread(target=self.serve_forever, name="fake-drive", daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que simula a API do Google Drive para o OLAF.")
+    parser.add_argument("directory", help="Pasta servida como a pasta raiz do Drive.")
+    parser.add_argument("--folder-id", default="root", help="ID da pasta raiz (padrão: root).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência de cada requisição.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variação aleatória máxima da latência.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração das operações respondidas com 429.")
+    parser.add_argument("--quota-qps", type=float, default=0.0,
+                        help="Operações por segundo acima das quais o servidor responde 403 (0: sem cota).")
+    parser.add_argument("--bandwidth-kbps", type=float, default=0.0,
+                        help="Limite de banda dos downloads em KiB/s, somando todas as conexões (0: sem limite).")
+    parser.add_argument("--page-limit", type=int, default=MAX_PAGE_SIZE, help="Tamanho máximo das páginas de listagem.")
+    parser.add_argument("--seed", type=int, help="Semente dos erros e da latência aleatórios.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    faults = FaultConfig(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+        quota_qps=args.quota_qps, bandwidth=args.bandwidth_kbps * 1024, seed=args.seed,
+    )
+    drive = FakeDrive(args.directory, args.folder_id, faults, args.page_limit)
+    server = FakeDriveServer(drive, args.host, args.port)
+    logging.info(f"Drive simulado com {len(drive.items)} itens em {server.url} (pasta raiz: {args.folder_id}).")
+    logging.info(f"Use GDRIVE_API_ENDPOINT={server.url} e --folder-id {args.folder_id}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Estatísticas: {json.dumps(dict(drive.stats))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# benchmarks/run.py
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+from fake_drive import FakeDrive, FakeDriveServer, FaultConfig
+from exiftool_service import ExifToolPool
+from pipeline import PhotoEntry
+from processing_service import CAPTURE_OPTIONAL_TAGS, DATE_TAG
+from raw_service import ExifMetadataExtractor
+from rename_planner import plan_renames
+from sort_service import get_sort_backend, merge_sorted_runs
+from sources.local_source import LocalSource
+
+# Cenários e tamanhos de acervo medidos por padrão.
+SCENARIOS = ("discovery", "extraction", "sort", "rename", "drive")
+SIZES = (1000, 10000, 100000)
+# Versão do formato do arquivo de resultados.
+SCHEMA_VERSION = 1
+
+
+def measure(func: Callable[[], Any], repeat: int,
+            reset: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Executa 'func' 'repeat' vezes e retorna os tempos. 'reset', se informado,
+    roda entre as repetições, fora da medição (ex: desfazer renomeações).
+    """
+    runs = []
+    for attempt in range(repeat):
+        if attempt and reset is not None:
+            reset()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {"seconds_min": min(runs), "seconds_median": statistics.median(runs), "runs": runs}
+
+
+class BenchmarkRun:
+    """
+    Mede os cenários em acervos sintéticos e acumula os resultados.
+    """
+
+    def __init__(self, workdir: str, file_format: str, repeat: int, per_file_limit: int,
+                 exiftool: Optional[str], drive_faults: FaultConfig = FaultConfig(),
+                 drive_limit: int = 1000, drive_concurrency: int = 4):
+        self.workdir = workdir
+        self.file_format = file_format
+        self.repeat = repeat
+        self.per_file_limit = per_file_limit
+        self.exiftool = exiftool
+        self.drive_faults = drive_faults
+        self.drive_limit = drive_limit
+        self.drive_concurrency = drive_concurrency
+        self.results: List[Dict[str, Any]] = []
+        # Tamanho do acervo em medição (um cenário pode medir só uma amostra dele)
+        self.corpus_size = 0
+
+    def record(self, scenario: str, variant: str, files: int, timing: Optional[Dict[str, Any]],
+               note: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+        result = {"scenario": scenario, "variant": variant, "files": files,
+                  "corpus_size": self.corpus_size, "format": self.file_format, **(extra or {})}
+        if timing is None:
+            result["skipped"] = note
+            print(f"{scenario:<11} {variant:<18} {files:>7} arquivos  ignorado: {note}")
+        else:
+            result.update(timing)
+            result["files_per_second"] = files / timing["seconds_min"] if timing["seconds_min"] else None
+            print(f"{scenario:<11} {variant:<18} {files:>7} arquivos  {timing['seconds_min']:>9.3f}s "
+                  f"({result['files_per_second']:,.0f} arquivos/s)")
+        self.results.append(result)
+
+    def run_size(self, count: int, scenarios: List[str]):
+        self.corpus_size = count
+        directory = os.path.join(self.workdir, f"corpus_{count}")
+        photos = corpus.generate(directory, count, self.file_format)
+        paths = [os.path.join(directory, photo.name) for photo in photos]
+
+        if "discovery" in scenarios:
+            source = LocalSource(directory)
+            self.record("discovery", "local_scandir", count,
+                        measure(lambda: list(source.iter_files()), self.repeat))
+            # Mesma pasta pela busca recursiva, que lista as subpastas em paralelo
+            recursive_source = LocalSource(directory, recursive=True)
+            self.record("discovery", "local_recursive", count,
+                        measure(lambda: list(recursive_source.iter_files()), self.repeat))
+
+        if "extraction" in scenarios:
+            self.run_extraction(paths)
+
+        entries = [
+            PhotoEntry(date=photo.create_date, local_path=path, name=photo.name, remote_id=None,
+                       photographer=None, subsec=photo.subsec, offset=photo.offset, sequence=None)
+            for photo, path in zip(photos, paths)
+        ]
+        sorted_entries = get_sort_backend("native")(entries, "seconds")
+
+        if "sort" in scenarios:
+            for backend in ("native", "pandas"):
+                sort_photos = get_sort_backend(backend)
+                try:
+                    timing = measure(lambda: sort_photos(entries, "seconds"), self.repeat)
+                except ImportError as e:
+                    self.record("sort", backend, count, None, f"dependência ausente ({e.name})")
+                    continue
+                self.record("sort", backend, count, timing)
+            # Mesmas fotos divididas em três fontes, ordenadas separadamente e intercaladas
+            runs = [entries[index::3] for index in range(3)]
+            self.record("sort", "merge_runs", count, measure(lambda: merge_sorted_runs(runs, "seconds"), self.repeat))
+            self.record("sort", "plan_names", count, measure(lambda: plan_renames(sorted_entries), self.repeat))
+
+        if "rename" in scenarios:
+            plan = plan_renames(sorted_entries)
+
+            def restore():
+                for step in reversed(plan.local_renames):
+                    os.rename(step.target, step.source)
+
+            self.record("rename", "local_apply", len(plan.local_steps),
+                        measure(plan.apply_local, self.repeat, reset=restore))
+            # Os cenários seguintes (ex: drive) listam os nomes originais
+            restore()
+
+        if "drive" in scenarios:
+            self.run_drive(directory)
+
+        shutil.rmtree(directory)
+
+    def run_extraction(self, paths: List[str]):
+        def extract(batch, use_fast_reader, pool=None):
+            return ExifMetadataExtractor.extract_batch(
+                batch, tags=(DATE_TAG,), pool=pool, use_fast_reader=use_fast_reader,
+                optional_tags=CAPTURE_OPTIONAL_TAGS)
+
+        self.record("extraction", "fast_reader", len(paths),
+                    measure(lambda: extract(paths, True), self.repeat))
+        if self.exiftool is None:
+            for variant in ("exiftool_batched", "exiftool_per_file"):
+                self.record("extraction", variant, len(paths), None, "ExifTool não encontrado")
+            return
+
+        with ExifToolPool(size=1, executable=self.exiftool) as pool:
+            self.record("extraction", "exiftool_batched", len(paths),
+                        measure(lambda: extract(paths, False, pool), self.repeat))
+            # Um comando por arquivo é lento demais para os acervos grandes: mede uma amostra
+            sample = paths[:self.per_file_limit]
+            self.record("extraction", "exiftool_per_file", len(sample),
+                        measure(lambda: [extract([path], False, pool) for path in sample], self.repeat))
+
+
+    def run_drive(self, directory: str):
+        """
+        Mede o modo Drive contra o servidor simulado (fake_drive), com a
+        latência, os erros e o limite de banda configurados. Cada resultado
+        inclui as operações atendidas e os erros injetados, que mostram o
+        efeito das novas tentativas.
+        """
+        try:
+            from sources.drive_source import DriveSource
+        except ImportError as e:
+            self.record("drive", "listing", self.corpus_size, None, f"dependência ausente ({e.name})")
+            return
+
+        drive = FakeDrive(directory, "root", self.drive_faults)
+        server = FakeDriveServer(drive)
+        server.start_background()
+        sources = []
+
+        def open_source(**options):
+            source = DriveSource(None, "root", api_endpoint=server.url, concurrency=self.drive_concurrency, **options)
+            sources.append(source)
+            return source
+
+        def measure_drive(variant: str, files: int, func: Callable[[], Any]):
+            before = dict(drive.stats)
+            timing = measure(func, self.repeat)
+            counts = {key: value - before.get(key, 0) for key, value in drive.stats.items()}
+            server_stats = {
+                "requests": sum(value for key, value in counts.items() if key != "bytes_sent" and not key.endswith("_errors")),
+                "errors_injected": sum(value for key, value in counts.items() if key.endswith("_errors")),
+                "bytes_sent": counts.get("bytes_sent", 0),
+            }
+            self.record("drive", variant, files, timing, extra={"server": server_stats})
+
+        try:
+            source = open_source()
+            listed = list(source.iter_files())
+            measure_drive("listing", len(listed), lambda: list(source.iter_files()))
+            # Downloads e renomeações usam uma amostra do acervo
+            sample = listed[:self.drive_limit]
+
+            def fetch(fetching_source):
+                for file_ref in sample:
+                    file_ref.local_path = None
+                    file_ref.content = None
+                    file_ref.fetcher = fetching_source._download
+                list(fetching_source.fetch_all(sample))
+
+            measure_drive("fetch_full", len(sample), lambda: fetch(source))
+            header_source = open_source(header_only=True)
+            measure_drive("fetch_header", len(sample), lambda: fetch(header_source))
+            memory_source = open_source(in_memory=True)
+            measure_drive("fetch_memory", len(sample), lambda: fetch(memory_source))
+            renames = [(file_ref.remote_id, file_ref.name) for file_ref in sample]
+            measure_drive("rename_batch", len(sample), lambda: source.drive_client.rename_files(renames))
+        finally:
+            for opened in sources:
+                opened.cleanup()
+            server.shutdown()
+            server.server_close()
+
+
+def environment(exiftool: Optional[str]) -> Dict[str, Any]:
+    """
+    Descreve a versão do OLAF e o ambiente em que os benchmarks rodaram.
+    """
+    def command_output(*command: str) -> Optional[str]:
+        try:
+            return subprocess.run(command, capture_output=True, text=True, check=True, cwd=ROOT).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": command_output("git", "rev-parse", "--short", "HEAD"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "exiftool": command_output(exiftool, "-ver") if exiftool else None,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> int:
+    """
+    Compara os resultados com os de um arquivo anterior e imprime a razão
+    entre os tempos de cada medição presente nos dois.
+
+    Returns:
+        O número de regressões (medições mais lentas que o limite).
+    """
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+
+    def key(result):
+        return result["scenario"], result["variant"], result["corpus_size"], result["format"]
+
+    previous = {key(result): result for result in baseline["results"] if "seconds_min" in result}
+    regressions = 0
+    print(f"\nComparação com {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    for result in results:
+        before = previous.get(key(result))
+        if before is None or "seconds_min" not in result:
+            continue
+        ratio = result["seconds_min"] / before["seconds_min"] if before["seconds_min"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions += 1
+            flag = "  <-- regressão"
+        print(f"{result['scenario']:<11} {result['variant']:<18} {result['corpus_size']:>7}  "
+              f"{before['seconds_min']:>9.3f}s -> {result['seconds_min']:>9.3f}s  ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do OLAF em acervos sintéticos.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="Tamanhos dos acervos (padrão: 1000 10000 100000).")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Cenários medidos (padrão: todos).")
+    parser.add_argument("--format", choices=corpus.FORMATS, default="mixed", help="Formato das fotos geradas.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições de cada medição (vale o menor tempo).")
+    parser.add_argument("--per-file-limit", type=int, default=1000,
+                        help="Máximo de arquivos no cenário de um comando do ExifTool por arquivo.")
+    parser.add_argument("--exiftool", default="exiftool", help="Executável do ExifTool.")
+    parser.add_argument("--drive-limit", type=int, default=1000,
+                        help="Máximo de arquivos baixados e renomeados no cenário do Drive (padrão: 1000).")
+    parser.add_argument("--drive-concurrency", type=int, default=4, help="Downloads simultâneos no cenário do Drive.")
+    parser.add_argument("--drive-latency-ms", type=float, default=20.0,
+                        help="Latência simulada de cada requisição ao Drive (padrão: 20).")
+    parser.add_argument("--drive-error-rate", type=float, default=0.01,
+                        help="Fração das operações do Drive respondidas com 429 (padrão: 0.01).")
+    parser.add_argument("--drive-quota-qps", type=float, default=0.0,
+                        help="Cota de operações por segundo do Drive simulado (0: sem cota).")
+    parser.add_argument("--drive-bandwidth-kbps", type=float, default=0.0,
+                        help="Limite de banda do Drive simulado em KiB/s (0: sem limite).")
+    parser.add_argument("--workdir", help="Pasta onde os acervos são gerados (padrão: pasta temporária).")
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: benchmarks/results/<data>.json).")
+    parser.add_argument("--compare", metavar="ARQUIVO", help="Resultados anteriores para comparação.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Aumento relativo de tempo considerado regressão (padrão: 0.10).")
+    args = parser.parse_args()
+
+    # Os logs de cada renomeação e de cada nova tentativa distorceriam as medições
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s: %(message)s')
+    exiftool = shutil.which(args.exiftool)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="olaf_bench_")
+    drive_faults = FaultConfig(
+        latency=args.drive_latency_ms / 1000, error_rate=args.drive_error_rate,
+        quota_qps=args.drive_quota_qps, bandwidth=args.drive_bandwidth_kbps * 1024, seed=0,
+    )
+    benchmark = BenchmarkRun(workdir, args.format, args.repeat, args.per_file_limit, exiftool,
+                             drive_faults, args.drive_limit, args.drive_concurrency)
+    try:
+        for count in args.sizes:
+            benchmark.run_size(count, args.scenarios)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(exiftool),
+        "results": benchmark.results,
+    }
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em: {output}")
+
+    if args.compare and compare(benchmark.results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# src/capture_groups.py
+
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sources.base_source import FileReference, PHOTO_EXTENSIONS, SIDECAR_EXTENSIONS
+
+# Extensões preferidas para a extração: o leitor EXIF só precisa do
+# cabeçalho do arquivo, e no Drive o JPEG costuma ser o menor download.
+JPEG_EXTENSIONS = frozenset({".jpg", ".jpeg", ".jpe"})
+# Número de arquivos descobertos durante os quais um grupo sem JPEG espera
+# que um apareça, antes de extrair do seu membro mais barato. As fontes
+# listam cada pasta em blocos (no máximo 1000 arquivos por página no Drive),
+# então os membros de uma captura quase sempre chegam dentro dessa janela.
+GROUP_WINDOW = 1000
+
+
+def split_extension(name: str) -> Tuple[str, str]:
+    """
+    Separa o nome base e a extensão, mantendo junto o sidecar de um arquivo
+    específico (ex: "DSC_0001.NEF.xmp" -> ("DSC_0001", ".NEF.xmp")).
+    """
+    stem, extension = os.path.splitext(name)
+    if extension.lower() in SIDECAR_EXTENSIONS:
+        inner_stem, inner_extension = os.path.splitext(stem)
+        if inner_extension.lower() in PHOTO_EXTENSIONS:
+            return inner_stem, inner_extension + extension
+    return stem, extension
+
+
+def is_sidecar(name: str) -> bool:
+    """Indica se o arquivo é um sidecar (.xmp, .aae), do qual nunca se extrai a data."""
+    return os.path.splitext(name)[1].lower() in SIDECAR_EXTENSIONS
+
+
+def group_key(file_ref: FileReference) -> Tuple[bool, Optional[str], str]:
+    """
+    Identifica a captura de um arquivo: a pasta (no disco ou no Drive) e o
+    nome base, sem diferenciar maiúsculas de minúsculas.
+    """
+    if file_ref.remote_id:
+        return True, file_ref.parent_id, split_extension(file_ref.name)[0].lower()
+    return False, os.path.dirname(file_ref.local_path), split_extension(file_ref.name)[0].lower()
+
+
+def extraction_cost(file_ref: FileReference) -> Tuple[bool, float]:
+    """Chave de ordenação dos membros de um grupo: JPEGs primeiro, depois os menores."""
+    extension = os.path.splitext(file_ref.name)[1].lower()
+    return extension not in JPEG_EXTENSIONS, file_ref.size if file_ref.size is not None else float("inf")
+
+
+def _identity(local_path: Optional[str], remote_id: Optional[str]) -> Optional[str]:
+    return remote_id or local_path
+
+
+class _Group:
+    __slots__ = ("leader", "candidates", "followers", "data")
+
+    def __init__(self):
+        # Identidade do membro enviado à extração, quando já escolhido
+        self.leader: Optional[str] = None
+        # Membros que podem ser extraídos, à espera de um JPEG
+        self.candidates: List[FileReference] = []
+        # Membros à espera dos dados do principal
+        self.followers: List[FileReference] = []
+        # Dados extraídos do principal
+        self.data: Optional[Dict[str, Any]] = None
+
+
+class CaptureGrouper:
+    """
+    Agrupa os arquivos da mesma captura (ex: DSCF5231.JPG, DSCF5231.RAF e
+    DSCF5231.xmp) para que os metadados sejam extraídos de um único membro,
+    de preferência o JPEG, e reaproveitados pelos demais.
+
+    leaders() fica entre a descoberta e o processador e repassa apenas o
+    membro principal de cada grupo; expand() e drain() geram os dados dos
+    demais membros a partir dos dados do principal. Os sidecars nunca são
+    extraídos: sem uma foto no grupo, eles são descartados.
+    """
+
+    def __init__(self, window: int = GROUP_WINDOW):
+        """
+        Args:
+            window: Número de arquivos descobertos durante os quais um grupo
+                    sem JPEG espera por um (ver GROUP_WINDOW).
+        """
+        self.window = window
+        # Número de arquivos que reaproveitaram os dados de outro membro
+        self.followers = 0
+        self._groups: Dict[Tuple, _Group] = {}
+        self._by_leader: Dict[str, _Group] = {}
+        # Grupos sem JPEG, na ordem em que começaram a esperar (chave -> prazo)
+        self._deferred: Dict[Tuple, int] = {}
+        self._ready: List[Dict[str, Any]] = []
+        self._seen = 0
+
+    def leaders(self, files: Iterable[FileReference]) -> Iterator[FileReference]:
+        """
+        Consome os arquivos descobertos e gera apenas o membro principal de
+        cada grupo. Um JPEG é repassado assim que chega; os demais esperam
+        até 'window' arquivos por um JPEG do mesmo grupo.
+        """
+        for file_ref in files:
+            self._seen += 1
+            key = group_key(file_ref)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _Group()
+            if group.leader is not None or is_sidecar(file_ref.name):
+                self._follow(group, file_ref)
+            elif os.path.splitext(file_ref.name)[1].lower() in JPEG_EXTENSIONS:
+                self._deferred.pop(key, None)
+                for candidate in group.candidates:
+                    self._follow(group, candidate)
+                group.candidates = []
+                yield self._lead(group, file_ref)
+            else:
+                group.candidates.append(file_ref)
+                self._deferred.setdefault(key, self._seen + self.window)
+            yield from self._expire(self._seen)
+        yield from self._expire(None)
+
+    def expand(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Recebe os dados de um arquivo gerados pelo processador e retorna
+        esses dados seguidos dos dados de cada membro já conhecido do grupo.
+        """
+        group = self._by_leader.pop(_identity(data['local_path'], data['remote_id']), None)
+        if group is None:
+            return [data]
+        group.data = data
+        followers, group.followers = group.followers, []
+        return [data, *(self._follower_data(data, file_ref) for file_ref in followers)]
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        Retorna os dados dos membros que chegaram depois de o principal do
+        seu grupo já ter sido extraído.
+        """
+        ready, self._ready = self._ready, []
+        return ready
+
+    def orphans(self) -> List[FileReference]:
+        """
+        Retorna os membros dos grupos cujo principal não teve uma data válida
+        (ex: um JPEG exportado sem EXIF), para que outro membro seja extraído.
+        Os sidecars só são incluídos se o grupo tiver outra foto.
+        """
+        orphans = []
+        for group in self._groups.values():
+            if group.data is None and any(not is_sidecar(file_ref.name) for file_ref in group.followers):
+                orphans.extend(group.followers)
+        return orphans
+
+    def _lead(self, group: _Group, file_ref: FileReference) -> FileReference:
+        group.leader = _identity(file_ref.local_path, file_ref.remote_id)
+        self._by_leader[group.leader] = group
+        return file_ref
+
+    def _follow(self, group: _Group, file_ref: FileReference):
+        if group.data is not None:
+            self._ready.append(self._follower_data(group.data, file_ref))
+        else:
+            group.followers.append(file_ref)
+
+    def _follower_data(self, data: Dict[str, Any], file_ref: FileReference) -> Dict[str, Any]:
+        self.followers += 1
+        logging.debug(f"{file_ref.name}: usando os metadados de {data['name']}")
+        return {**data, 'local_path': file_ref.local_path, 'name': file_ref.name, 'remote_id': file_ref.remote_id}
+
+    def _expire(self, seen: Optional[int]) -> Iterator[FileReference]:
+        # Extrai o membro mais barato dos grupos cujo prazo acabou (todos, se seen for None)
+        while self._deferred:
+            key, deadline = next(iter(self._deferred.items()))
+            if seen is not None and deadline > seen:
+                return
+            del self._deferred[key]
+            group = self._groups[key]
+            candidates = sorted(group.candidates, key=extraction_cost)
+            group.candidates = []
+            for candidate in candidates[1:]:
+                self._follow(group, candidate)
+            yield self._lead(group, candidates[0])
@@ -1,13 +1,19 @@
 # data_frame_service.py (versão atualizada)
+import os
 import pandas as pd
 
+from sort_service import NANOSECONDS, offset_to_seconds, sequence_key, subsec_to_nanoseconds
+
 class DataFrameService:
     def __init__(self, data: list):
         self.df = pd.DataFrame(data)
 
-    def prepare_and_sort(self):
+    def prepare_and_sort(self, name_format: str = "seconds"):
             """
             Prepara o DataFrame, converte datas, ordena e gera a base para o novo nome.
+
+            Args:
+                name_format: "seconds" ou "milliseconds" (ver sort_service.NAME_FORMATS).
             """
             if self.df.empty:
                 return pd.DataFrame()
@@ -16,22 +22,40 @@ class DataFrameService:
             self.df['capture_date_obj'] = pd.to_datetime(self.df['date'], format='%Y:%m:%d %H:%M:%S', errors='coerce')
             self.df.dropna(subset=['capture_date_obj'], inplace=True)
 
-            # Ordena o DataFrame cronologicamente
-            self.df.sort_values(by='capture_date_obj', inplace=True)
+            # Instante da captura em nanossegundos, incluindo a fração de segundo
+            for column in ('subsec', 'offset', 'sequence'):
+                if column not in self.df.columns:
+                    self.df[column] = None
+            subsec_ns = self.df['subsec'].map(subsec_to_nanoseconds).astype('int64')
+            self.df['sort_key'] = self.df['capture_date_obj'].astype('int64') + subsec_ns
+            # Com fuso em todas as fotos, ordena pelo instante em UTC
+            offsets = self.df['offset'].map(offset_to_seconds)
+            if offsets.notna().all():
+                self.df['sort_key'] -= offsets.astype('int64') * NANOSECONDS
+            self.df['sequence_key'] = self.df['sequence'].map(sequence_key)
+
+            # Ordena o DataFrame cronologicamente, desempatando pelo número de
+            # sequência (ordenação estável: empates restantes mantêm a ordem de entrada)
+            self.df.sort_values(by=['sort_key', 'sequence_key'], kind='stable', inplace=True)
             
             # Gera a coluna com o novo nome (apenas a parte da data)
             self.df['new_name_date'] = self.df['capture_date_obj'].dt.strftime('%Y-%m-%d_%H-%M-%S')
+            if name_format == "milliseconds":
+                milliseconds = (subsec_ns[self.df.index] // 1_000_000).astype(str).str.zfill(3)
+                self.df['new_name_date'] = self.df['new_name_date'] + '-' + milliseconds
 
             # Garante que as colunas opcionais existam, mesmo que vazias
             if 'photographer' not in self.df.columns:
                 self.df['photographer'] = None
             if 'remote_id' not in self.df.columns:
                 self.df['remote_id'] = None
+            if 'name' not in self.df.columns:
+                self.df['name'] = self.df['local_path'].map(os.path.basename)
                 
             # Renomeia 'local_path' para clareza
             self.df.rename(columns={'local_path': 'original_path'}, inplace=True)
 
             # Retorna todas as colunas necessárias para a etapa de renomeação
             return self.df[[
-                'original_path', 'remote_id', 'new_name_date', 'photographer'
+                'original_path', 'name', 'remote_id', 'new_name_date', 'photographer'
             ]]
\ No newline at end of file
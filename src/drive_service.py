@@ -2,53 +2,337 @@
 
 import io
 import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, MediaIoBaseDownload
+import metrics
+
+# Códigos HTTP que indicam sobrecarga temporária e justificam nova tentativa.
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Número máximo de requisições por chamada ao endpoint de lote do Drive.
+BATCH_MAX_REQUESTS = 100
+# Tamanho máximo de página aceito por files().list.
+MAX_PAGE_SIZE = 1000
+# Campos mínimos de cada arquivo usados pelo pipeline.
+DEFAULT_FILE_FIELDS = "id, name, mimeType, size, md5Checksum, modifiedTime, parents"
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+# Motivos de erro 403 que o Drive usa para limite de taxa.
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Indica se um erro da API do Drive é temporário (limite de taxa, erro 5xx
+    ou falha de conexão) e a chamada pode ser repetida.
+    """
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUS:
+            return True
+        if status == 403:
+            details = error.error_details if isinstance(error.error_details, list) else []
+            reasons = {detail.get('reason') for detail in details if isinstance(detail, dict)}
+            return bool(reasons & RATE_LIMIT_REASONS)
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError, httplib2.HttpLib2Error))
+
+
+class AdaptiveLimiter:
+    """
+    Limita o número de operações simultâneas e ajusta esse limite conforme as
+    respostas da API (aumento aditivo, redução multiplicativa).
+
+    Cada erro de limite de taxa reduz o limite pela metade; cada sucesso o
+    aumenta gradualmente até 'max_limit'.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        """
+        Args:
+            max_limit: Número máximo de operações simultâneas.
+            min_limit: Número mínimo de operações simultâneas.
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Registra uma chamada bem-sucedida."""
+        with self._condition:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        """Registra um erro de limite de taxa ou sobrecarga do servidor."""
+        with self._condition:
+            previous = int(self.limit)
+            self.limit = max(self.min_limit, self.limit / 2)
+            if int(self.limit) < previous:
+                logging.warning(f"Limite de taxa do Drive atingido; concorrência reduzida para {int(self.limit)}.")
+
 
 class GoogleDriveClient:
     """
     Cliente para interagir com a API do Google Drive utilizando credenciais de conta de serviço.
     """
 
-    def __init__(self, credentials_path: str, scopes: list = None): 
+    def __init__(self, credentials_path: str, scopes: list = None, api_endpoint: str = None,
+                 max_concurrency: int = 4, max_retries: int = 5):
         """
         Inicializa o cliente do Google Drive.
         
         :param credentials_path: Caminho para o arquivo JSON de credenciais.
+                                 Pode ser None quando 'api_endpoint' aponta para um servidor local de testes.
         :param scopes: Lista de escopos. Se None, utiliza o escopo padrão para acesso total ao Drive.
+        :param api_endpoint: URL base alternativa da API (ex: "http://localhost:8080/").
+                             Se None, usa o endpoint oficial do Google.
+        :param max_concurrency: Número máximo de downloads simultâneos.
+        :param max_retries: Número máximo de novas tentativas em erros temporários.
         """
 
         if scopes is None:
             scopes = ['https://www.googleapis.com/auth/drive']
-        self.credentials = service_account.Credentials.from_service_account_file(
-            credentials_path, scopes=scopes)
-        self.service = build('drive', 'v3', credentials=self.credentials)
+        if credentials_path is None and api_endpoint:
+            self.credentials = AnonymousCredentials()
+        else:
+            self.credentials = service_account.Credentials.from_service_account_file(
+                credentials_path, scopes=scopes)
+        self.client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        # O documento de descoberta fixa o endpoint de lote no domínio do Google
+        self.batch_uri = f"{api_endpoint.rstrip('/')}/batch/drive/v3" if api_endpoint else None
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        # O httplib2 não é thread-safe: cada thread usa seu próprio serviço e conexão HTTP
+        self._local = threading.local()
         logging.info("Google Drive Cliente inicializado com sucesso.")
 
-    def list_files(self, query: str = None, page_size: int = 10):
+    @property
+    def service(self):
+        """
+        Serviço da API do Drive exclusivo da thread atual.
+        """
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            service = build('drive', 'v3', http=http, client_options=self.client_options, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def call_with_retry(self, func, description: str = "chamada ao Drive"):
+        """
+        Executa uma chamada à API repetindo-a em erros temporários, com espera
+        exponencial e jitter, e informa o resultado ao limitador adaptativo.
+
+        :param func: Função sem argumentos que realiza a chamada.
+        :param description: Descrição usada nos logs.
+        :return: O retorno de 'func'.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                self.limiter.on_throttle()
+                metrics.incr("drive_retries")
+                # Espera exponencial com jitter completo, limitada a 32 s
+                delay = random.uniform(0, min(32.0, 2 ** attempt))
+                logging.warning(f"Erro temporário em {description} ({e}); nova tentativa em {delay:.1f}s.")
+                time.sleep(delay)
+            else:
+                self.limiter.on_success()
+                return result
+
+    def list_files(self, query: str = None, page_size: int = MAX_PAGE_SIZE,
+                   fields: str = DEFAULT_FILE_FIELDS):
         """
         Lista arquivos de acordo com a query especificada, com suporte para
-        Drives Partilhados.
+        Drives Partilhados. Todas as páginas de resultados são percorridas.
         
         :param query: Query para filtrar os arquivos.
-        :param page_size: Número máximo de arquivos a retornar.
+        :param page_size: Número de arquivos por página (máximo do Drive: 1000).
+        :param fields: Campos de cada arquivo a serem retornados pela API.
         :return: Lista de dicionários representando os arquivos.
         """
+        return list(self.iter_files(query=query, page_size=page_size, fields=fields))
+
+    def iter_files(self, query: str = None, page_size: int = MAX_PAGE_SIZE,
+                   fields: str = DEFAULT_FILE_FIELDS) -> Iterator[dict]:
+        """
+        Gera os arquivos que atendem à query, seguindo o nextPageToken e
+        mantendo em memória apenas uma página por vez.
+
+        Em caso de erro, registra a falha e encerra a listagem para não
+        quebrar o fluxo.
+
+        :param query: Query para filtrar os arquivos.
+        :param page_size: Número de arquivos por página (máximo do Drive: 1000).
+        :param fields: Campos de cada arquivo a serem retornados pela API.
+        """
         try:
-            results = self.service.files().list(
+            for page in self._iter_pages(query, page_size, fields):
+                yield from page
+        except Exception as e:
+            logging.error(f"Falha ao listar arquivos do Google Drive: {e}")
+
+    def _iter_pages(self, query: str, page_size: int, fields: str) -> Iterator[List[dict]]:
+        page_token = None
+        while True:
+            request = self.service.files().list(
                 q=query,
                 pageSize=page_size,
-                fields="nextPageToken, files(id, name, mimeType)",
+                pageToken=page_token,
+                fields=f"nextPageToken, files({fields})",
                 supportsAllDrives=True,
                 includeItemsFromAllDrives=True
-            ).execute()
-            files = results.get('files', [])
-            return files
-        except Exception as e:
-            logging.error(f"Falha ao listar arquivos do Google Drive: {e}")
-            # Retorna uma lista vazia em caso de erro para não quebrar o fluxo
-            return []
+            )
+            results = self.call_with_retry(request.execute, "listagem de arquivos")
+            yield results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def get_file(self, file_id: str, fields: str = DEFAULT_FILE_FIELDS) -> Optional[dict]:
+        """
+        Consulta os metadados de um único arquivo.
+
+        :param file_id: ID do arquivo no Google Drive.
+        :param fields: Campos do arquivo a serem retornados pela API.
+        :return: O dicionário do arquivo, ou None se ele não existir (ou não
+                 estiver mais acessível).
+        """
+        request = self.service.files().get(fileId=file_id, fields=fields, supportsAllDrives=True)
+        try:
+            return self.call_with_retry(request.execute, f"consulta do arquivo {file_id}")
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None
+            raise
+
+    def get_start_page_token(self) -> str:
+        """
+        Retorna o token que marca o estado atual do Drive na API de mudanças.
+        Só as alterações feitas depois dele serão listadas por list_changes.
+
+        :return: O startPageToken.
+        """
+        request = self.service.changes().getStartPageToken(supportsAllDrives=True)
+        return self.call_with_retry(request.execute, "token de mudanças")['startPageToken']
+
+    def list_changes(self, page_token: str, fields: str = DEFAULT_FILE_FIELDS) -> Tuple[List[dict], str]:
+        """
+        Lista todas as mudanças ocorridas desde 'page_token', seguindo as
+        páginas até o fim.
+
+        :param page_token: Token salvo de uma chamada anterior (ou de get_start_page_token).
+        :param fields: Campos do arquivo de cada mudança. 'parents' e 'trashed' são sempre incluídos.
+        :return: Tupla (mudanças, token a usar na próxima chamada).
+        """
+        changes = []
+        while True:
+            request = self.service.changes().list(
+                pageToken=page_token,
+                pageSize=MAX_PAGE_SIZE,
+                fields=f"nextPageToken, newStartPageToken, "
+                       f"changes(fileId, removed, file({fields}, parents, trashed))",
+                spaces='drive',
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            )
+            results = self.call_with_retry(request.execute, "listagem de mudanças")
+            changes.extend(results.get('changes', []))
+            if 'newStartPageToken' in results:
+                return changes, results['newStartPageToken']
+            page_token = results['nextPageToken']
+
+    def walk_folder(self, folder_id: str, fields: str = DEFAULT_FILE_FIELDS,
+                    recursive: bool = False, max_workers: int = 4) -> Iterator[dict]:
+        """
+        Gera os arquivos (não pastas) de uma pasta do Drive e, opcionalmente,
+        de todas as suas subpastas, em largura.
+
+        As listagens de pastas diferentes rodam em paralelo; as páginas são
+        repassadas por uma fila limitada, de modo que nunca há mais do que
+        algumas páginas em memória.
+
+        :param folder_id: ID da pasta raiz.
+        :param fields: Campos de cada arquivo. 'mimeType' é sempre incluído.
+        :param recursive: Se True, percorre também as subpastas.
+        :param max_workers: Número máximo de pastas listadas ao mesmo tempo.
+        """
+        if 'mimeType' not in fields:
+            fields = f"{fields}, mimeType"
+        pages: "queue.Queue[tuple]" = queue.Queue(maxsize=max_workers * 2)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # Espera por espaço na fila, desistindo se o consumidor tiver parado
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def list_folder(current_id: str):
+            query = f"'{current_id}' in parents and trashed = false"
+            try:
+                for page in self._iter_pages(query, MAX_PAGE_SIZE, fields):
+                    if not put(('page', page)):
+                        return
+            except Exception as e:
+                logging.error(f"Falha ao listar a pasta {current_id} do Google Drive: {e}")
+            finally:
+                put(('done', current_id))
+
+        folders = deque([folder_id])
+        active = 0
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="olaf-listing")
+        try:
+            while folders or active:
+                while folders and active < max_workers:
+                    executor.submit(list_folder, folders.popleft())
+                    active += 1
+                kind, payload = pages.get()
+                if kind == 'done':
+                    active -= 1
+                    continue
+                for drive_file in payload:
+                    if drive_file.get('mimeType') == FOLDER_MIME_TYPE:
+                        if recursive:
+                            folders.append(drive_file['id'])
+                    else:
+                        yield drive_file
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
     
     def download_file(self, file_id: str, destination_path: str):
         """
@@ -58,14 +342,55 @@ class GoogleDriveClient:
         :param destination_path: Caminho local onde o arquivo será salvo.
         """
 
+        with io.FileIO(destination_path, 'wb') as fh:
+            self._download_into(file_id, fh)
+        logging.debug(f"Download concluído. Arquivo salvo em {destination_path}.")
+
+    def download_content(self, file_id: str) -> bytes:
+        """
+        Realiza o download de um arquivo do Google Drive para a memória, sem
+        gravá-lo em disco.
+
+        :param file_id: ID do arquivo no Google Drive.
+        :return: O conteúdo do arquivo.
+        """
+        buffer = io.BytesIO()
+        self._download_into(file_id, buffer)
+        logging.debug(f"Download concluído: {buffer.tell()} bytes do arquivo {file_id} em memória.")
+        return buffer.getvalue()
+
+    def _download_into(self, file_id: str, fh):
         request = self.service.files().get_media(fileId=file_id)
-        fh = io.FileIO(destination_path, 'wb')
         downloader = MediaIoBaseDownload(fh, request)
         done = False
         while done is False:
-            status, done = downloader.next_chunk()
-            logging.info(f"Download {int(status.progress() * 100)}%.")
-        logging.info(f"Download concluído. Arquivo salvo em {destination_path}.")
+            status, done = self.call_with_retry(downloader.next_chunk, f"download do arquivo {file_id}")
+            logging.debug(f"Download {int(status.progress() * 100)}%.")
+
+    def download_range(self, file_id: str, start: int, end: int) -> bytes:
+        """
+        Baixa apenas um intervalo de bytes de um arquivo (requisição HTTP Range).
+
+        :param file_id: ID do arquivo no Google Drive.
+        :param start: Posição inicial (inclusiva).
+        :param end: Posição final (exclusiva).
+        :return: Os bytes do intervalo. Pode ter menos bytes que o pedido se o
+                 arquivo terminar antes; é vazio se 'start' estiver além do fim.
+        """
+        request = self.service.files().get_media(fileId=file_id)
+        request.headers['Range'] = f"bytes={start}-{end - 1}"
+        try:
+            content = self.call_with_retry(request.execute, f"download parcial do arquivo {file_id}")
+        except HttpError as e:
+            # 416: o intervalo começa depois do fim do arquivo
+            if e.resp.status == 416:
+                return b""
+            raise
+        # Servidores que ignoram o Range devolvem o arquivo inteiro (200)
+        if len(content) > end - start:
+            content = content[start:end]
+        logging.debug(f"Baixados {len(content)} bytes (intervalo {start}-{end - 1}) do arquivo {file_id}.")
+        return content
 
     def rename_file(self, file_id: str, new_name: str):
         """
@@ -86,14 +411,91 @@ class GoogleDriveClient:
             body = {'name': new_name}
             
             # Chama o método 'update' da API para o arquivo especificado.
-            self.service.files().update(
+            request = self.service.files().update(
                 fileId=file_id,
                 body=body
-            ).execute()
+            )
+            self.call_with_retry(request.execute, f"renomeação do arquivo {file_id}")
 
             logging.info(f"Arquivo com ID {file_id} renomeado para '{new_name}' no Google Drive.")
 
         except Exception as e:
             logging.error(f"Falha ao renomear o arquivo com ID {file_id} no Google Drive: {e}")
             # Propaga a exceção para que a lógica de chamada possa tratá-la.
-            raise e 
\ No newline at end of file
+            raise e
+
+    def rename_files(self, renames: List[Tuple[str, str]],
+                     batch_size: int = BATCH_MAX_REQUESTS) -> Dict[str, Optional[Exception]]:
+        """
+        Renomeia vários arquivos no Google Drive usando o endpoint de lote,
+        com até 'batch_size' atualizações por requisição HTTP.
+
+        Apenas as renomeações que falharem com erros temporários são
+        repetidas, com espera exponencial entre as tentativas.
+
+        Args:
+            renames: Lista de pares (file_id, novo_nome).
+            batch_size: Número máximo de atualizações por lote (limite do Drive: 100).
+
+        Returns:
+            Um dicionário file_id -> None (sucesso) ou a exceção da última tentativa.
+        """
+        results: Dict[str, Optional[Exception]] = {}
+        pending = list(renames)
+
+        for attempt in range(self.max_retries + 1):
+            retry = []
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                errors = self._execute_rename_batch(chunk)
+                for (file_id, new_name), error in zip(chunk, errors):
+                    results[file_id] = error
+                    if error is None:
+                        logging.debug(f"Arquivo com ID {file_id} renomeado para '{new_name}' no Google Drive.")
+                    elif is_retryable_error(error):
+                        retry.append((file_id, new_name))
+
+            if not retry or attempt >= self.max_retries:
+                break
+            self.limiter.on_throttle()
+            metrics.incr("drive_retries", len(retry))
+            delay = random.uniform(0, min(32.0, 2 ** attempt))
+            logging.warning(f"{len(retry)} renomeações falharam temporariamente; nova tentativa em {delay:.1f}s.")
+            time.sleep(delay)
+            pending = retry
+
+        failed = sum(1 for error in results.values() if error is not None)
+        metrics.incr("renames_drive", len(results) - failed)
+        metrics.incr("rename_failures", failed)
+        logging.info(f"Renomeação em lote no Drive: {len(results) - failed} concluídas, {failed} com falha.")
+        return results
+
+    def _execute_rename_batch(self, chunk: List[Tuple[str, str]]) -> List[Optional[Exception]]:
+        """
+        Envia um único lote de renomeações e retorna o erro de cada item (ou None).
+        """
+        errors: List[Optional[Exception]] = [None] * len(chunk)
+
+        def callback(request_id, response, exception):
+            errors[int(request_id)] = exception
+
+        def send():
+            # Um lote novo a cada tentativa: um BatchHttpRequest não deve ser reenviado
+            if self.batch_uri:
+                batch = BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+            else:
+                batch = self.service.new_batch_http_request(callback=callback)
+            for index, (file_id, new_name) in enumerate(chunk):
+                batch.add(
+                    self.service.files().update(fileId=file_id, body={'name': new_name}, fields='id'),
+                    request_id=str(index)
+                )
+            batch.execute()
+
+        try:
+            self.call_with_retry(send, "renomeação em lote")
+        except Exception as e:
+            # Falha do lote inteiro (não de um item): todos os itens recebem o erro
+            logging.error(f"Falha ao enviar lote de {len(chunk)} renomeações ao Google Drive: {e}")
+            return [e] * len(chunk)
+        return errors
@@ -0,0 +1,282 @@
+# src/exif_reader.py
+
+import logging
+import struct
+from typing import Callable, Dict, Optional
+
+# Leitor EXIF em Python puro para JPEG e arquivos baseados em TIFF
+# (CR2, NEF, ARW, DNG, ORF, RW2) e RAF. Lê apenas os bytes do cabeçalho
+# necessários para chegar às datas (e ao número de sequência das rajadas),
+# sem iniciar o ExifTool.
+
+# Tamanho da primeira leitura e limite máximo de bytes lidos por arquivo.
+INITIAL_READ_SIZE = 16 * 1024
+MAX_READ_SIZE = 1024 * 1024
+
+# Tags do IFD0
+TAG_MAKE = 0x010F
+TAG_MODIFY_DATE = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_MAKER_NOTE = 0x927C
+# Tags do ExifIFD, com os mesmos nomes usados pelo ExifTool
+EXIF_TAGS = {
+    0x9003: "DateTimeOriginal",
+    0x9004: "CreateDate",
+    0x9010: "OffsetTime",
+    0x9011: "OffsetTimeOriginal",
+    0x9012: "OffsetTimeDigitized",
+    0x9290: "SubSecTime",
+    0x9291: "SubSecTimeOriginal",
+    0x9292: "SubSecTimeDigitized",
+}
+# Número de sequência da câmera nas rajadas (SequenceNumber do ExifTool),
+# lido das MakerNotes da Canon (posição 9 do ShotInfo) e da Fujifilm (tag
+# 0x1101). Nas demais câmeras, só o ExifTool o informa.
+SEQUENCE_TAG = "SequenceNumber"
+CANON_SHOT_INFO = 0x0004
+CANON_SEQUENCE_INDEX = 9
+FUJIFILM_MAKER_NOTE = b"FUJIFILM"
+FUJIFILM_SEQUENCE_NUMBER = 0x1101
+# Tags que este leitor sabe extrair. Qualquer outra exige o ExifTool.
+SUPPORTED_TAGS = frozenset(["ModifyDate", *EXIF_TAGS.values(), SEQUENCE_TAG])
+
+TIFF_TYPE_ASCII = 2
+TIFF_TYPE_SHORT = 3
+TIFF_TYPE_LONG = 4
+TIFF_TYPE_IFD = 13
+
+# Assinaturas de TIFF e variantes (ORF, RW2) aceitas como início do arquivo.
+TIFF_MAGICS = (b"II*\x00", b"MM\x00*", b"IIRO", b"IIRS", b"MMOR", b"IIU\x00")
+RAF_MAGIC = b"FUJIFILMCCD-RAW "
+JPEG_SOI = b"\xff\xd8"
+
+
+class ExifParseError(Exception):
+    """
+    Erro de estrutura ao interpretar o cabeçalho EXIF de um arquivo.
+    """
+    pass
+
+
+class HeadBuffer:
+    """
+    Mantém em memória o início de um arquivo e o aumenta sob demanda.
+
+    Os bytes são obtidos por uma função fetch(start, end), que pode ler de
+    um arquivo local ou de uma fonte remota. O buffer dobra de tamanho até
+    cobrir a leitura pedida ou atingir 'max_size'.
+    """
+
+    def __init__(self, fetch: Callable[[int, int], bytes],
+                 initial_size: int = INITIAL_READ_SIZE, max_size: int = MAX_READ_SIZE):
+        """
+        Args:
+            fetch: Função que retorna os bytes no intervalo [start, end) do arquivo.
+                   Pode retornar menos bytes se o arquivo terminar antes.
+            initial_size: Tamanho da primeira leitura.
+            max_size: Número máximo de bytes que podem ser lidos.
+        """
+        self._fetch = fetch
+        self.initial_size = initial_size
+        self.max_size = max_size
+        self.data = b""
+        self.eof = False
+
+    def _grow(self, needed: int):
+        target = max(len(self.data) * 2, self.initial_size)
+        while target < needed:
+            target *= 2
+        target = min(target, self.max_size)
+        if target <= len(self.data):
+            raise ExifParseError(f"metadados além do limite de leitura ({self.max_size} bytes)")
+        chunk = self._fetch(len(self.data), target)
+        if len(chunk) < target - len(self.data):
+            self.eof = True
+        self.data += chunk
+
+    def read(self, offset: int, size: int) -> bytes:
+        """
+        Retorna exatamente 'size' bytes a partir de 'offset'.
+
+        Raises:
+            ExifParseError: Se o intervalo estiver além do fim do arquivo ou do limite de leitura.
+        """
+        end = offset + size
+        while end > len(self.data):
+            if self.eof:
+                raise ExifParseError("fim do arquivo antes do fim da estrutura EXIF")
+            self._grow(end)
+        return self.data[offset:end]
+
+
+def read_exif(fetch: Callable[[int, int], bytes], max_size: int = MAX_READ_SIZE) -> Optional[Dict[str, str]]:
+    """
+    Lê as datas EXIF de um arquivo a partir de uma função de leitura por intervalo.
+
+    Args:
+        fetch: Função que retorna os bytes no intervalo [start, end) do arquivo.
+        max_size: Número máximo de bytes que podem ser lidos.
+
+    Returns:
+        Um dicionário tag -> valor (nomes de tags do ExifTool, datas no formato
+        "AAAA:MM:DD HH:MM:SS"), ou None se o formato não for suportado ou a
+        estrutura não puder ser interpretada.
+    """
+    return read_exif_buffer(HeadBuffer(fetch, max_size=max_size))
+
+
+def read_exif_buffer(buffer: HeadBuffer) -> Optional[Dict[str, str]]:
+    """
+    Lê as datas EXIF usando um HeadBuffer fornecido pelo chamador, que pode
+    depois reutilizar os bytes lidos (buffer.data).
+
+    Returns:
+        O mesmo que read_exif.
+    """
+    try:
+        return _parse(buffer)
+    except (ExifParseError, struct.error) as e:
+        logging.debug(f"Leitor EXIF rápido não conseguiu interpretar o arquivo: {e}")
+        return None
+
+
+def read_exif_file(path: str, max_size: int = MAX_READ_SIZE) -> Optional[Dict[str, str]]:
+    """
+    Lê as datas EXIF de um arquivo local, lendo apenas o início do arquivo.
+
+    Args:
+        path: Caminho local do arquivo.
+        max_size: Número máximo de bytes que podem ser lidos.
+
+    Returns:
+        O mesmo que read_exif.
+    """
+    try:
+        with open(path, "rb") as fh:
+            def fetch(start: int, end: int) -> bytes:
+                fh.seek(start)
+                return fh.read(end - start)
+            return read_exif(fetch, max_size=max_size)
+    except OSError as e:
+        logging.debug(f"Não foi possível ler o arquivo {path}: {e}")
+        return None
+
+
+def _parse(buffer: HeadBuffer) -> Optional[Dict[str, str]]:
+    head = buffer.read(0, 4)
+    if head.startswith(JPEG_SOI):
+        return _parse_jpeg(buffer, 0)
+    if head in TIFF_MAGICS:
+        return _parse_tiff(buffer, 0)
+    if buffer.read(0, len(RAF_MAGIC)) == RAF_MAGIC:
+        # O RAF guarda uma prévia JPEG com o EXIF completo; o offset fica no byte 84.
+        (jpeg_offset,) = struct.unpack(">I", buffer.read(84, 4))
+        return _parse_jpeg(buffer, jpeg_offset)
+    return None
+
+
+def _parse_jpeg(buffer: HeadBuffer, start: int) -> Optional[Dict[str, str]]:
+    if buffer.read(start, 2) != JPEG_SOI:
+        raise ExifParseError("assinatura JPEG inválida")
+    position = start + 2
+    while True:
+        marker_prefix, marker = buffer.read(position, 2)
+        if marker_prefix != 0xFF:
+            raise ExifParseError("marcador JPEG inválido")
+        if marker == 0xFF:
+            # Bytes de preenchimento entre marcadores
+            position += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # Fim da imagem ou início dos dados comprimidos: não há APP1 EXIF
+            return {}
+        (length,) = struct.unpack(">H", buffer.read(position + 2, 2))
+        if marker == 0xE1 and buffer.read(position + 4, 6) == b"Exif\x00\x00":
+            return _parse_tiff(buffer, position + 10)
+        position += 2 + length
+
+
+def _parse_tiff(buffer: HeadBuffer, base: int) -> Dict[str, str]:
+    order = buffer.read(base, 2)
+    if order == b"II":
+        endian = "<"
+    elif order == b"MM":
+        endian = ">"
+    else:
+        raise ExifParseError("ordem de bytes TIFF inválida")
+    (ifd0_offset,) = struct.unpack(endian + "I", buffer.read(base + 4, 4))
+
+    result: Dict[str, str] = {}
+    make = ""
+    exif_ifd_offset = None
+    for tag, type_, count, value in _iter_ifd(buffer, base, ifd0_offset, endian):
+        if tag == TAG_MODIFY_DATE and type_ == TIFF_TYPE_ASCII:
+            _store(result, "ModifyDate", _read_ascii(buffer, base, count, value, endian))
+        elif tag == TAG_MAKE and type_ == TIFF_TYPE_ASCII:
+            make = _read_ascii(buffer, base, count, value, endian)
+        elif tag == TAG_EXIF_IFD and type_ in (TIFF_TYPE_LONG, TIFF_TYPE_IFD):
+            (exif_ifd_offset,) = struct.unpack(endian + "I", value)
+
+    if exif_ifd_offset:
+        maker_note_offset = None
+        for tag, type_, count, value in _iter_ifd(buffer, base, exif_ifd_offset, endian):
+            name = EXIF_TAGS.get(tag)
+            if name and type_ == TIFF_TYPE_ASCII:
+                _store(result, name, _read_ascii(buffer, base, count, value, endian))
+            elif tag == TAG_MAKER_NOTE and count > 4:
+                (maker_note_offset,) = struct.unpack(endian + "I", value)
+        if maker_note_offset:
+            sequence = _read_sequence(buffer, base, maker_note_offset, endian, make)
+            if sequence is not None:
+                result[SEQUENCE_TAG] = str(sequence)
+    return result
+
+
+def _read_sequence(buffer: HeadBuffer, base: int, offset: int, endian: str, make: str) -> Optional[int]:
+    """
+    Lê o número de sequência da MakerNote, nas câmeras suportadas. Como a
+    tag é opcional, uma MakerNote que não puder ser interpretada não
+    invalida as datas já lidas.
+    """
+    try:
+        start = base + offset
+        if buffer.read(start, len(FUJIFILM_MAKER_NOTE)) == FUJIFILM_MAKER_NOTE:
+            # IFD sempre little-endian, com offsets relativos ao início da MakerNote
+            (ifd_offset,) = struct.unpack("<I", buffer.read(start + 8, 4))
+            for tag, type_, count, value in _iter_ifd(buffer, start, ifd_offset, "<"):
+                if tag == FUJIFILM_SEQUENCE_NUMBER and type_ == TIFF_TYPE_SHORT:
+                    return struct.unpack("<H", value[:2])[0]
+        elif make.startswith("Canon"):
+            # IFD na mesma ordem de bytes do TIFF, com offsets relativos ao cabeçalho TIFF
+            for tag, type_, count, value in _iter_ifd(buffer, base, offset, endian):
+                if tag == CANON_SHOT_INFO and type_ == TIFF_TYPE_SHORT and count > CANON_SEQUENCE_INDEX:
+                    (shot_info_offset,) = struct.unpack(endian + "I", value)
+                    position = base + shot_info_offset + 2 * CANON_SEQUENCE_INDEX
+                    return struct.unpack(endian + "H", buffer.read(position, 2))[0]
+    except (ExifParseError, struct.error) as e:
+        logging.debug(f"MakerNote não interpretada ({make or 'fabricante desconhecido'}): {e}")
+    return None
+
+
+def _iter_ifd(buffer: HeadBuffer, base: int, offset: int, endian: str):
+    (entry_count,) = struct.unpack(endian + "H", buffer.read(base + offset, 2))
+    entries = buffer.read(base + offset + 2, entry_count * 12)
+    for index in range(entry_count):
+        entry = entries[index * 12:(index + 1) * 12]
+        tag, type_, count = struct.unpack(endian + "HHI", entry[:8])
+        yield tag, type_, count, entry[8:]
+
+
+def _read_ascii(buffer: HeadBuffer, base: int, count: int, value: bytes, endian: str) -> str:
+    if count <= 4:
+        raw = value[:count]
+    else:
+        (offset,) = struct.unpack(endian + "I", value)
+        raw = buffer.read(base + offset, count)
+    return raw.split(b"\x00", 1)[0].decode("ascii", errors="replace").strip()
+
+
+def _store(result: Dict[str, str], name: str, text: str):
+    # Datas vazias ou zeradas ("0000:00:00 00:00:00") são tratadas como ausentes
+    if text and text.strip("0: ") != "":
+        result[name] = text
@@ -0,0 +1,266 @@
+# src/exiftool_service.py
+
+import atexit
+import logging
+import os
+import queue
+import subprocess
+import threading
+from typing import List, Optional
+
+# Sequência que o ExifTool imprime ao terminar cada comando no modo -stay_open.
+READY_MARKER = "{{ready{0}}}"
+# Marcador ecoado no stderr (via -echo4) para sabermos onde termina a saída de erro.
+READY_ERR_MARKER = "{{ready_err{0}}}"
+
+
+class ExifToolError(Exception):
+    """
+    Erro de comunicação com um processo ExifTool persistente.
+    """
+    pass
+
+
+class ExifToolWorker:
+    """
+    Mantém um único processo ExifTool vivo (-stay_open True -@ -) e envia
+    comandos a ele através de um protocolo de requisição/resposta.
+
+    Cada comando é escrito no stdin, um argumento por linha, seguido de
+    "-execute<N>". A resposta é lida do stdout até o marcador "{ready<N>}".
+    O stderr é lido continuamente por uma thread auxiliar: se o seu pipe
+    enchesse (ex: muitos avisos em um lote) enquanto esperamos o stdout, o
+    ExifTool ficaria bloqueado e o worker travaria.
+    """
+
+    def __init__(self, executable: str = "exiftool", common_args: Optional[List[str]] = None):
+        """
+        Inicializa o worker, sem iniciar o processo (início preguiçoso).
+
+        Args:
+            executable: Caminho ou nome do executável do ExifTool.
+            common_args: Argumentos aplicados a todos os comandos (ex: ["-charset", "filename=utf8"]).
+        """
+        self.executable = executable
+        self.common_args = common_args if common_args is not None else ["-charset", "filename=utf8"]
+        self._process: Optional[subprocess.Popen] = None
+        # Linhas do stderr lidas pela thread auxiliar (None ao fim do processo)
+        self._stderr_lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Indica se o processo do ExifTool está ativo."""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """
+        Inicia o processo persistente do ExifTool.
+
+        Raises:
+            FileNotFoundError: Se o executável do ExifTool não for encontrado.
+        """
+        if self.running:
+            return
+        command = [self.executable, "-stay_open", "True", "-@", "-", "-common_args", *self.common_args]
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        self._stderr_lines = queue.Queue()
+        threading.Thread(target=self._drain_stderr, args=(self._process.stderr, self._stderr_lines),
+                         name=f"exiftool-stderr-{self._process.pid}", daemon=True).start()
+        self._sequence = 0
+        logging.debug(f"Processo ExifTool iniciado (pid {self._process.pid}).")
+
+    @staticmethod
+    def _drain_stderr(stream, lines: "queue.Queue[Optional[str]]"):
+        try:
+            for line in stream:
+                lines.put(line)
+        except (OSError, ValueError):
+            # Pipe fechado ao encerrar o processo
+            pass
+        finally:
+            lines.put(None)
+
+    def execute(self, *args: str) -> str:
+        """
+        Executa um comando no processo persistente e retorna a saída padrão.
+
+        Se o processo tiver morrido (antes ou durante o comando), ele é
+        reiniciado e o comando é repetido uma única vez.
+
+        Args:
+            *args: Argumentos do ExifTool para este comando (flags e caminhos).
+
+        Returns:
+            A saída padrão do comando, sem o marcador de término.
+        """
+        with self._lock:
+            try:
+                return self._execute_once(args)
+            except (BrokenPipeError, ExifToolError, OSError) as e:
+                if isinstance(e, FileNotFoundError):
+                    raise
+                logging.warning(f"Processo ExifTool falhou ({e}). Reiniciando o worker...")
+                self._kill()
+                return self._execute_once(args)
+
+    def _execute_once(self, args) -> str:
+        self.start()
+        self._sequence += 1
+        sequence = self._sequence
+        ready = READY_MARKER.format(sequence)
+        ready_err = READY_ERR_MARKER.format(sequence)
+
+        lines = [*args, "-echo4", ready_err, f"-execute{sequence}"]
+        for arg in lines:
+            if "\n" in arg:
+                raise ValueError(f"Argumento inválido para o ExifTool (contém quebra de linha): {arg!r}")
+        self._process.stdin.write("\n".join(lines) + "\n")
+        self._process.stdin.flush()
+
+        output = self._read_until(self._process.stdout.readline, ready)
+        errors = self._read_until(self._stderr_lines.get, ready_err)
+        if errors.strip():
+            logging.debug(f"ExifTool stderr: {errors.strip()}")
+        return output
+
+    def _read_until(self, read_line, marker: str) -> str:
+        lines = []
+        while True:
+            line = read_line()
+            if not line:
+                raise ExifToolError("o processo encerrou antes de concluir o comando")
+            if line.rstrip("\r\n") == marker:
+                return "".join(lines)
+            lines.append(line)
+
+    def close(self, timeout: float = 5.0):
+        """
+        Encerra o processo de forma limpa (-stay_open False).
+        """
+        with self._lock:
+            if not self.running:
+                self._process = None
+                return
+            try:
+                self._process.stdin.write("-stay_open\nFalse\n")
+                self._process.stdin.flush()
+                self._process.wait(timeout=timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                self._kill()
+            finally:
+                self._process = None
+
+    def _kill(self):
+        if self._process is not None:
+            try:
+                self._process.kill()
+                self._process.wait()
+            except OSError:
+                pass
+            self._process = None
+
+
+class ExifToolPool:
+    """
+    Pequeno pool de ExifToolWorker compartilhado entre as threads do programa.
+
+    Os workers são criados sob demanda, até o limite definido em 'size', e
+    devolvidos ao pool após cada comando.
+    """
+
+    def __init__(self, size: Optional[int] = None, executable: str = "exiftool"):
+        """
+        Args:
+            size: Número máximo de processos ExifTool simultâneos.
+                  Se None, usa min(4, número de CPUs).
+            executable: Caminho ou nome do executável do ExifTool.
+        """
+        self.size = size or min(4, os.cpu_count() or 1)
+        self.executable = executable
+        self._idle: "queue.LifoQueue[ExifToolWorker]" = queue.LifoQueue()
+        self._created = 0
+        self._workers: List[ExifToolWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self) -> ExifToolWorker:
+        with self._lock:
+            if self._closed:
+                raise ExifToolError("o pool de ExifTool já foi encerrado")
+            if self._idle.empty() and self._created < self.size:
+                worker = ExifToolWorker(self.executable)
+                self._workers.append(worker)
+                self._created += 1
+                return worker
+        return self._idle.get()
+
+    def execute(self, *args: str) -> str:
+        """
+        Executa um comando em um dos workers livres do pool.
+
+        Args:
+            *args: Argumentos do ExifTool para este comando.
+
+        Returns:
+            A saída padrão do comando.
+        """
+        worker = self._acquire()
+        try:
+            return worker.execute(*args)
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """
+        Encerra todos os processos do pool.
+        """
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.close()
+        logging.debug(f"Pool de ExifTool encerrado ({len(workers)} processos).")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_default_pool: Optional[ExifToolPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> ExifToolPool:
+    """
+    Retorna o pool global de ExifTool, criando-o na primeira chamada.
+    O pool é encerrado automaticamente ao final do programa.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool._closed:
+            _default_pool = ExifToolPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def shutdown_default_pool():
+    """
+    Encerra o pool global de ExifTool, se ele tiver sido criado.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
@@ -0,0 +1,326 @@
+# src/hash_index.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+import metrics
+from metadata_cache import DEFAULT_MAX_ENTRIES, default_cache_path, file_identity
+from sources.base_source import FileReference
+
+# Tamanho dos blocos do início e do fim do arquivo usados no hash rápido.
+QUICK_BLOCK_SIZE = 64 * 1024
+# Tamanho das leituras no hash completo.
+READ_SIZE = 1024 * 1024
+DEDUP_MODES = ("report", "skip")
+# Por quanto tempo (em segundos) um arquivo do Drive listado ou conferido
+# nesta execução é considerado existente sem uma nova consulta à API.
+DRIVE_RECHECK_INTERVAL = 3600
+
+
+def default_index_path() -> str:
+    """
+    Retorna o caminho padrão do índice de hashes, ao lado do cache de metadados.
+    """
+    return os.path.join(os.path.dirname(default_cache_path()), "hashes.sqlite3")
+
+
+def quick_hash(path: str, size: int) -> str:
+    """
+    Hash rápido de um arquivo: tamanho + primeiro e último blocos de
+    QUICK_BLOCK_SIZE bytes. Lê no máximo 128 KiB, qualquer que seja o tamanho.
+    """
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(QUICK_BLOCK_SIZE))
+        if size > 2 * QUICK_BLOCK_SIZE:
+            f.seek(-QUICK_BLOCK_SIZE, os.SEEK_END)
+        digest.update(f.read(QUICK_BLOCK_SIZE))
+    metrics.incr("dedup_bytes_hashed", min(size, 2 * QUICK_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def full_hash(path: str) -> str:
+    """
+    MD5 do conteúdo inteiro, comparável com o md5Checksum do Drive.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    read = 0
+    with open(path, "rb") as f:
+        while block := f.read(READ_SIZE):
+            digest.update(block)
+            read += len(block)
+    metrics.incr("dedup_bytes_hashed", read)
+    return digest.hexdigest()
+
+
+class HashIndex:
+    """
+    Índice persistente (SQLite) do conteúdo dos arquivos já vistos, de todas
+    as fontes, usado para encontrar cópias do mesmo arquivo antes da extração.
+
+    Os hashes só são calculados quando há outro arquivo com o mesmo tamanho,
+    e são guardados junto com a impressão digital do arquivo (a mesma do
+    cache de metadados), de modo que cada arquivo local é lido no máximo uma
+    vez enquanto não mudar. Entre arquivos locais, o hash rápido (início e
+    fim do arquivo) basta, a não ser que 'full_hash' seja True; entre um
+    arquivo do Drive e outro arquivo, é comparado o MD5, que o Drive informa
+    na listagem sem nenhum download.
+
+    Um arquivo do Drive só é informado como original se tiver aparecido na
+    listagem desta execução; os demais são conferidos na API (ainda existe,
+    não está na lixeira e tem o mesmo MD5) antes de qualquer resultado.
+    """
+
+    def __init__(self, path: Optional[str] = None, full_hash: bool = False,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, drive_client=None):
+        """
+        Args:
+            path: Caminho do banco SQLite. Se None, usa default_index_path().
+            full_hash: Se True, confirma as duplicatas locais com o MD5 do
+                       arquivo inteiro, em vez de confiar no hash rápido.
+            max_entries: Número máximo de entradas; as vistas há mais tempo
+                         são removidas ao fechar o índice.
+            drive_client: GoogleDriveClient usado para conferir os arquivos do
+                          Drive indexados em execuções anteriores. Se None,
+                          esses arquivos não são usados como originais.
+        """
+        self.path = path or default_index_path()
+        self.full_hash = full_hash
+        self.max_entries = max_entries
+        self.drive_client = drive_client
+        self.duplicates = 0
+        self._started = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " name TEXT NOT NULL,"
+            " quick TEXT,"
+            " md5 TEXT,"
+            " last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS hashes_size ON hashes(size)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS hashes_last_seen ON hashes(last_seen)")
+        self._conn.commit()
+
+    def find_duplicate(self, file_ref: FileReference) -> Optional[str]:
+        """
+        Procura no índice outro arquivo com o mesmo conteúdo. Se não houver,
+        o arquivo é registrado como original.
+
+        Returns:
+            A descrição do arquivo original (caminho local ou nome e ID no
+            Drive), ou None se o arquivo não for uma duplicata ou não puder
+            ser comparado (ex: sem tamanho ou sem checksum no Drive).
+        """
+        identity = file_identity(file_ref)
+        if identity is None or file_ref.size is None:
+            return None
+        key, fingerprint = identity
+        local = key.startswith("local:")
+        if not local and not file_ref.checksum:
+            return None
+        size = file_ref.size
+        name = key[len("local:"):] if local else file_ref.name
+
+        with self._lock:
+            quick, md5 = None, None if local else file_ref.checksum
+            row = self._conn.execute("SELECT fingerprint, quick, md5 FROM hashes WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == fingerprint:
+                quick, md5 = row[1], row[2] or md5
+
+            original = None
+            if self._conn.execute("SELECT 1 FROM hashes WHERE size = ? AND key != ? LIMIT 1", (size, key)).fetchone():
+                # Só os arquivos com o mesmo tamanho precisam de hash
+                try:
+                    if local and quick is None:
+                        quick = quick_hash(name, size)
+                        metrics.incr("dedup_hashed_files")
+                    original, md5 = self._match(key, size, local, name, quick, md5)
+                except OSError as e:
+                    logging.warning(f"Não foi possível calcular o hash de {name}: {e}")
+                    return None
+
+            if original is not None:
+                # Duplicatas não são registradas: o original continua sendo o único
+                self._conn.execute("DELETE FROM hashes WHERE key = ?", (key,))
+                self.duplicates += 1
+                metrics.incr("duplicates_found")
+                return original
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hashes (key, fingerprint, size, name, quick, md5, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, size, name, quick, md5, time.time()),
+            )
+        return None
+
+    def _match(self, key: str, size: int, local: bool, path: str, quick: Optional[str], md5: Optional[str]):
+        """
+        Compara o arquivo com os demais do mesmo tamanho, completando os
+        hashes que faltam nos arquivos locais já indexados.
+
+        Returns:
+            Uma tupla (descrição do original ou None, MD5 do arquivo, se calculado).
+        """
+        # Descarta no próprio SQLite os arquivos que já se sabe serem diferentes
+        if local:
+            condition, value = "(key LIKE 'drive:%' OR quick IS NULL OR quick = ?)", quick
+        else:
+            condition, value = "(md5 IS NULL OR md5 = ?)", md5
+        rows = self._conn.execute(
+            f"SELECT key, fingerprint, name, quick, md5, last_seen FROM hashes "
+            f"WHERE size = ? AND key != ? AND {condition}",
+            (size, key, value),
+        ).fetchall()
+        for other_key, other_fingerprint, other_name, other_quick, other_md5, other_seen in rows:
+            other_local = other_key.startswith("local:")
+            if local and other_local:
+                if other_quick is None:
+                    if not self._is_current(other_key, other_name, other_fingerprint):
+                        continue
+                    other_quick = quick_hash(other_name, size)
+                    self._update(other_key, quick=other_quick)
+                if other_quick != quick:
+                    continue
+                if not self.full_hash:
+                    if self._is_current(other_key, other_name, other_fingerprint):
+                        return other_name, md5
+                    continue
+            # Com um arquivo do Drive (ou com --full-hash), compara o MD5
+            if md5 is None:
+                md5 = full_hash(path)
+                metrics.incr("dedup_hashed_files")
+            if other_md5 is None:
+                if not other_local or not self._is_current(other_key, other_name, other_fingerprint):
+                    continue
+                other_md5 = full_hash(other_name)
+                self._update(other_key, md5=other_md5)
+            if other_md5 != md5:
+                continue
+            if not other_local:
+                if self._drive_exists(other_key, other_md5, other_seen):
+                    return f"{other_name} (Drive: {other_key[len('drive:'):]})", md5
+                continue
+            if self._is_current(other_key, other_name, other_fingerprint):
+                return other_name, md5
+        return None, md5
+
+    def _is_current(self, key: str, path: str, fingerprint: str) -> bool:
+        """
+        Verifica se um arquivo local indexado ainda existe sem alterações;
+        caso contrário, remove a sua entrada.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is not None and f"{stat.st_size}:{stat.st_mtime_ns}" == fingerprint:
+            return True
+        self._conn.execute("DELETE FROM hashes WHERE key = ?", (key,))
+        return False
+
+    def _drive_exists(self, key: str, md5: str, last_seen: float) -> bool:
+        """
+        Verifica se um arquivo do Drive indexado ainda existe, fora da
+        lixeira e com o mesmo conteúdo. Arquivos listados nesta execução (há
+        menos de DRIVE_RECHECK_INTERVAL) não são consultados; os que não
+        existem mais têm a sua entrada removida.
+        """
+        if last_seen >= max(self._started, time.time() - DRIVE_RECHECK_INTERVAL):
+            return True
+        if self.drive_client is None:
+            return False
+        file_id = key[len("drive:"):]
+        try:
+            drive_file = self.drive_client.get_file(file_id, fields="id, trashed, md5Checksum")
+        except Exception as e:
+            logging.warning(f"Não foi possível conferir o arquivo {file_id} no Drive: {e}")
+            return False
+        metrics.incr("dedup_drive_checks")
+        if drive_file is None or drive_file.get("trashed") or drive_file.get("md5Checksum") != md5:
+            self._conn.execute("DELETE FROM hashes WHERE key = ?", (key,))
+            return False
+        self._conn.execute("UPDATE hashes SET last_seen = ? WHERE key = ?", (time.time(), key))
+        return True
+
+    def _update(self, key: str, **hashes: str):
+        for column, value in hashes.items():
+            self._conn.execute(f"UPDATE hashes SET {column} = ? WHERE key = ?", (value, key))
+
+    def filter(self, files: Iterable[FileReference], skip: bool) -> Iterator[FileReference]:
+        """
+        Repassa os arquivos, informando as duplicatas encontradas e, se
+        'skip' for True, removendo-as antes do download e da extração.
+        """
+        skipped = skipped_bytes = 0
+        try:
+            for file_ref in files:
+                original = self.find_duplicate(file_ref)
+                if original is None:
+                    yield file_ref
+                    continue
+                if skip:
+                    logging.debug(f"Duplicata ignorada: {file_ref.local_path or file_ref.name} (igual a {original})")
+                    skipped += 1
+                    skipped_bytes += file_ref.size
+                else:
+                    logging.info(f"Duplicata: {file_ref.local_path or file_ref.name} é igual a {original}")
+                    yield file_ref
+        finally:
+            self.commit()
+        if skipped:
+            metrics.incr("duplicate_bytes_skipped", skipped_bytes)
+            logging.info(f"Ignoradas {skipped} duplicatas ({skipped_bytes / 1024 / 1024:.1f} MiB), "
+                         f"que não foram baixadas nem lidas.")
+
+    def move(self, old_path: str, new_path: str):
+        """
+        Atualiza a chave de um arquivo local renomeado, preservando os hashes.
+        """
+        new_path = os.path.abspath(new_path)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE OR REPLACE hashes SET key = ?, name = ? WHERE key = ?",
+                (f"local:{new_path}", new_path, f"local:{os.path.abspath(old_path)}"),
+            )
+
+    def commit(self):
+        """
+        Grava no disco as entradas adicionadas desde o último commit.
+        """
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        """
+        Remove as entradas vistas há mais tempo além de max_entries, grava
+        as alterações e fecha o banco.
+        """
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM hashes WHERE key IN "
+                    "(SELECT key FROM hashes ORDER BY last_seen LIMIT ?)", (excess,)
+                )
+            self._conn.commit()
+            self._conn.close()
+        if self.duplicates:
+            logging.info(f"Índice de hashes: {self.duplicates} duplicatas encontradas.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,21 +1,31 @@
 # main.py
+import sys
+import startup_profile
+# O perfil precisa ser instalado antes das demais importações para medi-las
+startup_profile.start_if_requested(sys.argv)
+
 import argparse
 import os
-import re
 import logging
 from dotenv import load_dotenv
-import utils
 
-# Importa nossas novas fontes e serviços
+# Importa nossas novas fontes e serviços. As fontes e estratégias concretas
+# são carregadas sob demanda pelo registry (ex: a pilha do Google só no Drive).
 from sources.base_source import BaseSource
-from sources.local_source import LocalSource
-from sources.drive_source import DriveSource
-from data_frame_service import DataFrameService
-from processing_service import (
-    BaseProcessor, ExifProcessor, ManualCorrectionProcessor
-)
+from sort_service import NAME_FORMATS, SORT_BACKENDS, get_sort_backend, merge_sorted_runs
+from exiftool_service import ExifToolPool
+from pipeline import Pipeline
+from metadata_cache import MetadataCache
+from hash_index import DEDUP_MODES, HashIndex
+from processing_service import BaseProcessor
+import metrics
+import registry
+import utils
+from rename_planner import plan_renames
+from rename_journal import JournaledRenamer, RenameJournal, latest_journal, load_journal
 
-def process_files(source: BaseSource, processor: BaseProcessor, args: argparse.Namespace):
+def process_files(source: BaseSource, processor: BaseProcessor, args: argparse.Namespace,
+                  hash_index: HashIndex = None):
     """
     Função de processamento de ponta a ponta que utiliza uma estratégia de
     processamento (Processor) para preparar os dados antes de renomear.
@@ -24,79 +34,313 @@ def process_files(source: BaseSource, processor: BaseProcessor, args: argparse.N
         source: A fonte dos dados (LocalSource ou DriveSource).
         processor: A estratégia de processamento a ser usada (ExifProcessor ou ManualCorrectionProcessor).
         args: Os argumentos parseados da linha de comando.
+        hash_index: O índice de hashes usado para encontrar duplicatas (--dedup), se houver.
     """
-    logging.info(f"Iniciando busca de arquivos da fonte: {source.__class__.__name__}")
-    files = source.get_files()
+    logging.info(f"Iniciando busca de arquivos da fonte: {source.__class__.__name__}. Usando processador: {processor.__class__.__name__}")
 
-    if not files:
+    # Descoberta, download e extração rodam em etapas sobrepostas
+    pipeline = Pipeline(source, processor, args, hash_index=hash_index)
+    photo_data = pipeline.collect()
+    if processor.errors:
+        logging.warning(f"{len(processor.errors)} arquivos não puderam ter os metadados extraídos e foram ignorados.")
+
+    if pipeline.discovered_count == 0:
         logging.warning("Nenhum arquivo encontrado na fonte especificada.")
+        source.cleanup()
         return
 
-    logging.info(f"Encontrados {len(files)} arquivos. Usando processador: {processor.__class__.__name__}")
-    
-    # Delegação da preparação dos dados para a estratégia escolhida
-    photo_data = processor.prepare_data(files, args)
-
     if not photo_data:
         logging.warning("Nenhum arquivo novo para processar após a preparação dos dados.")
-        if isinstance(source, DriveSource):
-            source.cleanup()
+        source.cleanup()
         return
 
     logging.info(f"Dados preparados para {len(photo_data)} fotos.")
     
-    df_service = DataFrameService(photo_data)
-    df_sorted = df_service.prepare_and_sort()
+    runs = source.partition(photo_data)
+    with metrics.stage("sort"):
+        if len(runs) > 1 and args.sort_backend == 'native':
+            # Várias fontes: cada uma é ordenada e as sequências são intercaladas em uma única linha do tempo
+            sorted_entries = merge_sorted_runs(runs, args.name_format)
+        else:
+            sort_photos = get_sort_backend(args.sort_backend)
+            sorted_entries = sort_photos(photo_data, args.name_format)
+
+    # O plano completo é calculado em memória antes de qualquer renomeação
+    with metrics.stage("rename"):
+        plan = plan_renames(sorted_entries)
+    metrics.incr("rename_collisions", plan.collisions)
+    metrics.incr("rename_cycles", plan.cycles)
+    if plan.cycles:
+        logging.info(f"{plan.cycles} ciclos de renomeação serão desfeitos com nomes temporários.")
+    if args.export_plan:
+        plan.export(args.export_plan)
+    if args.dry_run:
+        logging.info(f"Simulação: {len(plan)} renomeações planejadas; nenhum arquivo foi alterado.")
+        if plan:
+            print(plan.format())
+        source.cleanup()
+        return
 
     logging.info("Iniciando processo de renomeação...")
-    for index, row in df_sorted.iterrows():
-        # Constrói o nome base do arquivo
-        final_name_base = row['new_name_date']
-        if row.get('photographer'):
-            sanitized_name = utils.sanitize_for_filename(row['photographer'])
-            final_name_base = f"{final_name_base}_{sanitized_name}"
-        
-        original_local_path = row['original_path']
-        _, extension = os.path.splitext(original_local_path)
-        new_filename = f"{final_name_base}{extension.lower()}"
-
-        # --- A LÓGICA DE RENOMEAÇÃO ESTRATÉGICA ---
-        # Se remote_id existe, estamos lidando com o Google Drive
-        if row['remote_id']:
-            try:
-                # Usa o cliente do Drive (acessado através da 'source') para renomear na nuvem
-                source.drive_client.rename_file(
-                    file_id=row['remote_id'],
-                    new_name=new_filename
-                )
-            except Exception as e:
-                logging.error(f"Não foi possível renomear o arquivo {row['remote_id']} no Drive. Erro: {e}")
+    # O cache e o índice de hashes acompanham os novos caminhos dos arquivos locais
+    on_renamed = renamed_callback(processor.cache, hash_index)
+    # Usa o cliente do Drive (acessado através da 'source') para renomear na nuvem, em lotes
+    rename_drive = source.drive_client.rename_files if plan.drive_renames else None
 
-        # Se não, é um arquivo local
-        else:
-            dir_path = os.path.dirname(original_local_path)
-            new_path = os.path.join(dir_path, new_filename)
-
-            # Lógica para evitar sobrescrever arquivos
-            counter = 1
-            while os.path.exists(new_path):
-                new_filename_with_counter = f"{final_name_base}_{counter}{extension.lower()}"
-                new_path = os.path.join(dir_path, new_filename_with_counter)
-                counter += 1
-            
-            os.rename(original_local_path, new_path)
-            logging.info(f"Renomeado localmente: {os.path.basename(original_local_path)} -> {os.path.basename(new_path)}")
+    with metrics.stage("rename"):
+        if args.no_journal:
+            plan.apply_local(on_renamed)
+            if plan.drive_renames:
+                results = rename_drive([(rename.file_id, rename.new_name) for rename in plan.drive_renames])
+                for file_id, error in results.items():
+                    if error is not None:
+                        logging.error(f"Não foi possível renomear o arquivo {file_id} no Drive. Erro: {error}")
+        elif plan:
+            # As renomeações são registradas em um diário para poderem ser retomadas ou desfeitas
+            with RenameJournal.create(args.journal) as journal:
+                logging.info(f"Diário de renomeação: {journal.path}")
+                JournaledRenamer(journal, on_renamed, rename_drive).execute(plan)
+    # Os passos individuais só aparecem no nível DEBUG; aqui fica o resumo
+    logging.info(f"Renomeação concluída: {len(plan.local_renames)} arquivos locais e "
+                 f"{len(plan.drive_renames)} no Drive ({plan.collisions} com sufixo por conflito de nome).")
 
     # Limpa os arquivos temporários DEPOIS que todo o processamento terminou
-    if isinstance(source, DriveSource):
+    source.cleanup()
+
+def run_journal_action(args: argparse.Namespace, cache: MetadataCache = None):
+    """
+    Retoma ou desfaz uma execução a partir do seu diário de renomeação,
+    sem listar a fonte nem extrair metadados novamente.
+
+    Args:
+        args: Os argumentos parseados da linha de comando (ação 'resume' ou 'undo').
+        cache: O cache de metadados a ser atualizado com os novos caminhos, se houver.
+    """
+    journal_path = args.journal or latest_journal()
+    if not journal_path or not os.path.exists(journal_path):
+        logging.error("Erro: Nenhum diário de renomeação encontrado. Especifique-o com --journal.")
+        return
+    state = load_journal(journal_path)
+    logging.info(f"Usando o diário de renomeação: {journal_path}")
+
+    rename_drive = None
+    if state.drive:
+        credentials_path = args.credentials or os.getenv('GDRIVE_CREDENTIALS_PATH')
+        api_endpoint = os.getenv('GDRIVE_API_ENDPOINT')
+        if credentials_path or api_endpoint:
+            from drive_service import GoogleDriveClient
+            rename_drive = GoogleDriveClient(credentials_path, api_endpoint=api_endpoint).rename_files
+        else:
+            logging.warning("O diário contém renomeações no Drive; especifique --credentials para processá-las.")
+
+    on_renamed = renamed_callback(cache)
+    with RenameJournal(journal_path, run_id=state.run_id) as journal:
+        renamer = JournaledRenamer(journal, on_renamed, rename_drive)
+        if args.action == 'resume':
+            renamer.resume(state)
+        else:
+            renamer.undo(state)
+
+def renamed_callback(*stores):
+    """
+    Retorna a função chamada após cada renomeação local, que atualiza os
+    caminhos no cache e no índice de hashes (os que não forem None).
+    """
+    moves = [store.move for store in stores if store is not None]
+    if not moves:
+        return None
+
+    def on_renamed(old_path: str, new_path: str):
+        for move in moves:
+            move(old_path, new_path)
+    return on_renamed
+
+def run_watch(source: BaseSource, processor: BaseProcessor, args: argparse.Namespace,
+              hash_index: HashIndex = None):
+    """
+    Observa a fonte e processa os arquivos novos em pequenos lotes, até o
+    usuário encerrar com Ctrl+C (ou SIGTERM). O pool do ExifTool, o cache e o
+    cliente do Drive continuam abertos entre os lotes.
+
+    Args:
+        source: A fonte observada (LocalSource ou DriveSource).
+        processor: O ExifProcessor usado em todos os lotes.
+        hash_index: O índice de hashes usado para encontrar duplicatas (--dedup), se houver.
+        args: Os argumentos parseados da linha de comando.
+    """
+    import signal
+    import threading
+    from watch_service import BatchSource, watch
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    def handle_batch(files):
+        processor.errors.clear()
+        batch = BatchSource(source, files)
+        try:
+            process_files(batch, processor, args, hash_index)
+        except Exception:
+            # O lote continua pendente em watch(); as cópias baixadas são liberadas até a nova tentativa
+            batch.cleanup()
+            raise
+        finally:
+            # As métricas são acumuladas desde o início e regravadas a cada lote
+            export_metrics(args)
+
+    try:
+        watch(source, handle_batch, debounce=args.debounce, max_batch=args.max_batch,
+              poll_interval=args.poll_interval, stop=stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info("Modo watch encerrado.")
         source.cleanup()
 
+def export_metrics(args: argparse.Namespace):
+    """
+    Grava as métricas da execução em --metrics-out, se informado.
+    """
+    if args.metrics_out:
+        try:
+            metrics.current().write(args.metrics_out, args.metrics_format)
+        except OSError as e:
+            logging.error(f"Não foi possível gravar as métricas em {args.metrics_out}: {e}")
+
+def open_cache(args: argparse.Namespace) -> MetadataCache:
+    """
+    Abre o cache de metadados conforme as opções da linha de comando.
+
+    Returns:
+        O MetadataCache, ou None se o cache estiver desativado (--no-cache).
+    """
+    if args.no_cache:
+        return None
+    cache = MetadataCache(path=args.cache_path or os.getenv('OLAF_CACHE_PATH'))
+    if args.rebuild_cache:
+        cache.clear()
+    return cache
+
+def open_hash_index(args: argparse.Namespace, source: BaseSource) -> HashIndex:
+    """
+    Abre o índice de hashes se a busca por duplicatas estiver ativada.
+
+    Args:
+        args: Os argumentos parseados da linha de comando.
+        source: A fonte da execução; o seu cliente do Drive, se houver, confere
+                os arquivos do Drive indexados em execuções anteriores.
+
+    Returns:
+        O HashIndex, ou None se --dedup não for informado.
+    """
+    if not args.dedup:
+        return None
+    return HashIndex(path=args.dedup_index or os.getenv('OLAF_DEDUP_INDEX_PATH'), full_hash=args.full_hash,
+                     drive_client=getattr(source, 'drive_client', None))
+
+def create_local_source(args: argparse.Namespace, path: str) -> BaseSource:
+    """
+    Cria a fonte de uma pasta local conforme as opções da linha de comando.
+    """
+    LocalSource = registry.load_source('local')
+    return LocalSource(path=path, recursive=args.recursive, include=args.include, exclude=args.exclude,
+                       sidecars=args.group_pairs)
+
+def create_drive_source(args: argparse.Namespace, folder_id: str, credentials_path: str,
+                        disk_budget: int = None) -> BaseSource:
+    """
+    Cria a fonte de uma pasta do Drive conforme as opções da linha de comando.
+    """
+    DriveSource = registry.load_source('drive')
+    return DriveSource(
+        credentials_path=credentials_path,
+        folder_id=folder_id,
+        metadata_only=args.metadata_only,
+        header_only=args.header_only,
+        concurrency=args.concurrency,
+        recursive=args.recursive,
+        api_endpoint=os.getenv('GDRIVE_API_ENDPOINT'),
+        disk_budget=disk_budget,
+        in_memory=args.in_memory
+    )
+
 def main():
     """Ponto de entrada principal da aplicação."""
     logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
     load_dotenv()
 
     parser = argparse.ArgumentParser(description="OLAF - Otimizador de Logística de Arquivos de Fotografia.")
+
+    # Opções do cache de metadados, comuns a todas as fontes
+    cache_options = argparse.ArgumentParser(add_help=False)
+    cache_options.add_argument('--no-cache', action='store_true', help='Não usa o cache persistente de metadados.')
+    cache_options.add_argument('--rebuild-cache', action='store_true', help='Limpa o cache de metadados antes de processar.')
+    cache_options.add_argument('--cache-path', help='Caminho do banco do cache. Usa OLAF_CACHE_PATH do .env ou o diretório de cache do usuário.')
+
+    # Opções de execução, comuns a todas as fontes
+    run_options = argparse.ArgumentParser(add_help=False)
+    run_options.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                             help='Número de lotes extraídos em paralelo (padrão: número de CPUs).')
+    run_options.add_argument('--sort-backend', choices=SORT_BACKENDS, default='native',
+                             help='Motor de ordenação: "native" (padrão) ou "pandas" (requer o pandas instalado).')
+    run_options.add_argument('--name-format', choices=NAME_FORMATS, default='seconds',
+                             help='Precisão da data no novo nome: "seconds" (padrão) ou "milliseconds", '
+                                  'para rajadas com várias fotos no mesmo segundo.')
+    run_options.add_argument(startup_profile.FLAG, action='store_true',
+                             help='Mostra no stderr o tempo de importação de cada módulo na inicialização.')
+    run_options.add_argument('--dry-run', action='store_true',
+                             help='Apenas mostra o plano de renomeação, sem alterar nenhum arquivo.')
+    run_options.add_argument('--export-plan', metavar='ARQUIVO',
+                             help='Grava o plano de renomeação em um arquivo JSON.')
+    run_options.add_argument('--journal', metavar='ARQUIVO',
+                             help='Caminho do diário de renomeação (padrão: um arquivo novo em ~/.local/state/olaf/journals).')
+    run_options.add_argument('--no-journal', action='store_true',
+                             help='Renomeia sem registrar um diário (não permite retomar nem desfazer).')
+    run_options.add_argument('--metrics-out', metavar='ARQUIVO',
+                             help='Grava o tempo de cada etapa e os contadores da execução (JSON, ou texto do '
+                                  'Prometheus para arquivos .prom).')
+    run_options.add_argument('--metrics-format', choices=metrics.FORMATS,
+                             help='Formato de --metrics-out (padrão: deduzido da extensão).')
+    run_options.add_argument('--profile-stage', choices=metrics.STAGES,
+                             help='Perfila uma etapa e mostra o resultado no stderr ao final.')
+    run_options.add_argument('--profile-mode', choices=metrics.PROFILE_MODES, default='cprofile',
+                             help='Perfil de tempo por função ("cprofile", padrão) ou de memória ("tracemalloc").')
+    run_options.add_argument('--profile-out', metavar='ARQUIVO',
+                             help='Grava o perfil em um arquivo (formato do pstats no modo cprofile).')
+    run_options.add_argument('--group-pairs', action='store_true',
+                             help='Agrupa os arquivos da mesma captura (ex: DSC_0001.JPG, DSC_0001.NEF e DSC_0001.xmp): '
+                                  'os metadados são extraídos só do JPEG e o grupo é renomeado com o mesmo nome base.')
+    run_options.add_argument('--dedup', choices=DEDUP_MODES,
+                             help='Procura cópias de arquivos já vistos (nesta ou em outras execuções e fontes) antes '
+                                  'da extração: "report" apenas as informa, "skip" também as ignora.')
+    run_options.add_argument('--full-hash', action='store_true',
+                             help='Confirma as duplicatas locais com o hash do arquivo inteiro, e não só do início e do fim.')
+    run_options.add_argument('--dedup-index', metavar='ARQUIVO',
+                             help='Caminho do índice de hashes. Usa OLAF_DEDUP_INDEX_PATH do .env ou o diretório de cache do usuário.')
+
+    # Filtros da busca em pastas locais
+    filter_options = argparse.ArgumentParser(add_help=False)
+    filter_options.add_argument('--include', action='append', metavar='PADRÃO',
+                                help='Processa apenas os arquivos com esta extensão (ex: "mov") ou que casam com '
+                                     'este glob (ex: "*_final.*"). Pode ser repetido. Padrão: extensões de fotos.')
+    filter_options.add_argument('--exclude', action='append', metavar='PADRÃO',
+                                help='Ignora os arquivos e subpastas com esta extensão ou que casam com este glob. '
+                                     'Pode ser repetido.')
+
+    # Várias pastas locais e do Drive em uma única execução
+    multi_options = argparse.ArgumentParser(add_help=False)
+    multi_options.add_argument('--path', action='append', metavar='PASTA', help='Pasta local. Pode ser repetido.')
+    multi_options.add_argument('--folder-id', action='append', metavar='ID', help='ID de uma pasta do Drive. Pode ser repetido.')
+    multi_options.add_argument('--credentials', help='Caminho para credentials.json, se houver pastas do Drive. Usa GDRIVE_CREDENTIALS_PATH do .env.')
+    multi_options.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo do nome do arquivo.')
+    multi_options.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas, em todas as pastas.')
+    multi_options.add_argument('--concurrency', type=int, default=4, help='Número máximo de downloads simultâneos por pasta do Drive (padrão: 4).')
+    multi_options.add_argument('--header-only', action='store_true', help='Baixa apenas o cabeçalho dos arquivos do Drive (HTTP Range).')
+    multi_options.add_argument('--metadata-only', action='store_true', help='Usa a data de captura informada pela API do Drive.')
+    multi_options.add_argument('--disk-budget', type=utils.parse_size, metavar='TAMANHO',
+                               help='Espaço máximo ocupado pelos downloads ao mesmo tempo (ex: "2G"), dividido '
+                                    'igualmente entre as pastas do Drive.')
+    multi_options.add_argument('--in-memory', action='store_true', help='Mantém os downloads em memória, sem gravá-los em disco.')
     action_subparsers = parser.add_subparsers(dest='action', required=True, help="Ação a ser executada")
 
     # --- Ação 1: Processamento Padrão ---
@@ -104,37 +348,116 @@ def main():
     source_process_subparsers = parser_process.add_subparsers(dest='source', required=True, help="Fonte dos arquivos")
     
     # Processamento > Fonte Local
-    parser_process_local = source_process_subparsers.add_parser('local', help='Fonte: pasta local.')
+    parser_process_local = source_process_subparsers.add_parser('local', help='Fonte: pasta local.', parents=[cache_options, run_options, filter_options])
     parser_process_local.add_argument('--path', help='Caminho para a pasta. Usa LOCAL_PHOTOS_PATH do .env se não for especificado.')
     parser_process_local.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo do nome do arquivo.')
+    parser_process_local.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas.')
 
     # Processamento > Fonte Drive
-    parser_process_drive = source_process_subparsers.add_parser('drive', help='Fonte: Google Drive.')
+    parser_process_drive = source_process_subparsers.add_parser('drive', help='Fonte: Google Drive.', parents=[cache_options, run_options])
     parser_process_drive.add_argument('--folder-id', help='ID da pasta. Usa GDRIVE_FOLDER_ID do .env.')
     parser_process_drive.add_argument('--credentials', help='Caminho para credentials.json. Usa GDRIVE_CREDENTIALS_PATH do .env.')
     parser_process_drive.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo do nome do arquivo.')
+    parser_process_drive.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas.')
+    parser_process_drive.add_argument('--concurrency', type=int, default=4, help='Número máximo de downloads simultâneos (padrão: 4).')
+    parser_process_drive.add_argument('--header-only', action='store_true', help='Baixa apenas o cabeçalho dos arquivos (HTTP Range) para ler os metadados.')
+    parser_process_drive.add_argument('--metadata-only', action='store_true', help='Usa a data de captura informada pela API do Drive e só baixa os arquivos sem essa informação.')
+    parser_process_drive.add_argument('--disk-budget', type=utils.parse_size, metavar='TAMANHO',
+                                      help='Espaço máximo ocupado pelos downloads ao mesmo tempo (ex: "2G"); '
+                                           'os downloads esperam enquanto o limite estiver cheio.')
+    parser_process_drive.add_argument('--in-memory', action='store_true', help='Mantém os downloads em memória, sem gravá-los em disco.')
+
+    # Processamento > Várias Fontes
+    source_process_subparsers.add_parser('multi', help='Fontes: várias pastas locais e do Drive, em uma única linha do tempo.',
+                                         parents=[cache_options, run_options, filter_options, multi_options])
 
     # --- Ação 2: Correção Manual de Data ---
     parser_fixdate = action_subparsers.add_parser('fixdate', help='Renomeia arquivos usando uma data base e um offset de horário.')
     source_fixdate_subparsers = parser_fixdate.add_subparsers(dest='source', required=True, help="Fonte dos arquivos")
     
     # Fixdate > Fonte Local
-    parser_fixdate_local = source_fixdate_subparsers.add_parser('local', help='Fonte: pasta local.')
+    parser_fixdate_local = source_fixdate_subparsers.add_parser('local', help='Fonte: pasta local.', parents=[cache_options, run_options, filter_options])
     parser_fixdate_local.add_argument('--path', help='Caminho para a pasta.')
     parser_fixdate_local.add_argument('--date', required=True, help='Data base no formato AAAA-MM-DD.')
     parser_fixdate_local.add_argument('--offset', required=True, help='Offset de horário (ex: "+2h", "-1h30m").')
     parser_fixdate_local.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo.')
+    parser_fixdate_local.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas.')
     
     # Fixdate > Fonte Drive
-    parser_fixdate_drive = source_fixdate_subparsers.add_parser('drive', help='Fonte: Google Drive.')
+    parser_fixdate_drive = source_fixdate_subparsers.add_parser('drive', help='Fonte: Google Drive.', parents=[cache_options, run_options])
     parser_fixdate_drive.add_argument('--folder-id', help='ID da pasta do Drive.')
     parser_fixdate_drive.add_argument('--credentials', help='Caminho para as credenciais.')
     parser_fixdate_drive.add_argument('--date', required=True, help='Data base no formato AAAA-MM-DD.')
     parser_fixdate_drive.add_argument('--offset', required=True, help='Offset de horário (ex: "+2h", "-1h30m").')
     parser_fixdate_drive.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo.')
+    parser_fixdate_drive.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas.')
+    parser_fixdate_drive.add_argument('--concurrency', type=int, default=4, help='Número máximo de downloads simultâneos (padrão: 4).')
+    parser_fixdate_drive.add_argument('--header-only', action='store_true', help='Baixa apenas o cabeçalho dos arquivos (HTTP Range).')
+    parser_fixdate_drive.add_argument('--metadata-only', action='store_true', help='Usa a data de captura informada pela API do Drive.')
+    parser_fixdate_drive.add_argument('--disk-budget', type=utils.parse_size, metavar='TAMANHO',
+                                      help='Espaço máximo ocupado pelos downloads ao mesmo tempo (ex: "2G"); '
+                                           'os downloads esperam enquanto o limite estiver cheio.')
+    parser_fixdate_drive.add_argument('--in-memory', action='store_true', help='Mantém os downloads em memória, sem gravá-los em disco.')
+
+    # Fixdate > Várias Fontes
+    parser_fixdate_multi = source_fixdate_subparsers.add_parser('multi', help='Fontes: várias pastas locais e do Drive.',
+                                                                parents=[cache_options, run_options, filter_options, multi_options])
+    parser_fixdate_multi.add_argument('--date', required=True, help='Data base no formato AAAA-MM-DD.')
+    parser_fixdate_multi.add_argument('--offset', required=True, help='Offset de horário (ex: "+2h", "-1h30m").')
+
+    # --- Ação 3: Observar a fonte e processar apenas os arquivos novos ---
+    watch_options = argparse.ArgumentParser(add_help=False)
+    watch_options.add_argument('--extract-name', action='store_true', help='Extrai o nome do fotógrafo do nome do arquivo.')
+    watch_options.add_argument('--debounce', type=float, default=2.0,
+                               help='Segundos sem arquivos novos antes de processar o lote (padrão: 2).')
+    watch_options.add_argument('--max-batch', type=int, default=200,
+                               help='Número máximo de arquivos por lote (padrão: 200).')
+    watch_options.add_argument('--poll-interval', type=float, default=15.0,
+                               help='Segundos entre consultas ao Drive, ou entre listagens da pasta local '
+                                    'quando o inotify não estiver disponível (padrão: 15).')
+    parser_watch = action_subparsers.add_parser('watch', help='Observa a fonte e renomeia os arquivos novos assim que chegam.')
+    source_watch_subparsers = parser_watch.add_subparsers(dest='source', required=True, help="Fonte dos arquivos")
+
+    # Watch > Fonte Local
+    parser_watch_local = source_watch_subparsers.add_parser('local', help='Fonte: pasta local.', parents=[cache_options, run_options, watch_options, filter_options])
+    parser_watch_local.add_argument('--path', help='Caminho para a pasta. Usa LOCAL_PHOTOS_PATH do .env se não for especificado.')
+    # O modo watch observa apenas a pasta indicada, sem as subpastas
+    parser_watch_local.set_defaults(recursive=False)
+
+    # Watch > Fonte Drive
+    parser_watch_drive = source_watch_subparsers.add_parser('drive', help='Fonte: Google Drive.', parents=[cache_options, run_options, watch_options])
+    parser_watch_drive.add_argument('--folder-id', help='ID da pasta. Usa GDRIVE_FOLDER_ID do .env.')
+    parser_watch_drive.add_argument('--credentials', help='Caminho para credentials.json. Usa GDRIVE_CREDENTIALS_PATH do .env.')
+    parser_watch_drive.add_argument('--recursive', action='store_true', help='Inclui os arquivos das subpastas.')
+    parser_watch_drive.add_argument('--concurrency', type=int, default=4, help='Número máximo de downloads simultâneos (padrão: 4).')
+    parser_watch_drive.add_argument('--header-only', action='store_true', help='Baixa apenas o cabeçalho dos arquivos (HTTP Range) para ler os metadados.')
+    parser_watch_drive.add_argument('--metadata-only', action='store_true', help='Usa a data de captura informada pela API do Drive e só baixa os arquivos sem essa informação.')
+    parser_watch_drive.add_argument('--disk-budget', type=utils.parse_size, metavar='TAMANHO',
+                                    help='Espaço máximo ocupado pelos downloads ao mesmo tempo (ex: "2G"); '
+                                         'os downloads esperam enquanto o limite estiver cheio.')
+    parser_watch_drive.add_argument('--in-memory', action='store_true', help='Mantém os downloads em memória, sem gravá-los em disco.')
+
+    # --- Ações 4 e 5: Retomar ou desfazer uma execução pelo diário ---
+    for action, help_text in (('resume', 'Conclui as renomeações de uma execução interrompida.'),
+                              ('undo', 'Desfaz as renomeações de uma execução.')):
+        parser_journal = action_subparsers.add_parser(action, help=help_text, parents=[cache_options])
+        parser_journal.add_argument('--journal', help='Caminho do diário. Usa o diário mais recente se não for especificado.')
+        parser_journal.add_argument('--credentials', help='Caminho para credentials.json, se o diário tiver renomeações no Drive.')
 
     args = parser.parse_args()
 
+    if args.action in ('resume', 'undo'):
+        cache = open_cache(args)
+        try:
+            run_journal_action(args, cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if args.profile_stage:
+        metrics.enable_profiling(args.profile_stage, args.profile_mode)
+
     # --- Seleção da Estratégia e da Fonte ---
     source = None
     processor = None
@@ -144,22 +467,66 @@ def main():
         if not local_path:
             logging.error("Erro: Especifique o caminho com --path ou defina LOCAL_PHOTOS_PATH no .env")
             return
-        source = LocalSource(path=local_path)
+        source = create_local_source(args, local_path)
     elif args.source == 'drive':
         folder_id = args.folder_id or os.getenv('GDRIVE_FOLDER_ID')
         credentials_path = args.credentials or os.getenv('GDRIVE_CREDENTIALS_PATH')
-        if not folder_id or not credentials_path:
+        if not folder_id or not (credentials_path or os.getenv('GDRIVE_API_ENDPOINT')):
             logging.error("Erro: Especifique --folder-id e --credentials ou defina as variáveis no .env")
             return
-        source = DriveSource(credentials_path=credentials_path, folder_id=folder_id)
+        source = create_drive_source(args, folder_id, credentials_path, args.disk_budget)
+    elif args.source == 'multi':
+        paths = args.path or []
+        folder_ids = args.folder_id or []
+        credentials_path = args.credentials or os.getenv('GDRIVE_CREDENTIALS_PATH')
+        if not paths and not folder_ids:
+            logging.error("Erro: Especifique pelo menos um --path ou --folder-id.")
+            return
+        if folder_ids and not (credentials_path or os.getenv('GDRIVE_API_ENDPOINT')):
+            logging.error("Erro: Especifique --credentials ou defina GDRIVE_CREDENTIALS_PATH no .env")
+            return
+        # O orçamento de downloads é dividido entre as pastas do Drive
+        disk_budget = args.disk_budget // len(folder_ids) if args.disk_budget and folder_ids else args.disk_budget
+        sources = [create_local_source(args, path) for path in paths]
+        sources += [create_drive_source(args, folder_id, credentials_path, disk_budget) for folder_id in folder_ids]
+        CompositeSource = registry.load_source('multi')
+        source = CompositeSource(sources)
+
+    cache = open_cache(args)
+    hash_index = open_hash_index(args, source)
 
-    if args.action == 'process':
-        processor = ExifProcessor()
-    elif args.action == 'fixdate':
-        processor = ManualCorrectionProcessor(base_date_str=args.date, offset_str=args.offset)
+    # Pool de processos ExifTool persistentes, compartilhado por toda a execução
+    try:
+        with ExifToolPool(size=args.workers) as exiftool_pool:
+            # O modo watch usa a mesma estratégia do processamento padrão
+            processor_name = 'process' if args.action == 'watch' else args.action
+            Processor = registry.load_processor(processor_name)
+            if processor_name == 'process':
+                processor = Processor(
+                    pool=exiftool_pool, cache=cache, fetch_all=source.fetch_all, workers=args.workers,
+                    release=source.release, release_each=source.bounded_downloads
+                )
+            elif args.action == 'fixdate':
+                processor = Processor(
+                    base_date_str=args.date, offset_str=args.offset, pool=exiftool_pool, cache=cache,
+                    fetch_all=source.fetch_all, workers=args.workers, release=source.release,
+                    release_each=source.bounded_downloads
+                )
 
-    if source and processor:
-        process_files(source, processor, args)
+            startup_profile.finish()
+            if args.action == 'watch':
+                run_watch(source, processor, args, hash_index)
+            elif source and processor:
+                process_files(source, processor, args, hash_index)
+    finally:
+        if cache is not None:
+            cache.close()
+        if hash_index is not None:
+            hash_index.close()
+        export_metrics(args)
+        profiler = metrics.current().profiler
+        if profiler is not None:
+            print(profiler.report(args.profile_out), file=sys.stderr)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
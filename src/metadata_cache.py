@@ -0,0 +1,189 @@
+# src/metadata_cache.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import metrics
+from sources.base_source import FileReference
+
+# Número máximo de entradas mantidas no cache antes da remoção das menos usadas.
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+def default_cache_path() -> str:
+    """
+    Retorna o caminho padrão do banco de cache, dentro do diretório de cache
+    do usuário (XDG_CACHE_HOME ou ~/.cache).
+    """
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "olaf", "metadata.sqlite3")
+
+
+def file_identity(file_ref: FileReference) -> Optional[Tuple[str, str]]:
+    """
+    Calcula a identidade de um arquivo para o cache.
+
+    Arquivos locais são identificados pelo caminho absoluto, com tamanho e
+    data de modificação como impressão digital. Arquivos do Drive são
+    identificados pelo ID, com o md5Checksum (ou modifiedTime) como impressão
+    digital.
+
+    Returns:
+        Uma tupla (chave, impressão digital), ou None se o arquivo não tiver
+        informações suficientes para ser armazenado em cache.
+    """
+    if file_ref.remote_id:
+        fingerprint = file_ref.checksum or file_ref.modified_time
+        if not fingerprint:
+            return None
+        return f"drive:{file_ref.remote_id}", fingerprint
+    if file_ref.local_path and file_ref.size is not None and file_ref.modified_time:
+        key = f"local:{os.path.abspath(file_ref.local_path)}"
+        return key, f"{file_ref.size}:{file_ref.modified_time}"
+    return None
+
+
+class MetadataCache:
+    """
+    Cache persistente (SQLite) dos metadados extraídos de cada arquivo.
+
+    Uma entrada só é válida enquanto a impressão digital do arquivo não mudar;
+    qualquer alteração de tamanho, data de modificação ou checksum a invalida.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: Caminho do banco SQLite. Se None, usa default_cache_path().
+            max_entries: Número máximo de entradas; as menos usadas recentemente
+                         são removidas ao fechar o cache.
+        """
+        self.path = path or default_cache_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " tags TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata(last_used)")
+        self._conn.commit()
+
+    def get(self, file_ref: FileReference, tags: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Busca o registro de um arquivo no cache.
+
+        Args:
+            file_ref: O arquivo a ser consultado.
+            tags: As tags necessárias. A entrada só é usada se tiver sido
+                  extraída com (pelo menos) estas tags.
+
+        Returns:
+            O registro (tag -> valor) ou None se não houver entrada válida.
+        """
+        identity = file_identity(file_ref)
+        if identity is None:
+            return None
+        key, fingerprint = identity
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, tags, record FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] != fingerprint or not set(tags).issubset(json.loads(row[1])):
+                self.misses += 1
+                metrics.incr("cache_misses")
+                return None
+            self._conn.execute("UPDATE metadata SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        metrics.incr("cache_hits")
+        record = json.loads(row[2])
+        return {tag: record[tag] for tag in tags if tag in record}
+
+    def put(self, file_ref: FileReference, tags: Iterable[str], record: Dict[str, Any]):
+        """
+        Armazena o registro extraído de um arquivo.
+
+        Args:
+            file_ref: O arquivo de onde o registro foi extraído.
+            tags: As tags que foram pedidas na extração.
+            record: O registro extraído (tag -> valor).
+        """
+        identity = file_identity(file_ref)
+        if identity is None:
+            return
+        key, fingerprint = identity
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, fingerprint, tags, record, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(sorted(tags)), json.dumps(record), time.time()),
+            )
+
+    def move(self, old_path: str, new_path: str):
+        """
+        Atualiza a chave de um arquivo local renomeado, preservando a entrada
+        (a renomeação não altera tamanho nem data de modificação).
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE OR REPLACE metadata SET key = ? WHERE key = ?",
+                (f"local:{os.path.abspath(new_path)}", f"local:{os.path.abspath(old_path)}"),
+            )
+
+    def commit(self):
+        """
+        Grava no disco as entradas adicionadas desde o último commit.
+        """
+        with self._lock:
+            self._conn.commit()
+
+    def clear(self):
+        """
+        Remove todas as entradas do cache.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+            self._conn.commit()
+        logging.info(f"Cache de metadados limpo: {self.path}")
+
+    def evict(self):
+        """
+        Remove as entradas menos usadas recentemente além de max_entries.
+        """
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE key IN "
+                    "(SELECT key FROM metadata ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                logging.info(f"Removidas {excess} entradas antigas do cache de metadados.")
+            self._conn.commit()
+
+    def close(self):
+        """
+        Aplica a remoção por tamanho, grava as alterações e fecha o banco.
+        """
+        self.evict()
+        with self._lock:
+            self._conn.close()
+        logging.info(f"Cache de metadados: {self.hits} acertos, {self.misses} falhas.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,332 @@
+# src/metrics.py
+
+import bisect
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Etapas medidas. list, sort e rename rodam uma vez por execução; download
+# (por arquivo) e extract (por lote) são medidas a cada item, possivelmente
+# em várias threads ao mesmo tempo, e o total pode passar do tempo de parede.
+STAGES = ("list", "download", "extract", "sort", "rename")
+FORMATS = ("json", "prometheus")
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# Limites (em segundos) dos baldes dos histogramas de duração.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMETHEUS_PREFIX = "olaf"
+
+
+class Histogram:
+    """
+    Histograma cumulativo no formato do Prometheus (baldes "menor ou igual a").
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[int]:
+        """Contagens acumuladas por balde, terminando no balde +Inf."""
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+        return {"count": self.count, "sum": self.sum, "buckets": dict(zip(labels, self.cumulative()))}
+
+
+class StageProfiler:
+    """
+    Perfila uma etapa com cProfile (tempo de CPU por função) ou tracemalloc
+    (alocações de memória).
+
+    Com cProfile, cada thread que executa a etapa usa o seu próprio perfil, e
+    os perfis são combinados no relatório. O tracemalloc é global: enquanto a
+    etapa estiver ativa em alguma thread, as alocações das demais também são
+    contadas. O relatório mostra o pico de memória durante a etapa e as
+    alocações ainda vivas ao fim da última execução dela.
+    """
+
+    def __init__(self, stage: str, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfil desconhecido: '{mode}'. Use um de: {', '.join(PROFILE_MODES)}.")
+        self.stage = stage
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = []
+        self._active = 0
+        self._baseline = None
+        self._snapshot = None
+        self._peak = 0
+
+    def enter(self):
+        if self.mode == "cprofile":
+            profile = getattr(self._local, "profile", None)
+            if profile is None:
+                import cProfile
+                profile = self._local.profile = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append(profile)
+            try:
+                profile.enable()
+                self._local.enabled = True
+            except ValueError:
+                # A partir do Python 3.12 só um perfil pode estar ativo por
+                # vez; o perfil já ativo em outra thread cobre este trecho
+                self._local.enabled = False
+            return
+        import tracemalloc
+        with self._lock:
+            if self._baseline is None:
+                tracemalloc.start(25)
+                self._baseline = tracemalloc.take_snapshot()
+            if self._active == 0:
+                tracemalloc.reset_peak()
+            self._active += 1
+
+    def exit(self):
+        if self.mode == "cprofile":
+            if self._local.enabled:
+                self._local.profile.disable()
+            return
+        import tracemalloc
+        with self._lock:
+            self._active -= 1
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            if self._active == 0:
+                self._snapshot = tracemalloc.take_snapshot()
+
+    def report(self, path: Optional[str] = None, limit: int = 25) -> str:
+        """
+        Monta o relatório do perfil. Com cProfile, 'path' (se informado)
+        recebe os dados brutos no formato do pstats.
+
+        Returns:
+            O resumo em texto.
+        """
+        header = f"Perfil ({self.mode}) da etapa '{self.stage}':"
+        if self.mode == "cprofile":
+            if not self._profiles:
+                return f"{header} a etapa não foi executada."
+            import pstats
+            output = io.StringIO()
+            stats = pstats.Stats(*self._profiles, stream=output)
+            if path:
+                stats.dump_stats(path)
+            stats.sort_stats("cumulative").print_stats(limit)
+            return f"{header}\n{output.getvalue()}"
+
+        if self._snapshot is None:
+            return f"{header} a etapa não foi executada."
+        import tracemalloc
+        tracemalloc.stop()
+        lines = [f"{header} pico de {self._peak / 1024 / 1024:.1f} MiB rastreados."]
+        for stat in self._snapshot.compare_to(self._baseline, "lineno")[:limit]:
+            lines.append(str(stat))
+        text = "\n".join(lines)
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+        return text
+
+
+class Metrics:
+    """
+    Métricas de uma execução: tempo por etapa, contadores e histogramas de
+    duração. Seguro para uso em várias threads.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        # etapa -> [segundos acumulados, execuções]
+        self.stages: Dict[str, List[float]] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.profiler: Optional[StageProfiler] = None
+
+    def incr(self, name: str, amount: float = 1):
+        """Soma 'amount' ao contador 'name'."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_stage(self, stage: str, seconds: float, runs: int = 1, observe: bool = True):
+        """
+        Acumula o tempo de uma etapa e, se 'observe', registra a duração no
+        histograma da etapa.
+        """
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += runs
+            if observe:
+                self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mede um trecho de uma etapa (e o perfila, se for a etapa escolhida).
+        """
+        profiler = self.profiler if self.profiler is not None and self.profiler.stage == name else None
+        if profiler is not None:
+            profiler.enter()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.exit()
+            self.record_stage(name, elapsed)
+
+    def timed_iter(self, iterable: Iterable, stage: str) -> Iterator:
+        """
+        Repassa os itens de 'iterable' medindo apenas o tempo gasto para
+        produzi-los (não o tempo do consumidor), registrado como uma única
+        execução da etapa ao final.
+        """
+        profiler = self.profiler if self.profiler is not None and self.profiler.stage == stage else None
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                if profiler is not None:
+                    profiler.enter()
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                    if profiler is not None:
+                        profiler.exit()
+                yield item
+        finally:
+            self.record_stage(stage, elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Retorna as métricas em uma estrutura serializável em JSON."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "wall_seconds": time.perf_counter() - self._start,
+                "stages": {name: {"seconds": seconds, "runs": int(runs)} for name, (seconds, runs) in self.stages.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """Retorna as métricas no formato texto do Prometheus (textfile collector)."""
+        data = self.to_dict()
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_run_started_seconds Início da execução (epoch).",
+            f"# TYPE {PROMETHEUS_PREFIX}_run_started_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_started_seconds {data['started']:.3f}",
+            f"# HELP {PROMETHEUS_PREFIX}_run_wall_seconds Duração da execução.",
+            f"# TYPE {PROMETHEUS_PREFIX}_run_wall_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_wall_seconds {data['wall_seconds']:.6f}",
+            f"# HELP {PROMETHEUS_PREFIX}_stage_seconds_total Tempo acumulado em cada etapa.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter",
+        ]
+        for name, stage in sorted(data["stages"].items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_total{{stage="{name}"}} {stage["seconds"]:.6f}')
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_runs_total Execuções de cada etapa (arquivos, lotes ou uma vez por execução).",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_runs_total counter",
+        ]
+        for name, stage in sorted(data["stages"].items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_runs_total{{stage="{name}"}} {stage["runs"]}')
+        for name, value in sorted(data["counters"].items()):
+            metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        metric = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+        lines += [f"# HELP {metric} Duração de cada execução das etapas.", f"# TYPE {metric} histogram"]
+        for name, histogram in sorted(data["histograms"].items()):
+            for bucket, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bucket}"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, fmt: Optional[str] = None):
+        """
+        Grava as métricas em 'path', de forma atômica (o coletor de arquivos
+        do Prometheus nunca lê um arquivo pela metade).
+
+        Args:
+            path: Arquivo de destino.
+            fmt: "json" ou "prometheus". Se None, usa "prometheus" para
+                 arquivos .prom e "json" para os demais.
+        """
+        fmt = fmt or ("prometheus" if path.endswith(".prom") else "json")
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de métricas desconhecido: '{fmt}'. Use um de: {', '.join(FORMATS)}.")
+        content = self.to_prometheus() if fmt == "prometheus" else json.dumps(self.to_dict(), indent=2) + "\n"
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        os.replace(temp_path, path)
+        logging.info(f"Métricas gravadas em: {path}")
+
+
+# Métricas da execução atual, usadas por todos os módulos.
+_metrics = Metrics()
+
+
+def current() -> Metrics:
+    """Retorna as métricas da execução atual."""
+    return _metrics
+
+
+def reset() -> Metrics:
+    """Descarta as métricas acumuladas e começa uma nova coleta."""
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+
+def incr(name: str, amount: float = 1):
+    """Soma 'amount' ao contador 'name' da execução atual."""
+    _metrics.incr(name, amount)
+
+
+def stage(name: str):
+    """Mede um trecho da etapa 'name' (ver Metrics.stage)."""
+    return _metrics.stage(name)
+
+
+def timed_iter(iterable: Iterable, stage_name: str) -> Iterator:
+    """Mede o tempo de produção dos itens (ver Metrics.timed_iter)."""
+    return _metrics.timed_iter(iterable, stage_name)
+
+
+def enable_profiling(stage_name: str, mode: str = "cprofile"):
+    """
+    Ativa o perfil de uma etapa na execução atual.
+
+    Raises:
+        ValueError: Se a etapa ou o modo não existirem.
+    """
+    if stage_name not in STAGES:
+        raise ValueError(f"Etapa desconhecida: '{stage_name}'. Use uma de: {', '.join(STAGES)}.")
+    _metrics.profiler = StageProfiler(stage_name, mode)
@@ -0,0 +1,178 @@
+# src/pipeline.py
+
+import logging
+import queue
+import threading
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional
+
+from sources.base_source import BaseSource, FileReference
+from processing_service import BaseProcessor
+from hash_index import HashIndex
+from capture_groups import CaptureGrouper
+import metrics
+
+# Número máximo de referências descobertas aguardando a etapa de extração.
+DEFAULT_QUEUE_SIZE = 1000
+
+_END = object()
+
+
+class PhotoEntry(NamedTuple):
+    """
+    Registro compacto de uma foto, com apenas o necessário para a ordenação
+    e a renomeação.
+    """
+    date: str
+    local_path: Optional[str]
+    name: str
+    remote_id: Optional[str]
+    photographer: Optional[str]
+    # Detalhes para ordenar fotos do mesmo segundo (ver processing_service.capture_details)
+    subsec: Optional[str] = None
+    offset: Optional[str] = None
+    sequence: Optional[Any] = None
+
+
+def run_in_background(iterable: Iterable, maxsize: int, name: str) -> Iterator:
+    """
+    Consome um iterável em uma thread separada e repassa seus itens por uma
+    fila limitada, permitindo que o produtor avance enquanto o consumidor
+    trabalha. Exceções do produtor são propagadas ao consumidor.
+
+    Args:
+        iterable: O iterável produtor (ex: a descoberta de arquivos da fonte).
+        maxsize: Tamanho máximo da fila entre as etapas.
+        name: Nome da thread, usado nos logs.
+    """
+    items: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    failure: List[BaseException] = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            yield item
+        if failure:
+            raise failure[0]
+    finally:
+        stop.set()
+        thread.join()
+
+
+class Pipeline:
+    """
+    Pipeline em etapas com filas limitadas entre elas:
+    descoberta -> obtenção -> extração -> coleta.
+
+    A descoberta roda em uma thread própria e alimenta a extração enquanto
+    continua listando a fonte; a obtenção (download) e a extração ficam a
+    cargo do processador, em lotes. Ao final, apenas registros PhotoEntry
+    compactos são mantidos para a ordenação e a renomeação.
+    """
+
+    def __init__(self, source: BaseSource, processor: BaseProcessor, args: Any,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, hash_index: Optional[HashIndex] = None):
+        """
+        Args:
+            source: A fonte dos arquivos.
+            processor: A estratégia de processamento usada na extração.
+            args: Os argumentos da linha de comando.
+            queue_size: Tamanho da fila entre a descoberta e a extração.
+            hash_index: Índice de hashes consultado na descoberta (--dedup).
+                        As duplicatas são informadas ou, com "skip", removidas
+                        antes de serem baixadas ou lidas.
+        """
+        self.source = source
+        self.processor = processor
+        self.args = args
+        self.queue_size = queue_size
+        self.hash_index = hash_index
+        self.discovered_count = 0
+
+    def discover(self) -> Iterator[FileReference]:
+        """
+        Gera as referências da fonte, descobertas em segundo plano.
+        """
+        # Só o tempo gasto listando a fonte conta para a etapa, não a espera na fila
+        listing = metrics.timed_iter(self.source.iter_files(), "list")
+        if self.hash_index is not None:
+            # Os hashes são calculados na mesma thread da descoberta
+            listing = self.hash_index.filter(listing, skip=self.args.dedup == "skip")
+        for file_ref in run_in_background(listing, self.queue_size, "olaf-discovery"):
+            self.discovered_count += 1
+            yield file_ref
+
+    def collect(self) -> List[PhotoEntry]:
+        """
+        Executa as etapas de descoberta, obtenção e extração e retorna os
+        registros compactos das fotos com data válida.
+
+        Com --group-pairs, os arquivos da mesma captura (ex: RAW + JPEG e
+        sidecars) são agrupados antes da extração, que é feita uma única vez
+        por grupo (ver capture_groups).
+        """
+        entries = []
+        if self.args.group_pairs:
+            self._collect_groups(self.discover(), entries)
+        else:
+            for data in self.processor.iter_data(self.discover(), self.args):
+                entries.append(self._entry(data))
+        metrics.incr("files_discovered", self.discovered_count)
+        metrics.incr("files_with_date", len(entries))
+        logging.info(f"Descobertos {self.discovered_count} arquivos; {len(entries)} com data válida.")
+        return entries
+
+    def _collect_groups(self, files: Iterable[FileReference], entries: List[PhotoEntry]):
+        """
+        Extrai apenas o membro principal de cada captura e gera os registros
+        de todos os membros a partir dele.
+        """
+        grouped = 0
+        while files:
+            grouper = CaptureGrouper()
+            for data in self.processor.iter_data(grouper.leaders(files), self.args):
+                entries.extend(self._entry(item) for item in grouper.expand(data))
+                entries.extend(self._entry(item) for item in grouper.drain())
+            entries.extend(self._entry(item) for item in grouper.drain())
+            grouped += grouper.followers
+            # Se o principal de um grupo não tiver data, tenta os outros membros
+            files = grouper.orphans()
+        if grouped:
+            metrics.incr("files_grouped", grouped)
+            logging.info(f"{grouped} arquivos usaram os metadados de outro arquivo da mesma captura.")
+
+    @staticmethod
+    def _entry(data: dict) -> PhotoEntry:
+        return PhotoEntry(
+            date=data['date'],
+            local_path=data['local_path'],
+            name=data['name'],
+            remote_id=data['remote_id'],
+            photographer=data['photographer'],
+            subsec=data.get('subsec'),
+            offset=data.get('offset'),
+            sequence=data.get('sequence'),
+        )
@@ -1,23 +1,126 @@
 # src/processing_service.py
 
 import logging
-import re
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
 
 # Importações de outros módulos do nosso projeto
-from sources.base_source import FileReference
-from raw_service import ExifMetadataExtractor
+from sources.base_source import FileReference, fetch_sequentially
+from raw_service import ExifMetadataExtractor, BATCH_SIZE
+from exiftool_service import ExifToolPool
+from metadata_cache import MetadataCache
+import exif_reader
+import metrics
 import utils
 import time_service  # Nosso novo serviço de tempo
 
+# Tag com a data de captura usada na renomeação.
+DATE_TAG = "CreateDate"
+# Tags extraídas quando disponíveis, para ordenar rajadas dentro do mesmo
+# segundo: frações de segundo, fuso horário e número de sequência da câmera.
+# As variantes "Digitized" acompanham a CreateDate; as demais são alternativas.
+# O número de sequência é lido pelo leitor rápido só nas câmeras Canon e
+# Fujifilm (ver exif_reader.SEQUENCE_TAG); nas demais, só vem do ExifTool.
+SUBSEC_TAGS = ("SubSecTimeDigitized", "SubSecTime")
+OFFSET_TAGS = ("OffsetTimeDigitized", "OffsetTime")
+SEQUENCE_TAG = exif_reader.SEQUENCE_TAG
+CAPTURE_OPTIONAL_TAGS = (*SUBSEC_TAGS, *OFFSET_TAGS, SEQUENCE_TAG)
+# Quantidade de arquivos baixados acumulados antes de cada extração.
+FETCHED_BATCH_SIZE = 8
+# Tamanho dos lotes no modo paralelo: menor que BATCH_SIZE para distribuir
+# melhor o trabalho entre os workers.
+PARALLEL_BATCH_SIZE = 50
+
+
+class WorkerStats:
+    """
+    Acumula, por thread, o número de arquivos processados e o tempo gasto,
+    para relatar a vazão de cada worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[float]] = {}
+
+    def timed(self, func: Callable[..., List[Dict[str, Any]]],
+              chunk: List[FileReference], *args) -> List[Dict[str, Any]]:
+        """Executa func(chunk, *args) e registra o tempo gasto pela thread atual."""
+        start = time.perf_counter()
+        try:
+            return func(chunk, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                totals = self._totals.setdefault(threading.current_thread().name, [0, 0.0])
+                totals[0] += len(chunk)
+                totals[1] += elapsed
+
+    def log(self):
+        """Registra no log a vazão de cada worker."""
+        for name, (count, elapsed) in sorted(self._totals.items()):
+            rate = count / elapsed if elapsed > 0 else 0.0
+            logging.info(f"Worker {name}: {int(count)} arquivos em {elapsed:.2f}s ({rate:.1f} arquivos/s).")
+
+
+def capture_details(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extrai de um registro de metadados os detalhes usados para ordenar fotos
+    tiradas no mesmo segundo.
+
+    Returns:
+        Um dicionário com 'subsec' (dígitos da fração de segundo), 'offset'
+        (fuso horário, ex: "+02:00") e 'sequence' (número de sequência da
+        câmera); cada valor é None quando ausente.
+    """
+    subsec = next((record[tag] for tag in SUBSEC_TAGS if record.get(tag) not in (None, "")), None)
+    offset = next((record[tag] for tag in OFFSET_TAGS if record.get(tag)), None)
+    return {
+        'subsec': str(subsec) if subsec is not None else None,
+        'offset': offset,
+        'sequence': record.get(SEQUENCE_TAG),
+    }
+
+
 class BaseProcessor(ABC):
     """
     Classe base abstrata para todas as estratégias de processamento de dados.
     Define a interface que todos os processadores devem implementar.
     """
+    # Pool de processos ExifTool usado na extração. None usa o pool global.
+    pool: Optional[ExifToolPool] = None
+    # Cache persistente de metadados consultado antes da extração. None desativa o cache.
+    cache: Optional[MetadataCache] = None
+    # Estratégia para obter localmente os arquivos remotos (ex: DriveSource.fetch_all).
+    fetch_all: Optional[Callable[[Iterable[FileReference]], Iterator[FileReference]]] = None
+    # Libera a cópia temporária de um arquivo remoto já extraído (ex: DriveSource.release).
+    release: Optional[Callable[[FileReference], None]] = None
+    # Se True, cada arquivo remoto é extraído e liberado assim que chega (ver _resolve_chunk).
+    release_each: bool = False
+    # Número de lotes extraídos em paralelo.
+    workers: int = 1
+    # Erros por arquivo (nome, mensagem) registrados durante a extração.
+    errors: List[Tuple[str, str]]
+
     @abstractmethod
+    def iter_data(self, files: Iterable[FileReference], args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Processa as referências de arquivo à medida que chegam e gera os
+        dados prontos para serem ordenados e renomeados.
+
+        Args:
+            files: Um iterável (possivelmente preguiçoso) de FileReference.
+            args: Os argumentos da linha de comando, para acesso a flags como --extract-name.
+
+        Yields:
+            Um dicionário com os dados de cada foto.
+        """
+        pass
+
     def prepare_data(self, files: List[FileReference], args: Any) -> List[Dict[str, Any]]:
         """
         Processa uma lista de referências de arquivo e retorna os dados
@@ -31,7 +134,168 @@ class BaseProcessor(ABC):
             Uma lista de dicionários, onde cada dicionário representa os
             dados de uma foto.
         """
-        pass
+        return list(self.iter_data(files, args))
+
+    def _iter_create_dates(self, files: Iterable[FileReference]):
+        """
+        Retorna triplas (file_ref, CreateDate, detalhes da captura) preservando
+        a ordem de entrada. Os detalhes (ver capture_details) só são
+        preenchidos quando o arquivo os tiver.
+        """
+        for file_ref, record in self._iter_records(files, (DATE_TAG,), CAPTURE_OPTIONAL_TAGS):
+            yield file_ref, record.get(DATE_TAG), capture_details(record)
+
+    def _iter_records(self, files: Iterable[FileReference], tags: Tuple[str, ...],
+                      optional_tags: Tuple[str, ...] = ()):
+        """
+        Obtém os metadados dos arquivos em lotes, preservando a ordem de entrada.
+
+        As tags opcionais são extraídas junto com as obrigatórias quando
+        disponíveis, mas a falta delas não exige uma nova extração.
+
+        Com workers > 1, os lotes são resolvidos em paralelo por um pool de
+        threads (cada uma usando um processo ExifTool do pool), mas os
+        resultados continuam sendo gerados na ordem de entrada.
+        """
+        if self.workers <= 1:
+            for chunk in utils.chunked(files, BATCH_SIZE):
+                yield from zip(chunk, self._resolve_chunk_safely(chunk, tags, optional_tags))
+            return
+
+        stats = WorkerStats()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="olaf-extract") as executor:
+            for chunk in utils.chunked(files, PARALLEL_BATCH_SIZE):
+                pending.append((chunk, executor.submit(stats.timed, self._resolve_chunk_safely, chunk, tags, optional_tags)))
+                # Limita os lotes em andamento para não consumir a fonte inteira de uma vez
+                if len(pending) >= self.workers * 2:
+                    done_chunk, future = pending.popleft()
+                    yield from zip(done_chunk, future.result())
+            while pending:
+                done_chunk, future = pending.popleft()
+                yield from zip(done_chunk, future.result())
+        stats.log()
+
+    def _resolve_chunk_safely(self, chunk: List[FileReference], tags: Tuple[str, ...],
+                              optional_tags: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """
+        Resolve um lote; se ele falhar, repete arquivo a arquivo para isolar
+        os erros, que são registrados em self.errors sem interromper o lote.
+        """
+        try:
+            return self._resolve_chunk(chunk, tags, optional_tags)
+        except Exception as e:
+            logging.warning(f"Falha ao extrair um lote de {len(chunk)} arquivos ({e}); tentando arquivo a arquivo.")
+
+        records = []
+        for file_ref in chunk:
+            try:
+                records.extend(self._resolve_chunk([file_ref], tags, optional_tags))
+            except Exception as e:
+                logging.error(f"Falha ao extrair metadados de '{file_ref.name}': {e}")
+                self.errors.append((file_ref.name, str(e)))
+                metrics.incr("extraction_errors")
+                records.append({})
+        return records
+
+    def _resolve_chunk(self, chunk: List[FileReference], tags: Tuple[str, ...],
+                       optional_tags: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """
+        Obtém os metadados de um lote de arquivos, na ordem do lote.
+
+        Para cada arquivo, usa primeiro os metadados já conhecidos pela fonte
+        e depois o cache persistente; só os arquivos restantes são obtidos
+        localmente e enviados ao extrator, em um único comando do ExifTool por
+        lote. Arquivos remotos são extraídos em pequenos grupos à medida que
+        seus downloads terminam.
+
+        Cada grupo é liberado logo depois da extração. Com self.release_each
+        (orçamento de disco ou downloads em memória), cada arquivo remoto é
+        extraído e liberado assim que chega: um grupo à espera de completar
+        poderia reter o espaço de que os próximos downloads precisam.
+        """
+        fetch_all = self.fetch_all or fetch_sequentially
+        records: Dict[int, Dict[str, Any]] = {}
+        local, remote = [], []
+        for index, file_ref in enumerate(chunk):
+            record = self._known_record(file_ref, tags, optional_tags)
+            if record is not None:
+                records[index] = record
+            elif file_ref.local_path:
+                local.append(index)
+            else:
+                remote.append(index)
+
+        self._extract_into(chunk, local, tags, optional_tags, records)
+        if remote:
+            index_of = {id(chunk[index]): index for index in remote}
+            group_size = 1 if self.release_each else FETCHED_BATCH_SIZE
+            ready = []
+            for file_ref in fetch_all([chunk[index] for index in remote]):
+                ready.append(index_of[id(file_ref)])
+                if len(ready) >= group_size:
+                    self._extract_into(chunk, ready, tags, optional_tags, records)
+                    self._release(chunk, ready)
+                    ready = []
+            self._extract_into(chunk, ready, tags, optional_tags, records)
+            self._release(chunk, ready)
+        if self.cache is not None and (local or remote):
+            self.cache.commit()
+
+        return [records[index] for index in range(len(chunk))]
+
+    def _extract_into(self, chunk: List[FileReference], indices: List[int],
+                      tags: Tuple[str, ...], optional_tags: Tuple[str, ...],
+                      records: Dict[int, Dict[str, Any]]):
+        """
+        Extrai os metadados dos arquivos chunk[i] (i em 'indices'), grava em
+        'records' e no cache. Falhas de leitura (ex: erro ou tempo esgotado
+        do ExifTool) ficam com um registro vazio, mas não vão para o cache,
+        para que o arquivo seja lido de novo na próxima execução.
+        """
+        if not indices:
+            return
+        paths = [chunk[index].local_path for index in indices]
+        existing = [path for path in paths if path]
+        # Arquivos baixados apenas para a memória (ver FileReference.content)
+        in_memory = [index for index, path in zip(indices, paths) if not path and chunk[index].content is not None]
+        from_memory: Dict[int, Dict[str, Any]] = {}
+        with metrics.stage("extract"):
+            extracted = ExifMetadataExtractor.extract_batch(
+                existing, tags=tags, pool=self.pool, optional_tags=optional_tags
+            )
+            if in_memory:
+                contents = ExifMetadataExtractor.extract_contents(
+                    [chunk[index].content for index in in_memory], tags=tags, pool=self.pool,
+                    optional_tags=optional_tags
+                )
+                from_memory = dict(zip(in_memory, contents))
+        metrics.incr("files_extracted", len(existing) + len(in_memory))
+        for index, path in zip(indices, paths):
+            record = extracted.get(path) if path else from_memory.get(index)
+            records[index] = record if record is not None else {}
+            if self.cache is not None and record is not None:
+                self.cache.put(chunk[index], (*tags, *optional_tags), record)
+
+    def _release(self, chunk: List[FileReference], indices: List[int]):
+        """
+        Libera as cópias temporárias dos arquivos chunk[i] (i em 'indices').
+        """
+        if self.release is None:
+            return
+        for index in indices:
+            self.release(chunk[index])
+
+    def _known_record(self, file_ref: FileReference, tags: Tuple[str, ...],
+                      optional_tags: Tuple[str, ...] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Retorna os metadados do arquivo sem extraí-los, se já forem conhecidos.
+        """
+        if file_ref.metadata and all(tag in file_ref.metadata for tag in tags):
+            return {tag: value for tag, value in file_ref.metadata.items() if tag in tags or tag in optional_tags}
+        if self.cache is not None:
+            return self.cache.get(file_ref, (*tags, *optional_tags))
+        return None
 
 
 class ExifProcessor(BaseProcessor):
@@ -39,23 +303,46 @@ class ExifProcessor(BaseProcessor):
     Estratégia de processamento padrão: extrai a data de criação
     diretamente dos metadados EXIF.
     """
-    def prepare_data(self, files: List[FileReference], args: Any) -> List[Dict[str, Any]]:
-        photo_data = []
+    def __init__(self, pool: Optional[ExifToolPool] = None, cache: Optional[MetadataCache] = None,
+                 fetch_all: Optional[Callable[[Iterable[FileReference]], Iterator[FileReference]]] = None,
+                 workers: int = 1, release: Optional[Callable[[FileReference], None]] = None,
+                 release_each: bool = False):
+        """
+        Args:
+            pool: Pool de processos ExifTool persistentes. Se None, usa o pool global.
+            cache: Cache persistente de metadados. Se None, sempre extrai os metadados.
+            fetch_all: Estratégia da fonte para baixar arquivos remotos. Se None,
+                       baixa um arquivo de cada vez.
+            workers: Número de lotes extraídos em paralelo.
+            release: Função da fonte que libera a cópia temporária de cada
+                     arquivo remoto assim que ele é extraído. Se None, as
+                     cópias ficam até o fim da execução.
+            release_each: Se True (ver BaseSource.bounded_downloads), extrai e
+                          libera cada arquivo remoto assim que ele chega, em
+                          vez de em grupos de FETCHED_BATCH_SIZE.
+        """
+        self.pool = pool
+        self.cache = cache
+        self.fetch_all = fetch_all
+        self.workers = workers
+        self.release = release
+        self.release_each = release_each
+        self.errors = []
+
+    def iter_data(self, files: Iterable[FileReference], args: Any) -> Iterator[Dict[str, Any]]:
         logging.info("Usando estratégia ExifProcessor: extraindo data original do EXIF.")
 
-        for file_ref in files:
-            extractor = ExifMetadataExtractor(file_ref.local_path)
-            create_date = extractor.extract_date("-CreateDate")
-            
+        for file_ref, create_date, details in self._iter_create_dates(files):
             if create_date:
                 photographer = utils.parse_photographer_name(file_ref.name) if args.extract_name else None
-                photo_data.append({
+                yield {
                     'local_path': file_ref.local_path,
+                    'name': file_ref.name,
                     'remote_id': file_ref.remote_id,
                     'date': create_date,
-                    'photographer': photographer
-                })
-        return photo_data
+                    'photographer': photographer,
+                    **details
+                }
 
 
 class ManualCorrectionProcessor(BaseProcessor):
@@ -63,37 +350,54 @@ class ManualCorrectionProcessor(BaseProcessor):
     Estratégia de correção manual: usa uma data base fornecida pelo usuário
     e aplica um offset de horário extraído do EXIF.
     """
-    def __init__(self, base_date_str: str, offset_str: str):
+    def __init__(self, base_date_str: str, offset_str: str, pool: Optional[ExifToolPool] = None,
+                 cache: Optional[MetadataCache] = None,
+                 fetch_all: Optional[Callable[[Iterable[FileReference]], Iterator[FileReference]]] = None,
+                 workers: int = 1, release: Optional[Callable[[FileReference], None]] = None,
+                 release_each: bool = False):
         """
         Inicializa o processador com a data base e o offset.
 
         Args:
             base_date_str: A data no formato "AAAA-MM-DD".
             offset_str: O offset de horário (ex: "-2h30m").
+            pool: Pool de processos ExifTool persistentes. Se None, usa o pool global.
+            cache: Cache persistente de metadados. Se None, sempre extrai os metadados.
+            fetch_all: Estratégia da fonte para baixar arquivos remotos. Se None,
+                       baixa um arquivo de cada vez.
+            workers: Número de lotes extraídos em paralelo.
+            release: Função da fonte que libera a cópia temporária de cada
+                     arquivo remoto assim que ele é extraído. Se None, as
+                     cópias ficam até o fim da execução.
+            release_each: Se True (ver BaseSource.bounded_downloads), extrai e
+                          libera cada arquivo remoto assim que ele chega, em
+                          vez de em grupos de FETCHED_BATCH_SIZE.
         """
+        self.pool = pool
+        self.cache = cache
+        self.fetch_all = fetch_all
+        self.workers = workers
+        self.release = release
+        self.release_each = release_each
+        self.errors = []
         self.base_date_str = base_date_str
         self.offset_str = offset_str
         self.time_offset = time_service.parse_offset_to_timedelta(offset_str)
 
-    def prepare_data(self, files: List[FileReference], args: Any) -> List[Dict[str, Any]]:
+    def iter_data(self, files: Iterable[FileReference], args: Any) -> Iterator[Dict[str, Any]]:
         if self.time_offset is None:
             logging.error(f"Formato de offset inválido: '{self.offset_str}'. Use um formato como '+1h', '-30m', ou '-2h15m30s'.")
-            return []
+            return
 
         try:
             base_date = datetime.strptime(self.base_date_str, "%Y-%m-%d")
         except ValueError:
             logging.error(f"Formato de data inválido: '{self.base_date_str}'. Use o formato AAAA-MM-DD.")
-            return []
+            return
 
-        photo_data = []
         logging.info(f"Usando estratégia ManualCorrectionProcessor com data base '{self.base_date_str}' e offset '{self.offset_str}'.")
 
-        for file_ref in files:
-            extractor = ExifMetadataExtractor(file_ref.local_path)
-            # Extraímos a data completa para obter o objeto datetime
-            create_date_str = extractor.extract_date("-CreateDate")
-            
+        for file_ref, create_date_str, details in self._iter_create_dates(files):
             if create_date_str:
                 try:
                     # Convertendo a string de data do EXIF para um objeto datetime
@@ -113,13 +417,17 @@ class ManualCorrectionProcessor(BaseProcessor):
                     final_date_str = final_datetime.strftime("%Y:%m:%d %H:%M:%S")
 
                     photographer = utils.parse_photographer_name(file_ref.name) if args.extract_name else None
-                    photo_data.append({
+                    yield {
                         'local_path': file_ref.local_path,
+                        'name': file_ref.name,
                         'remote_id': file_ref.remote_id,
                         'date': final_date_str,
-                        'photographer': photographer
-                    })
+                        'photographer': photographer,
+                        'subsec': details['subsec'],
+                        # O fuso original não vale mais para o horário corrigido
+                        'offset': None,
+                        'sequence': details['sequence']
+                    }
                 except ValueError as e:
                     logging.warning(f"Não foi possível processar a data '{create_date_str}' para o arquivo {file_ref.name}. Erro: {e}")
 
-        return photo_data
\ No newline at end of file
@@ -1,28 +1,47 @@
 #raw_service.py
 
 import os
-import re
+import json
 import logging
 import subprocess
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from exiftool_service import ExifToolPool, get_default_pool
+import exif_reader
+import utils
+
+# Tags solicitadas por padrão na extração em lote.
+DEFAULT_TAGS = ("CreateDate",)
+# Formato fixo de datas pedido ao ExifTool (-d), independente da localidade.
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+# Quantidade de arquivos enviados em cada comando do ExifTool.
+BATCH_SIZE = 200
+# Tempo máximo (s) de uma execução avulsa do ExifTool lendo da entrada padrão.
+STDIN_TIMEOUT = 60
 
 class ExifMetadataExtractor:
     """
     Classe responsável por extrair metadados de arquivos RAW utilizando exiftools.
     """   
 
-    def __init__(self, file_path: str):        
+    def __init__(self, file_path: str, pool: Optional[ExifToolPool] = None):
         """
         Inicializa com o caminho para o arquivo RAW.
 
         :param file_path: Caminho local do arquivo RAW.
+        :param pool: Pool de processos ExifTool persistentes. Se None, usa o pool global.
         """
 
         self.file_path = file_path
+        self.pool = pool
 
     def extract_metadata(self, flag = None):
         """
         Abre o arquivo RAW e extrai os metadados EXIF usando exiftools via subprocess.
 
+        O comando é enviado a um processo ExifTool persistente (-stay_open),
+        evitando o custo de iniciar o interpretador Perl a cada arquivo.
+
         :param flag: flag válida para exiftool.
 
         :return: string com os metadados extraídos.
@@ -37,9 +56,9 @@ class ExifMetadataExtractor:
 
         # Extrai os metadados
         try:
-           command = ["exiftool", self.file_path] if flag is None else ["exiftool", flag, self.file_path]
-           result = subprocess.run(command, stdout=subprocess.PIPE, text=True)
-           exif_data = result.stdout.strip()
+           pool = self.pool or get_default_pool()
+           command = [self.file_path] if flag is None else [flag, self.file_path]
+           exif_data = pool.execute(*command).strip()
            if exif_data:
              logging.info("Metadados extraídos com sucesso.")
            else:
@@ -53,15 +72,138 @@ class ExifMetadataExtractor:
         """
         Extrai a data de criação do arquivo RAW.
 
-        :return: string com a data de criação.
-        """
-        exif_data = self.extract_metadata(flag)
+        :param flag: flag da tag de data (ex: "-CreateDate"). Se None, usa "-CreateDate".
 
-        match = re.search(r"Create Date\s+: (.+)", exif_data)
-        if match:
-            return match.group(1)
-        else:
-            return None
+        :return: string com a data de criação, no formato "AAAA:MM:DD HH:MM:SS".
+        """
+        tag = flag.lstrip("-") if flag else DEFAULT_TAGS[0]
+        records = self.extract_batch([self.file_path], tags=(tag,), pool=self.pool)
+        return records.get(self.file_path, {}).get(tag)
+
+    @staticmethod
+    def extract_batch(paths: Sequence[str], tags: Iterable[str] = DEFAULT_TAGS,
+                      pool: Optional[ExifToolPool] = None,
+                      chunk_size: int = BATCH_SIZE,
+                      use_fast_reader: bool = True,
+                      optional_tags: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """
+        Extrai as tags pedidas de vários arquivos, com um comando do ExifTool
+        para cada bloco de até 'chunk_size' arquivos.
+
+        Quando todas as tags pedidas são suportadas pelo leitor em Python puro
+        (exif_reader), JPEGs e RAWs baseados em TIFF são lidos diretamente do
+        cabeçalho; apenas os arquivos que ele não consegue interpretar (ou em
+        que não encontra as tags) são enviados ao ExifTool. As tags opcionais
+        não impedem a leitura rápida: são incluídas quando encontradas, e as
+        que o leitor rápido não conhece só vêm dos arquivos lidos pelo ExifTool.
+
+        A saída é pedida em JSON (-j) e as datas em formato fixo (-d), de modo
+        que nenhuma análise depende do texto localizado do ExifTool.
+
+        :param paths: caminhos locais dos arquivos.
+        :param tags: nomes das tags do ExifTool (ex: "CreateDate").
+        :param pool: pool de processos ExifTool. Se None, usa o pool global.
+        :param chunk_size: número máximo de arquivos por comando.
+        :param use_fast_reader: se False, usa sempre o ExifTool.
+        :param optional_tags: tags extraídas quando disponíveis (ex: "SubSecTimeDigitized").
+
+        :return: dicionário caminho -> registro (tag -> valor). Arquivos sem
+                 metadados ficam com um registro vazio; arquivos inexistentes
+                 ou cuja leitura falhou ficam de fora do dicionário.
+        """
+        tags = list(tags)
+        all_tags = tags + [tag for tag in optional_tags if tag not in tags]
+        records: Dict[str, Dict[str, Any]] = {}
+
+        if use_fast_reader and exif_reader.SUPPORTED_TAGS.issuperset(tags):
+            pending = []
+            for path in paths:
+                fast_record = exif_reader.read_exif_file(path)
+                if fast_record is not None and all(tag in fast_record for tag in tags):
+                    records[path] = {tag: fast_record[tag] for tag in all_tags if tag in fast_record}
+                else:
+                    pending.append(path)
+            paths = pending
+
+        if not paths:
+            return records
+        pool = pool or get_default_pool()
+
+        for chunk in utils.chunked(paths, chunk_size):
+            existing = []
+            for path in chunk:
+                if os.path.exists(path):
+                    existing.append(path)
+                else:
+                    logging.error(f"Arquivo não encontrado: {path}")
+            if not existing:
+                continue
+
+            command = ["-j", "-fast", "-d", EXIF_DATE_FORMAT, *[f"-{tag}" for tag in all_tags], *existing]
+            output = pool.execute(*command).strip()
+            if not output:
+                continue
+            try:
+                entries: List[Dict[str, Any]] = json.loads(output)
+            except json.JSONDecodeError as e:
+                logging.error(f"Saída JSON inválida do ExifTool para um lote de {len(existing)} arquivos: {e}")
+                continue
+
+            # O ExifTool pode normalizar separadores em 'SourceFile'
+            by_normalized = {os.path.normpath(path): path for path in existing}
+            for entry in entries:
+                source_file = entry.pop("SourceFile", None)
+                path = by_normalized.get(os.path.normpath(source_file)) if source_file else None
+                if path is None:
+                    continue
+                records[path] = {tag: entry[tag] for tag in all_tags if tag in entry}
+
+        return records
+
+    @staticmethod
+    def extract_contents(contents: Sequence[bytes], tags: Iterable[str] = DEFAULT_TAGS,
+                         pool: Optional[ExifToolPool] = None,
+                         optional_tags: Iterable[str] = ()) -> List[Optional[Dict[str, Any]]]:
+        """
+        Extrai as tags pedidas de arquivos mantidos em memória, sem gravá-los
+        em disco.
+
+        O leitor em Python puro (exif_reader) é usado primeiro; os arquivos que
+        ele não consegue interpretar são enviados a uma execução avulsa do
+        ExifTool pela entrada padrão, já que os processos persistentes do pool
+        usam a entrada padrão para receber os comandos.
+
+        :param contents: conteúdo (ou cabeçalho) de cada arquivo.
+        :param tags: nomes das tags do ExifTool (ex: "CreateDate").
+        :param pool: pool de processos ExifTool, usado apenas para saber o executável.
+        :param optional_tags: tags extraídas quando disponíveis.
+
+        :return: os registros (tag -> valor), na ordem de 'contents'. Arquivos
+                 sem metadados ficam com um registro vazio, e aqueles cuja
+                 leitura falhou, com None.
+        """
+        tags = list(tags)
+        all_tags = tags + [tag for tag in optional_tags if tag not in tags]
+        executable = (pool or get_default_pool()).executable
+        records = []
+        for content in contents:
+            if exif_reader.SUPPORTED_TAGS.issuperset(tags):
+                fast_record = exif_reader.read_exif(lambda start, end: content[start:end])
+                if fast_record is not None and all(tag in fast_record for tag in tags):
+                    records.append({tag: fast_record[tag] for tag in all_tags if tag in fast_record})
+                    continue
+
+            command = [executable, "-j", "-fast", "-d", EXIF_DATE_FORMAT, *[f"-{tag}" for tag in all_tags], "-"]
+            try:
+                result = subprocess.run(command, input=content, capture_output=True, timeout=STDIN_TIMEOUT)
+                entries: List[Dict[str, Any]] = json.loads(result.stdout or b"[]")
+            except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError) as e:
+                logging.error(f"Falha ao extrair metadados da memória com o ExifTool: {e}")
+                records.append(None)
+                continue
+            entry = entries[0] if entries else {}
+            records.append({tag: entry[tag] for tag in all_tags if tag in entry})
+        return records
 
     def display_metadata(self, flag = None):
         """
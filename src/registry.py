@@ -0,0 +1,51 @@
+# src/registry.py
+
+import importlib
+from typing import Dict, Type
+
+# Registro leve das fontes e estratégias de processamento disponíveis.
+# Cada entrada aponta para "módulo:Classe"; o módulo só é importado quando
+# a fonte ou a estratégia é escolhida, para que, por exemplo, a pilha do
+# Google não seja carregada em um processamento local.
+SOURCES: Dict[str, str] = {
+    "local": "sources.local_source:LocalSource",
+    "drive": "sources.drive_source:DriveSource",
+    "multi": "sources.composite_source:CompositeSource",
+}
+
+PROCESSORS: Dict[str, str] = {
+    "process": "processing_service:ExifProcessor",
+    "fixdate": "processing_service:ManualCorrectionProcessor",
+}
+
+
+def load_class(target: str) -> Type:
+    """
+    Importa e retorna a classe indicada por "módulo:Classe".
+    """
+    module_name, class_name = target.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def load_source(name: str) -> Type:
+    """
+    Retorna a classe da fonte registrada com o nome dado.
+
+    Raises:
+        ValueError: Se a fonte não estiver registrada.
+    """
+    if name not in SOURCES:
+        raise ValueError(f"Fonte desconhecida: '{name}'. Use uma de: {', '.join(SOURCES)}.")
+    return load_class(SOURCES[name])
+
+
+def load_processor(action: str) -> Type:
+    """
+    Retorna a classe da estratégia de processamento registrada para a ação.
+
+    Raises:
+        ValueError: Se a ação não estiver registrada.
+    """
+    if action not in PROCESSORS:
+        raise ValueError(f"Ação desconhecida: '{action}'. Use uma de: {', '.join(PROCESSORS)}.")
+    return load_class(PROCESSORS[action])
@@ -0,0 +1,405 @@
+# src/rename_journal.py
+
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+import utils
+from rename_planner import RenamePlan, TEMP_SUFFIX
+
+# Número de registros acumulados antes de cada fsync do diário.
+SYNC_EVERY = 100
+
+# Estados de uma renomeação no diário.
+PLANNED = "planned"
+STAGED = "staged"            # local: origem já movida para o nome temporário
+DONE = "done"
+FAILED = "failed"            # Drive: a API recusou a renomeação
+MISSING = "missing"          # local: o arquivo não foi encontrado em nenhum dos nomes
+UNDO_STAGED = "undo_staged"  # local: destino já movido para o nome temporário do undo
+UNDONE = "undone"
+
+# Função que renomeia arquivos no Drive: recebe pares (id, novo nome) e
+# retorna id -> erro (None em caso de sucesso), como GoogleDriveClient.rename_files.
+DriveRenamer = Callable[[List[Tuple[str, str]]], Dict[str, Optional[Exception]]]
+
+
+def default_journal_dir() -> str:
+    """
+    Retorna o diretório padrão dos diários de renomeação, dentro do
+    diretório de estado do usuário (XDG_STATE_HOME ou ~/.local/state).
+    """
+    return utils.state_dir("journals")
+
+
+def latest_journal(directory: Optional[str] = None) -> Optional[str]:
+    """
+    Retorna o caminho do diário mais recente do diretório, ou None se não houver.
+    """
+    directory = directory or default_journal_dir()
+    if not os.path.isdir(directory):
+        return None
+    journals = [name for name in os.listdir(directory) if name.endswith(".jsonl")]
+    if not journals:
+        return None
+    return os.path.join(directory, max(journals))
+
+
+@dataclass
+class LocalMove:
+    """Renomeação local registrada no diário."""
+    seq: int
+    source: str
+    temp: str
+    target: str
+    state: str = PLANNED
+
+
+@dataclass
+class DriveMove:
+    """Renomeação no Drive registrada no diário."""
+    seq: int
+    file_id: str
+    name: str
+    new_name: str
+    state: str = PLANNED
+    error: Optional[str] = None
+
+
+@dataclass
+class JournalState:
+    """Estado de uma execução, reconstruído a partir do diário."""
+    path: str
+    run_id: str
+    local: Dict[int, LocalMove] = field(default_factory=dict)
+    drive: Dict[int, DriveMove] = field(default_factory=dict)
+    committed: bool = False
+    undone: bool = False
+
+
+class RenameJournal:
+    """
+    Diário (write-ahead log) de uma execução de renomeação, em JSON Lines.
+
+    O arquivo só recebe acréscimos. O plano é gravado e sincronizado com o
+    disco antes da primeira renomeação; os registros de progresso são
+    sincronizados em lotes de SYNC_EVERY.
+    """
+
+    def __init__(self, path: str, run_id: Optional[str] = None, sync_every: int = SYNC_EVERY):
+        """
+        Abre (ou cria) o diário para acréscimo.
+
+        Args:
+            path: Caminho do arquivo do diário.
+            run_id: Identificador da execução. Se None, é lido do diário existente.
+            sync_every: Número de registros entre cada fsync.
+        """
+        if run_id is None and os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                run_id = json.loads(fh.readline()).get("run")
+        self.path = path
+        self.sync_every = sync_every
+        self.run_id = run_id
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+
+    @classmethod
+    def create(cls, path: Optional[str] = None) -> "RenameJournal":
+        """
+        Cria um diário novo para uma execução. Se 'path' for None, o arquivo
+        é criado em default_journal_dir() com a data e hora no nome.
+        """
+        run_id = uuid.uuid4().hex[:8]
+        if path is None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(default_journal_dir(), f"{stamp}-{run_id}.jsonl")
+        journal = cls(path, run_id=run_id)
+        journal.append("begin", run=run_id, created=datetime.now().isoformat(timespec="seconds"))
+        return journal
+
+    def append(self, op: str, **fields):
+        """
+        Acrescenta um registro ao diário, sincronizando a cada 'sync_every' registros.
+        """
+        self._fh.write(json.dumps({"op": op, **fields}, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """
+        Grava no disco (fsync) os registros pendentes.
+        """
+        if self._unsynced == 0:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        """
+        Sincroniza e fecha o diário.
+        """
+        if self._fh.closed:
+            return
+        self.sync()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_journal(path: str) -> JournalState:
+    """
+    Reconstrói o estado de uma execução lendo o diário do início ao fim.
+    Uma última linha incompleta (escrita interrompida) é ignorada.
+    """
+    state = JournalState(path=path, run_id="")
+    with open(path, encoding="utf-8") as fh:
+        for line_number, line in enumerate(fh, 1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Linha {line_number} do diário ignorada (incompleta ou corrompida).")
+                continue
+            op = record.pop("op")
+            if op == "begin":
+                state.run_id = record["run"]
+            elif op == "plan_local":
+                state.local[record["seq"]] = LocalMove(**record)
+            elif op == "plan_drive":
+                state.drive[record["seq"]] = DriveMove(**record)
+            elif op == "commit":
+                state.committed = True
+            elif op == "undo_complete":
+                state.undone = True
+            elif op in ("local", "drive"):
+                move = (state.local if op == "local" else state.drive)[record["seq"]]
+                move.state = record["state"]
+                if op == "drive":
+                    move.error = record.get("error")
+    return state
+
+
+class JournaledRenamer:
+    """
+    Aplica, retoma e desfaz renomeações registrando cada passo no diário.
+
+    As renomeações locais são feitas em duas fases: todos os arquivos são
+    primeiro movidos para nomes temporários e só depois para os nomes
+    finais, de modo que nenhum destino esteja ocupado por outro arquivo do
+    plano e uma interrupção sempre deixe cada arquivo em um estado conhecido.
+    """
+
+    def __init__(self, journal: RenameJournal, on_renamed: Optional[Callable[[str, str], None]] = None,
+                 rename_drive: Optional[DriveRenamer] = None):
+        """
+        Args:
+            journal: O diário da execução, aberto para acréscimo.
+            on_renamed: Função chamada com (origem, destino) após cada
+                        renomeação local (ex: para atualizar o cache).
+            rename_drive: Função usada para renomear arquivos no Drive.
+                          Obrigatória se houver renomeações no Drive.
+        """
+        self.journal = journal
+        self.on_renamed = on_renamed
+        self.rename_drive = rename_drive
+
+    def execute(self, plan: RenamePlan) -> bool:
+        """
+        Registra o plano no diário e o aplica.
+
+        Returns:
+            True se todas as renomeações foram concluídas.
+        """
+        state = JournalState(path=self.journal.path, run_id=self.journal.run_id)
+        for seq, step in enumerate(plan.local_renames):
+            temp = f"{step.source}.{self.journal.run_id}{TEMP_SUFFIX}"
+            move = LocalMove(seq, step.source, temp, step.target)
+            state.local[seq] = move
+            self.journal.append("plan_local", seq=seq, source=move.source, temp=move.temp, target=move.target)
+        for seq, rename in enumerate(plan.drive_renames, len(plan.local_renames)):
+            move = DriveMove(seq, rename.file_id, rename.name, rename.new_name)
+            state.drive[seq] = move
+            self.journal.append("plan_drive", seq=seq, file_id=move.file_id, name=move.name, new_name=move.new_name)
+        # O plano precisa estar no disco antes da primeira renomeação
+        self.journal.sync()
+        return self.resume(state)
+
+    def resume(self, state: JournalState) -> bool:
+        """
+        Conclui as renomeações pendentes de uma execução.
+
+        Returns:
+            True se todas as renomeações foram concluídas.
+        """
+        if state.undone:
+            logging.warning("Esta execução foi desfeita; não há o que retomar.")
+            return False
+        if state.committed:
+            logging.info("Todas as renomeações deste diário já foram concluídas.")
+            return True
+
+        local = sorted(state.local.values(), key=lambda move: move.seq)
+        for move in local:
+            if move.state == PLANNED:
+                self._stage(move)
+        self.journal.sync()
+        for move in local:
+            if move.state == STAGED:
+                self._finish(move)
+
+        pending = [move for move in state.drive.values() if move.state in (PLANNED, FAILED)]
+        self._rename_drive(pending, lambda move: move.new_name, DONE)
+        self.journal.sync()
+
+        incomplete = [move for move in [*state.local.values(), *state.drive.values()] if move.state != DONE]
+        if incomplete:
+            logging.warning(f"{len(incomplete)} renomeações não foram concluídas. "
+                            f"Use 'resume' para tentar novamente ou 'undo' para desfazer. Diário: {state.path}")
+            return False
+        self.journal.append("commit")
+        self.journal.sync()
+        return True
+
+    def undo(self, state: JournalState) -> bool:
+        """
+        Desfaz as renomeações concluídas (ou em andamento) de uma execução,
+        devolvendo cada arquivo ao seu nome original.
+
+        Returns:
+            True se todas as renomeações foram desfeitas.
+        """
+        if state.undone:
+            logging.info("Esta execução já foi desfeita.")
+            return True
+
+        local = sorted(state.local.values(), key=lambda move: move.seq)
+        for move in local:
+            if move.state == DONE:
+                self._undo_stage(move)
+        self.journal.sync()
+        for move in local:
+            if move.state in (STAGED, UNDO_STAGED):
+                self._undo_finish(move)
+            elif move.state in (PLANNED, MISSING):
+                self._mark(move, UNDONE)
+
+        renamed = [move for move in state.drive.values() if move.state == DONE]
+        self._rename_drive(renamed, lambda move: move.name, UNDONE)
+        for move in state.drive.values():
+            if move.state in (PLANNED, FAILED):
+                self._mark(move, UNDONE)
+        self.journal.sync()
+
+        remaining = [move for move in [*state.local.values(), *state.drive.values()] if move.state != UNDONE]
+        if remaining:
+            logging.warning(f"{len(remaining)} renomeações não puderam ser desfeitas. Diário: {state.path}")
+            return False
+        self.journal.append("undo_complete")
+        self.journal.sync()
+        return True
+
+    # --- Fases locais ---
+
+    def _stage(self, move: LocalMove):
+        # Fase 1: origem -> temporário. Se o diário ficou para trás em uma
+        # interrupção, o estado real é deduzido de qual nome existe no disco.
+        if os.path.exists(move.source):
+            self._rename(move.source, move.temp)
+            self._mark(move, STAGED)
+        elif os.path.exists(move.temp):
+            self._mark(move, STAGED)
+        elif os.path.exists(move.target):
+            self._mark(move, DONE)
+        else:
+            logging.error(f"Arquivo não encontrado para renomear: {move.source}")
+            self._mark(move, MISSING)
+
+    def _finish(self, move: LocalMove):
+        # Fase 2: temporário -> destino final
+        if not os.path.exists(move.temp):
+            if os.path.exists(move.target):
+                self._mark(move, DONE)
+            else:
+                logging.error(f"Arquivo temporário não encontrado: {move.temp}")
+                self._mark(move, MISSING)
+            return
+        if os.path.exists(move.target):
+            logging.error(f"Destino ocupado por outro arquivo, renomeação adiada: {move.target}")
+            return
+        self._rename(move.temp, move.target)
+        self._mark(move, DONE)
+        metrics.incr("renames_local")
+        logging.debug(f"Renomeado localmente: {os.path.basename(move.source)} -> {os.path.basename(move.target)}")
+
+    def _undo_stage(self, move: LocalMove):
+        undo_temp = self._undo_temp(move)
+        if os.path.exists(move.target):
+            self._rename(move.target, undo_temp)
+            self._mark(move, UNDO_STAGED)
+        elif os.path.exists(undo_temp):
+            self._mark(move, UNDO_STAGED)
+        elif os.path.exists(move.source):
+            self._mark(move, UNDONE)
+        else:
+            logging.error(f"Arquivo não encontrado para desfazer: {move.target}")
+
+    def _undo_finish(self, move: LocalMove):
+        current = self._undo_temp(move) if move.state == UNDO_STAGED else move.temp
+        if not os.path.exists(current):
+            if os.path.exists(move.source):
+                self._mark(move, UNDONE)
+            else:
+                logging.error(f"Arquivo não encontrado para desfazer: {current}")
+            return
+        if os.path.exists(move.source):
+            logging.error(f"Nome original ocupado por outro arquivo: {move.source}")
+            return
+        self._rename(current, move.source)
+        self._mark(move, UNDONE)
+        logging.debug(f"Restaurado: {os.path.basename(move.target)} -> {os.path.basename(move.source)}")
+
+    def _undo_temp(self, move: LocalMove) -> str:
+        return f"{move.target}.{self.journal.run_id}-undo{TEMP_SUFFIX}"
+
+    def _rename(self, source: str, target: str):
+        os.rename(source, target)
+        if self.on_renamed is not None:
+            self.on_renamed(source, target)
+
+    # --- Drive ---
+
+    def _rename_drive(self, moves: Iterable[DriveMove], new_name: Callable[[DriveMove], str], success_state: str):
+        moves = list(moves)
+        if not moves:
+            return
+        if self.rename_drive is None:
+            logging.error(f"{len(moves)} renomeações no Drive pendentes, mas nenhum cliente do Drive foi configurado.")
+            return
+        results = self.rename_drive([(move.file_id, new_name(move)) for move in moves])
+        for move in moves:
+            error = results.get(move.file_id)
+            if error is None:
+                self._mark(move, success_state)
+            else:
+                logging.error(f"Não foi possível renomear o arquivo {move.file_id} no Drive. Erro: {error}")
+                move.error = str(error)
+                if success_state == DONE:
+                    move.state = FAILED
+                self.journal.append("drive", seq=move.seq, state=move.state, error=move.error)
+
+    def _mark(self, move, new_state: str):
+        move.state = new_state
+        kind = "local" if isinstance(move, LocalMove) else "drive"
+        self.journal.append(kind, seq=move.seq, state=new_state)
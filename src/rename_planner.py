@@ -0,0 +1,259 @@
+# src/rename_planner.py
+
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import metrics
+import utils
+from capture_groups import split_extension
+
+# Sufixo dos nomes temporários usados para desfazer ciclos de renomeação.
+TEMP_SUFFIX = ".olaf-tmp"
+
+
+class RenameStep(NamedTuple):
+    """Uma renomeação local, de um caminho para outro no mesmo diretório."""
+    source: str
+    target: str
+
+
+class DriveRename(NamedTuple):
+    """Uma renomeação de arquivo no Google Drive."""
+    file_id: str
+    name: str
+    new_name: str
+
+
+def build_new_name(entry) -> str:
+    """
+    Monta o novo nome de uma foto: data, fotógrafo (se houver) e a extensão
+    original em minúsculas (incluindo a da foto, em sidecars como "DSC_0001.NEF.xmp").
+
+    Args:
+        entry: Um RenameEntry (ver sort_service).
+    """
+    base = entry.new_name_date
+    if entry.photographer:
+        base = f"{base}_{utils.sanitize_for_filename(entry.photographer)}"
+    # A extensão vem do nome original: no Drive o arquivo pode nem ter sido baixado
+    _, extension = split_extension(entry.name)
+    return f"{base}{extension.lower()}"
+
+
+class RenamePlan:
+    """
+    Plano completo de renomeação, calculado em memória antes de qualquer
+    alteração: os passos locais já estão na ordem em que podem ser aplicados
+    sem sobrescrever nenhum arquivo, e as renomeações do Drive são enviadas
+    em lote.
+    """
+
+    def __init__(self):
+        # Renomeações locais de cada arquivo (origem -> destino final), em ordem cronológica
+        self.local_renames: List[RenameStep] = []
+        # Mesmas renomeações, em uma ordem segura para aplicar uma a uma
+        self.local_steps: List[RenameStep] = []
+        self.drive_renames: List[DriveRename] = []
+        # Número de ciclos (ex: A -> B, B -> A) desfeitos com nomes temporários
+        self.cycles = 0
+        # Número de arquivos que receberam um sufixo por conflito de nome
+        self.collisions = 0
+
+    def __len__(self) -> int:
+        return len(self.local_renames) + len(self.drive_renames)
+
+    def format(self) -> str:
+        """
+        Retorna o plano em texto, uma renomeação por linha.
+        """
+        lines = [f"{step.source} -> {os.path.basename(step.target)}" for step in self.local_renames]
+        lines += [f"[drive:{rename.file_id}] {rename.name} -> {rename.new_name}" for rename in self.drive_renames]
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Retorna o plano em uma estrutura serializável em JSON.
+        """
+        return {
+            "local": [step._asdict() for step in self.local_renames],
+            "drive": [rename._asdict() for rename in self.drive_renames],
+        }
+
+    def export(self, path: str):
+        """
+        Grava o plano em um arquivo JSON.
+        """
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False, indent=2)
+        logging.info(f"Plano de renomeação exportado para: {path}")
+
+    def apply_local(self, on_renamed: Optional[Callable[[str, str], None]] = None):
+        """
+        Aplica os passos locais, na ordem do plano.
+
+        Args:
+            on_renamed: Função chamada com (origem, destino) após cada
+                        renomeação (ex: para atualizar o cache de metadados).
+        """
+        for step in self.local_steps:
+            os.rename(step.source, step.target)
+            if on_renamed is not None:
+                on_renamed(step.source, step.target)
+            if step.target.endswith(TEMP_SUFFIX):
+                logging.debug(f"Movido temporariamente: {os.path.basename(step.source)} -> {os.path.basename(step.target)}")
+            elif not step.source.endswith(TEMP_SUFFIX):
+                metrics.incr("renames_local")
+                logging.debug(f"Renomeado localmente: {os.path.basename(step.source)} -> {os.path.basename(step.target)}")
+
+
+def plan_renames(entries: Iterable) -> RenamePlan:
+    """
+    Calcula o plano de renomeação para as fotos já ordenadas.
+
+    Cada diretório local é listado uma única vez. Os conflitos de nome são
+    resolvidos em memória com os sufixos _1, _2, ..., atribuídos na ordem
+    cronológica; arquivos que não fazem parte do plano nunca são
+    sobrescritos, e um arquivo que já tem um nome válido para a sua data
+    não é renomeado.
+
+    Os arquivos de uma mesma captura (mesma pasta e mesmo nome base, como
+    DSC_0001.JPG, DSC_0001.NEF e DSC_0001.xmp) com a mesma data recebem o
+    mesmo sufixo, continuando pareados depois da renomeação.
+
+    Args:
+        entries: Os RenameEntry em ordem cronológica.
+
+    Returns:
+        O RenamePlan correspondente.
+    """
+    plan = RenamePlan()
+    # Grupos de arquivos locais da mesma captura, cada um com uma única
+    # ocorrência de cada extensão, na ordem cronológica
+    local_groups: Dict[Tuple[str, str, str], List[List[Tuple[str, str]]]] = {}
+    for entry in entries:
+        new_name = build_new_name(entry)
+        if entry.remote_id:
+            plan.drive_renames.append(DriveRename(entry.remote_id, entry.name, new_name))
+            continue
+        directory, current_name = os.path.split(entry.original_path)
+        new_stem, extension = split_extension(new_name)
+        groups = local_groups.setdefault((directory, split_extension(current_name)[0].lower(), new_stem), [])
+        group = next((group for group in groups
+                      if all(split_extension(other)[1] != extension for _, other in group)), None)
+        if group is None:
+            group = []
+            groups.append(group)
+        group.append((entry.original_path, new_name))
+    local_entries = [group for groups in local_groups.values() for group in groups]
+
+    # Nomes ocupados por arquivos que não serão renomeados, por diretório
+    static_names: Dict[str, Set[str]] = {}
+    for group in local_entries:
+        directory = os.path.dirname(group[0][0])
+        if directory not in static_names:
+            static_names[directory] = set(os.listdir(directory or "."))
+        for source, _ in group:
+            static_names[directory].discard(os.path.basename(source))
+
+    # Arquivos que já têm um nome válido para a sua data (o nome base ou o
+    # nome base com sufixo) mantêm esse nome, tornando a execução idempotente
+    assigned: Dict[str, Set[str]] = {directory: set() for directory in static_names}
+    pending = []
+    for group in local_entries:
+        directory = os.path.dirname(group[0][0])
+        suffixes = {_variant_suffix(os.path.basename(source), new_name) for source, new_name in group}
+        if len(suffixes) == 1 and None not in suffixes:
+            assigned[directory].update(os.path.basename(source) for source, _ in group)
+        else:
+            pending.append(group)
+
+    next_counter: Dict[Tuple[str, str, Tuple[str, ...]], int] = {}
+    mapping: Dict[str, str] = {}
+    for group in pending:
+        directory = os.path.dirname(group[0][0])
+        taken = assigned[directory]
+        static = static_names[directory]
+        stem = split_extension(group[0][1])[0]
+        extensions = [split_extension(new_name)[1] for _, new_name in group]
+        # O sufixo precisa estar livre para todas as extensões do grupo
+        counter_key = (directory, stem, tuple(sorted(extensions)))
+        suffix = ""
+        counter = next_counter.get(counter_key, 1)
+        while any(f"{stem}{suffix}{extension}" in taken or f"{stem}{suffix}{extension}" in static
+                  for extension in extensions):
+            suffix = f"_{counter}"
+            counter += 1
+        # Continua a contagem de onde parou, sem testar de novo os sufixos já usados
+        next_counter[counter_key] = counter
+        for (source, _), extension in zip(group, extensions):
+            candidate = f"{stem}{suffix}{extension}"
+            if suffix:
+                plan.collisions += 1
+            taken.add(candidate)
+            mapping[source] = os.path.join(directory, candidate)
+
+    plan.local_renames = [RenameStep(source, target) for source, target in mapping.items()]
+    plan.local_steps, plan.cycles = _order_steps(mapping, static_names, assigned)
+    return plan
+
+
+def _variant_suffix(name: str, new_name: str) -> Optional[str]:
+    # Retorna o sufixo ("" ou "_N") se 'name' for 'new_name' com esse sufixo, ou None
+    if name == new_name:
+        return ""
+    stem, extension = split_extension(new_name)
+    if not (name.startswith(f"{stem}_") and name.endswith(extension)):
+        return None
+    counter = name[len(stem) + 1:len(name) - len(extension)]
+    if counter.isdigit() and not counter.startswith("0"):
+        return f"_{counter}"
+    return None
+
+
+def _order_steps(mapping: Dict[str, str], static_names: Dict[str, Set[str]],
+                 assigned: Dict[str, Set[str]]):
+    """
+    Ordena as renomeações para que nenhum destino esteja ocupado no momento
+    em que é usado. Cadeias (A -> B, B -> C) são aplicadas do fim para o
+    início; ciclos (A -> B, B -> A) são desfeitos movendo um arquivo para um
+    nome temporário.
+    """
+    remaining = dict(mapping)
+    steps: List[RenameStep] = []
+    cycles = 0
+    for start in mapping:
+        if start not in remaining:
+            continue
+        chain = [start]
+        seen = {start}
+        node = remaining[start]
+        while node in remaining and node not in seen:
+            chain.append(node)
+            seen.add(node)
+            node = remaining[node]
+
+        if node in seen:
+            # Como os destinos são únicos, o ciclo sempre fecha no início da cadeia
+            cycles += 1
+            temp = _temp_path(start, static_names, assigned)
+            steps.append(RenameStep(start, temp))
+            for source in reversed(chain[1:]):
+                steps.append(RenameStep(source, remaining.pop(source)))
+            steps.append(RenameStep(temp, remaining.pop(start)))
+        else:
+            for source in reversed(chain):
+                steps.append(RenameStep(source, remaining.pop(source)))
+    return steps, cycles
+
+
+def _temp_path(path: str, static_names: Dict[str, Set[str]], assigned: Dict[str, Set[str]]) -> str:
+    directory, name = os.path.split(path)
+    candidate = f"{name}{TEMP_SUFFIX}"
+    counter = 1
+    while candidate in static_names[directory] or candidate in assigned[directory]:
+        candidate = f"{name}.{counter}{TEMP_SUFFIX}"
+        counter += 1
+    assigned[directory].add(candidate)
+    return os.path.join(directory, candidate)
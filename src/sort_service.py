@@ -0,0 +1,254 @@
+# src/sort_service.py
+
+import heapq
+import re
+from datetime import datetime
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Formato das datas vindas da extração e formato da parte de data do novo nome.
+INPUT_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+NAME_DATE_FORMAT = "%Y-%m-%d_%H-%M-%S"
+# Formatos de nome disponíveis: até os segundos ou com os milissegundos
+# (ex: 2024-05-01_10-20-30-125).
+NAME_FORMATS = ("seconds", "milliseconds")
+NANOSECONDS = 1_000_000_000
+
+# Caminho rápido para o formato canônico "AAAA:MM:DD HH:MM:SS"; qualquer outra
+# variação aceita pelo strptime (ex: dígitos únicos) cai no caminho lento.
+_CANONICAL_DATE = re.compile(r"(\d{4}):(\d{2}):(\d{2}) (\d{2}):(\d{2}):(\d{2})\Z")
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+_OFFSET = re.compile(r"([+-])(\d{2}):?(\d{2})\Z")
+
+# Backends de ordenação disponíveis. O pandas só é importado se for escolhido.
+SORT_BACKENDS = ("native", "pandas")
+
+
+class RenameEntry:
+    """
+    Registro compacto de uma foto já ordenada, pronto para a renomeação.
+    """
+    __slots__ = ("original_path", "name", "remote_id", "new_name_date", "photographer")
+
+    def __init__(self, original_path: Optional[str], name: str, remote_id: Optional[str],
+                 new_name_date: str, photographer: Optional[str]):
+        self.original_path = original_path
+        self.name = name
+        self.remote_id = remote_id
+        self.new_name_date = new_name_date
+        self.photographer = photographer
+
+    def __eq__(self, other):
+        if not isinstance(other, RenameEntry):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"RenameEntry({fields})"
+
+
+def parse_date(value) -> Optional[datetime]:
+    """
+    Converte uma data no formato "AAAA:MM:DD HH:MM:SS" em datetime.
+
+    Returns:
+        O datetime correspondente, ou None se o valor for vazio ou inválido.
+    """
+    if not isinstance(value, str):
+        return None
+    match = _CANONICAL_DATE.match(value)
+    try:
+        if match:
+            return datetime(*map(int, match.groups()))
+        return datetime.strptime(value, INPUT_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def epoch_seconds(date: datetime) -> int:
+    """
+    Converte um datetime (sem fuso) em segundos inteiros desde 1970-01-01,
+    usado como chave de ordenação.
+    """
+    return ((date.toordinal() - _EPOCH_ORDINAL) * 86400
+            + date.hour * 3600 + date.minute * 60 + date.second)
+
+
+def subsec_to_nanoseconds(value) -> int:
+    """
+    Converte a fração de segundo do EXIF (SubSecTime*, dígitos após a vírgula,
+    ex: "5" = 0,5 s e "050" = 0,05 s) em nanossegundos. Valores ausentes ou
+    inválidos valem 0.
+    """
+    digits = str(value).strip() if value is not None else ""
+    if not digits.isdigit():
+        return 0
+    return int(digits[:9].ljust(9, "0"))
+
+
+def offset_to_seconds(value) -> Optional[int]:
+    """
+    Converte um fuso horário do EXIF (OffsetTime*, ex: "-03:00") em segundos.
+
+    Returns:
+        O deslocamento em relação ao UTC, ou None se ausente ou inválido.
+    """
+    match = _OFFSET.match(value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    sign, hours, minutes = match.groups()
+    seconds = int(hours) * 3600 + int(minutes) * 60
+    return -seconds if sign == "-" else seconds
+
+
+def sequence_key(value) -> int:
+    """
+    Converte o número de sequência da câmera (SequenceNumber) em uma chave de
+    desempate. Valores ausentes ou não numéricos valem 0.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_name_date(date: datetime, subsec_ns: int, name_format: str) -> str:
+    """
+    Gera a parte de data do novo nome no formato escolhido (ver NAME_FORMATS).
+    """
+    name = date.strftime(NAME_DATE_FORMAT)
+    if name_format == "milliseconds":
+        name = f"{name}-{subsec_ns // 1_000_000:03d}"
+    return name
+
+
+def sort_entries(photos: Iterable, name_format: str = "seconds") -> List[RenameEntry]:
+    """
+    Descarta as fotos sem data válida, ordena as demais cronologicamente e
+    gera a parte de data do novo nome, sem depender do pandas.
+
+    A chave de ordenação é o instante da captura em nanossegundos (incluindo a
+    fração de segundo, quando existir) e, em caso de empate, o número de
+    sequência da câmera. Se todas as fotos tiverem fuso horário, a ordem é a
+    do instante em UTC; caso contrário, a do horário local registrado. A
+    ordenação é estável: empates restantes mantêm a ordem de entrada.
+
+    Args:
+        photos: Registros com os atributos date, local_path, name, remote_id,
+                photographer, subsec, offset e sequence (ex: PhotoEntry).
+        name_format: "seconds" ou "milliseconds".
+
+    Returns:
+        A lista de RenameEntry em ordem cronológica.
+    """
+    entries, local_ns, offsets, sequences = _parse_photos(photos, name_format)
+    keys = _sort_keys(local_ns, offsets, sequences, utc=bool(offsets) and None not in offsets)
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return [entries[index] for index in order]
+
+
+def merge_sorted_runs(runs: Iterable[Iterable], name_format: str = "seconds") -> List[RenameEntry]:
+    """
+    Ordena separadamente as fotos de cada fonte e intercala as sequências já
+    ordenadas em uma única linha do tempo, com um merge k-way (heapq.merge).
+
+    O resultado é o mesmo de sort_entries sobre todas as fotos juntas: a
+    ordem é a do instante em UTC só se todas as fotos, de todas as fontes,
+    tiverem fuso horário, e os empates entre fontes seguem a ordem das fontes.
+
+    Args:
+        runs: As fotos de cada fonte (ex: CompositeSource.partition).
+        name_format: "seconds" ou "milliseconds".
+
+    Returns:
+        A lista de RenameEntry de todas as fontes, em ordem cronológica.
+    """
+    parsed = [_parse_photos(run, name_format) for run in runs]
+    utc = any(offsets for _, _, offsets, _ in parsed) and all(None not in offsets for _, _, offsets, _ in parsed)
+    sorted_runs = []
+    for entries, local_ns, offsets, sequences in parsed:
+        keys = _sort_keys(local_ns, offsets, sequences, utc)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_runs.append([(keys[index], entries[index]) for index in order])
+    return [entry for _, entry in heapq.merge(*sorted_runs, key=itemgetter(0))]
+
+
+def _parse_photos(photos: Iterable, name_format: str):
+    """
+    Descarta as fotos sem data válida e retorna, para as demais, os
+    RenameEntry e as listas paralelas de instante local (ns), fuso (s) e
+    número de sequência.
+    """
+    local_ns: List[int] = []
+    offsets: List[Optional[int]] = []
+    sequences: List[int] = []
+    entries: List[RenameEntry] = []
+    for photo in photos:
+        date = parse_date(photo.date)
+        if date is None:
+            continue
+        subsec_ns = subsec_to_nanoseconds(photo.subsec)
+        local_ns.append(epoch_seconds(date) * NANOSECONDS + subsec_ns)
+        offsets.append(offset_to_seconds(photo.offset))
+        sequences.append(sequence_key(photo.sequence))
+        entries.append(RenameEntry(
+            original_path=photo.local_path,
+            name=photo.name,
+            remote_id=photo.remote_id,
+            new_name_date=format_name_date(date, subsec_ns, name_format),
+            photographer=photo.photographer,
+        ))
+    return entries, local_ns, offsets, sequences
+
+
+def _sort_keys(local_ns: List[int], offsets: List[Optional[int]], sequences: List[int],
+               utc: bool) -> List[Tuple[int, int]]:
+    # Chaves de ordenação: instante em UTC (se utc for True) ou local, e número de sequência
+    if utc:
+        return [(ns - offset * NANOSECONDS, sequence) for ns, offset, sequence in zip(local_ns, offsets, sequences)]
+    return list(zip(local_ns, sequences))
+
+
+def sort_entries_with_pandas(photos: Iterable, name_format: str = "seconds") -> List[RenameEntry]:
+    """
+    Mesmo resultado de sort_entries, mas usando o DataFrameService (pandas).
+    O pandas só é importado quando esta função é chamada.
+    """
+    from data_frame_service import DataFrameService
+
+    df_sorted = DataFrameService([photo._asdict() for photo in photos]).prepare_and_sort(name_format)
+    if df_sorted.empty:
+        return []
+    return [
+        RenameEntry(
+            original_path=row.original_path,
+            name=row.name,
+            remote_id=_none_if_missing(row.remote_id),
+            new_name_date=row.new_name_date,
+            photographer=_none_if_missing(row.photographer),
+        )
+        for row in df_sorted.itertuples(index=False)
+    ]
+
+
+def _none_if_missing(value):
+    # O pandas representa valores ausentes como NaN em algumas colunas
+    return None if value is None or value != value else value
+
+
+def get_sort_backend(name: str) -> Callable[..., List[RenameEntry]]:
+    """
+    Retorna a função de ordenação do backend escolhido ("native" ou "pandas").
+
+    Raises:
+        ValueError: Se o backend não existir.
+    """
+    backends: Dict[str, Callable[..., List[RenameEntry]]] = {
+        "native": sort_entries,
+        "pandas": sort_entries_with_pandas,
+    }
+    if name not in backends:
+        raise ValueError(f"Backend de ordenação desconhecido: '{name}'. Use um de: {', '.join(SORT_BACKENDS)}.")
+    return backends[name]
+
@@ -1,6 +1,22 @@
+import logging
+import re
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from dataclasses import dataclass, field
+
+# Nomes de arquivos que já foram renomeados pelo OLAF.
+RENAMED_FILE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}')
+# Extensões de fotos: JPEG, HEIF, TIFF e os RAWs mais comuns. Nas pastas
+# locais, são as únicas processadas por padrão; vídeos, sidecars e arquivos
+# de sistema ficam de fora e nunca chegam ao ExifTool.
+PHOTO_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".jpe", ".heic", ".heif", ".hif", ".avif", ".webp", ".png", ".tif", ".tiff",
+    ".dng", ".cr2", ".cr3", ".crw", ".nef", ".nrw", ".arw", ".srf", ".sr2", ".raf", ".orf",
+    ".rw2", ".rwl", ".pef", ".srw", ".x3f", ".3fr", ".iiq", ".erf", ".mef", ".mos", ".kdc", ".dcr",
+})
+# Arquivos auxiliares que acompanham uma foto com o mesmo nome (ex: edições
+# do Lightroom em DSC_0001.xmp ou DSC_0001.NEF.xmp, ajustes do iPhone em .aae).
+SIDECAR_EXTENSIONS = frozenset({".xmp", ".aae"})
 
 # Convertemos para dataclass para maior flexibilidade.
 @dataclass
@@ -10,14 +26,43 @@ class FileReference:
 
     Attributes:
         local_path: O caminho absoluto para o arquivo no sistema local.
-                    Para o Drive, este é o caminho do arquivo temporário.
+                    Para o Drive, este é o caminho do arquivo temporário,
+                    ou None enquanto o arquivo não tiver sido baixado.
         name: O nome original do arquivo (ex: "imagem.jpg").
         remote_id: O ID do arquivo na fonte remota (ex: Google Drive file_id).
                    É None para fontes locais.
+        size: Tamanho do arquivo em bytes, se conhecido.
+        modified_time: Data de modificação (mtime em ns para arquivos locais,
+                       modifiedTime do Drive para arquivos remotos).
+        checksum: Checksum do conteúdo informado pela fonte (md5Checksum do Drive).
+        parent_id: ID da pasta do arquivo na fonte remota (para o Drive, o
+                   primeiro item de 'parents'). É None para fontes locais.
+        metadata: Metadados já conhecidos sem precisar ler o arquivo (tag -> valor).
+        fetcher: Função que baixa o arquivo e retorna o caminho local. Usada
+                 por ensure_local() quando local_path ainda é None.
+        content: Conteúdo do arquivo (ou só o cabeçalho) mantido em memória,
+                 para fontes que não gravam os downloads em disco. Nesse caso
+                 o fetcher preenche este campo e local_path continua None.
     """
-    local_path: str
+    local_path: Optional[str]
     name: str
     remote_id: Optional[str] = None
+    size: Optional[int] = None
+    modified_time: Optional[str] = None
+    checksum: Optional[str] = None
+    parent_id: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    fetcher: Optional[Callable[["FileReference"], Optional[str]]] = field(default=None, repr=False, compare=False)
+    content: Optional[bytes] = field(default=None, repr=False, compare=False)
+
+    def ensure_local(self) -> Optional[str]:
+        """
+        Garante que o arquivo esteja disponível localmente (em disco ou em
+        'content'), baixando-o se necessário, e retorna o caminho local.
+        """
+        if self.local_path is None and self.content is None and self.fetcher is not None:
+            self.local_path = self.fetcher(self)
+        return self.local_path
 
 
 class BaseSource(ABC):
@@ -25,9 +70,83 @@ class BaseSource(ABC):
     Classe base abstrata que define a interface para qualquer fonte de dados.
     """
     @abstractmethod
+    def iter_files(self) -> Iterator[FileReference]:
+        """
+        Método que descobre os arquivos da fonte e os gera, um a um, como
+        objetos FileReference, sem precisar materializar a lista inteira.
+        """
+        pass
+
     def get_files(self) -> List[FileReference]:
         """
         Método que busca os arquivos da fonte e os retorna como uma lista
         de objetos FileReference.
         """
-        pass
\ No newline at end of file
+        return list(self.iter_files())
+
+    def fetch_all(self, files: Iterable[FileReference]) -> Iterator[FileReference]:
+        """
+        Garante que os arquivos estejam disponíveis localmente e os devolve
+        à medida que ficam prontos (não necessariamente na ordem de entrada).
+        """
+        return fetch_sequentially(files)
+
+    def watcher(self, poll_interval: float):
+        """
+        Retorna um observador (ver watch_service) que informa os arquivos
+        novos que aparecerem na fonte, para o modo watch.
+
+        Args:
+            poll_interval: Intervalo entre consultas, para fontes que não
+                           oferecem notificações.
+
+        Raises:
+            NotImplementedError: Se a fonte não suportar o modo watch.
+        """
+        raise NotImplementedError(f"A fonte {type(self).__name__} não suporta o modo watch.")
+
+    def partition(self, entries: List[Any]) -> List[List[Any]]:
+        """
+        Separa os registros extraídos (ex: PhotoEntry) por fonte de origem,
+        para fontes que combinam várias outras. Por padrão há uma só.
+        """
+        return [entries]
+
+    def release(self, file_ref: FileReference):
+        """
+        Libera a cópia temporária de um arquivo remoto assim que os seus
+        metadados forem extraídos (a renomeação só precisa do remote_id).
+        Por padrão não há nada a liberar.
+        """
+        pass
+
+    @property
+    def bounded_downloads(self) -> bool:
+        """
+        Indica se as cópias temporárias ocupam um espaço limitado (orçamento
+        de disco ou downloads em memória), caso em que cada arquivo deve ser
+        liberado logo depois da extração, em vez de em grupos.
+        """
+        return False
+
+    def cleanup(self):
+        """
+        Libera os recursos temporários da fonte ao final do processamento.
+        Por padrão não há nada a liberar.
+        """
+        pass
+
+
+def fetch_sequentially(files: Iterable[FileReference]) -> Iterator[FileReference]:
+    """
+    Obtém os arquivos localmente, um de cada vez, e os devolve em seguida.
+
+    Falhas individuais são registradas e o arquivo é devolvido sem caminho
+    local, para não interromper o lote.
+    """
+    for file_ref in files:
+        try:
+            file_ref.ensure_local()
+        except Exception as e:
+            logging.error(f"Não foi possível obter o arquivo '{file_ref.name}': {e}")
+        yield file_ref
@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .base_source import BaseSource, FileReference
+
+# Número máximo de itens aguardando na fila comum das fontes.
+MERGE_QUEUE_SIZE = 1000
+
+_END = object()
+
+
+def merge_concurrently(iterables: Sequence[Iterable], name: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Consome vários iteráveis ao mesmo tempo, cada um em uma thread, e gera
+    pares (índice do iterável, item) na ordem em que os itens chegam.
+    Exceções de qualquer iterável são propagadas ao consumidor.
+
+    Args:
+        iterables: Os iteráveis produtores (ex: a listagem de cada fonte).
+        name: Prefixo do nome das threads, usado nos logs.
+    """
+    items: "queue.Queue[Any]" = queue.Queue(maxsize=MERGE_QUEUE_SIZE)
+    stop = threading.Event()
+    failure: List[BaseException] = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(index: int, iterable: Iterable):
+        try:
+            for item in iterable:
+                if not put((index, item)):
+                    return
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            put(_END)
+
+    threads = [
+        threading.Thread(target=produce, args=(index, iterable), name=f"{name}-{index}", daemon=True)
+        for index, iterable in enumerate(iterables)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        remaining = len(threads)
+        while remaining:
+            item = items.get()
+            if item is _END:
+                remaining -= 1
+                if failure:
+                    raise failure[0]
+                continue
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+class CompositeSource(BaseSource):
+    """
+    Fonte que combina várias outras (pastas locais e pastas do Drive) em
+    uma única execução.
+
+    As fontes são listadas ao mesmo tempo e seus arquivos seguem juntos para
+    a extração; downloads e liberações são encaminhados à fonte de origem de
+    cada arquivo. Depois da extração, partition() separa os registros por
+    fonte, para que cada uma seja ordenada e as sequências sejam intercaladas
+    em uma única linha do tempo (ver sort_service.merge_sorted_runs). Cada
+    arquivo é renomeado no seu próprio destino (disco ou Drive).
+    """
+
+    def __init__(self, sources: Sequence[BaseSource]):
+        """
+        Args:
+            sources: As fontes combinadas. Em empates de data, os arquivos
+                     seguem a ordem das fontes.
+        """
+        if not sources:
+            raise ValueError("Informe pelo menos uma fonte.")
+        self.sources = list(sources)
+        # Fonte de origem de cada arquivo descoberto (remote_id ou caminho -> índice)
+        self._origin: Dict[str, int] = {}
+
+    def iter_files(self) -> Iterator[FileReference]:
+        """
+        Lista todas as fontes em paralelo e gera os arquivos à medida que
+        chegam, de qualquer uma delas.
+        """
+        counts = [0] * len(self.sources)
+        for index, file_ref in merge_concurrently([source.iter_files() for source in self.sources], "olaf-source"):
+            self._origin[self._identity(file_ref.local_path, file_ref.remote_id)] = index
+            counts[index] += 1
+            yield file_ref
+        for source, count in zip(self.sources, counts):
+            logging.info(f"{self._describe(source)}: {count} arquivos.")
+
+    def fetch_all(self, files: Iterable[FileReference]) -> Iterator[FileReference]:
+        """
+        Encaminha cada arquivo à fetch_all da sua fonte; os downloads de
+        fontes diferentes acontecem ao mesmo tempo.
+        """
+        by_source: Dict[int, List[FileReference]] = {}
+        for file_ref in files:
+            by_source.setdefault(self._source_index(file_ref.local_path, file_ref.remote_id), []).append(file_ref)
+        if len(by_source) == 1:
+            ((index, source_files),) = by_source.items()
+            yield from self.sources[index].fetch_all(source_files)
+            return
+        fetches = [self.sources[index].fetch_all(source_files) for index, source_files in by_source.items()]
+        for _, file_ref in merge_concurrently(fetches, "olaf-fetch"):
+            yield file_ref
+
+    def release(self, file_ref: FileReference):
+        """
+        Libera a cópia temporária do arquivo na sua fonte de origem.
+        """
+        self.sources[self._source_index(file_ref.local_path, file_ref.remote_id)].release(file_ref)
+
+    @property
+    def bounded_downloads(self) -> bool:
+        return any(source.bounded_downloads for source in self.sources)
+
+    def partition(self, entries: List[Any]) -> List[List[Any]]:
+        """
+        Separa os registros extraídos (ex: PhotoEntry) pela fonte de origem,
+        na ordem das fontes.
+        """
+        runs: List[List[Any]] = [[] for _ in self.sources]
+        for entry in entries:
+            runs[self._source_index(entry.local_path, entry.remote_id)].append(entry)
+        return runs
+
+    @property
+    def drive_client(self):
+        """
+        Cliente usado nas renomeações do Drive: o da primeira fonte do Drive.
+        As renomeações só precisam do ID de cada arquivo.
+        """
+        for source in self.sources:
+            client = getattr(source, "drive_client", None)
+            if client is not None:
+                return client
+        return None
+
+    def cleanup(self):
+        """
+        Libera os recursos temporários de todas as fontes.
+        """
+        for source in self.sources:
+            source.cleanup()
+
+    def _source_index(self, local_path: Optional[str], remote_id: Optional[str]) -> int:
+        return self._origin.get(self._identity(local_path, remote_id), 0)
+
+    @staticmethod
+    def _identity(local_path: Optional[str], remote_id: Optional[str]) -> Optional[str]:
+        # Arquivos do Drive mudam de caminho local ao serem baixados; o ID não muda
+        return f"drive:{remote_id}" if remote_id else f"local:{local_path}"
+
+    @staticmethod
+    def _describe(source: BaseSource) -> str:
+        if getattr(source, "folder_id", None):
+            return f"Pasta do Drive {source.folder_id}"
+        return f"Pasta local {getattr(source, 'path', type(source).__name__)}"
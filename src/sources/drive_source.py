@@ -1,71 +1,335 @@
-from typing import List
-from .base_source import BaseSource, FileReference
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, Optional
+from .base_source import BaseSource, FileReference, RENAMED_FILE_PATTERN
 # Importa o drive_service de uma forma que o Python entenda no contexto do main.py
-from drive_service import GoogleDriveClient
+from drive_service import GoogleDriveClient, DEFAULT_FILE_FIELDS
+import exif_reader
+import metrics
 import tempfile
 import os
 import logging
 import shutil
-import re  # <-- ADICIONAR ESTA LINHA
+import re
+import threading
+
+# Tamanho do primeiro intervalo baixado no modo somente cabeçalho.
+HEADER_INITIAL_SIZE = 64 * 1024
+
+# Formato de imageMediaMetadata.time, idêntico ao das datas EXIF.
+DRIVE_IMAGE_TIME_PATTERN = re.compile(r'^\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2}$')
+
+
+class DiskBudget:
+    """
+    Limita o total de bytes baixados e ainda não liberados. Os downloads
+    esperam enquanto o orçamento estiver cheio; um arquivo maior que o
+    orçamento inteiro é aceito quando nada mais estiver ocupando espaço,
+    para não travar a execução.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int):
+        """Reserva 'size' bytes, esperando até haver espaço."""
+        with self._condition:
+            if self.used > 0 and self.used + size > self.limit:
+                metrics.incr("disk_budget_waits")
+                while self.used > 0 and self.used + size > self.limit:
+                    self._condition.wait()
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def resize(self, reserved: int, actual: int):
+        """Troca uma reserva estimada pelo tamanho real do que foi baixado."""
+        with self._condition:
+            self.used += actual - reserved
+            self.peak = max(self.peak, self.used)
+            if actual < reserved:
+                self._condition.notify_all()
+
+    def release(self, size: int):
+        """Devolve 'size' bytes ao orçamento."""
+        with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
 
 class DriveSource(BaseSource):
     """
     Implementação da fonte de dados para o Google Drive.
     """
-    def __init__(self, credentials_path: str, folder_id: str):
-        self.drive_client = GoogleDriveClient(credentials_path)
+    def __init__(self, credentials_path: str, folder_id: str, metadata_only: bool = False,
+                 header_only: bool = False, api_endpoint: str = None, concurrency: int = 4,
+                 recursive: bool = False, disk_budget: Optional[int] = None, in_memory: bool = False):
+        """
+        Args:
+            credentials_path: Caminho para o arquivo JSON de credenciais.
+            folder_id: ID da pasta do Drive.
+            metadata_only: Se True, usa a data de captura informada pela própria
+                           API (imageMediaMetadata.time) e só baixa os arquivos
+                           em que ela não estiver disponível.
+            header_only: Se True, baixa apenas o início de cada arquivo (HTTP
+                         Range), aumentando o intervalo só enquanto o leitor
+                         EXIF precisar de mais bytes.
+            api_endpoint: URL base alternativa da API do Drive (ex: servidor local de testes).
+            concurrency: Número máximo de downloads simultâneos. O limite efetivo
+                         é reduzido automaticamente quando o Drive limita a taxa.
+            recursive: Se True, inclui os arquivos de todas as subpastas.
+            disk_budget: Máximo de bytes baixados mantidos ao mesmo tempo. Cada
+                         arquivo é liberado assim que seus metadados são
+                         extraídos, e os downloads esperam enquanto o
+                         orçamento estiver cheio. None não impõe limite.
+            in_memory: Se True, os downloads ficam em memória e nada é gravado
+                       no diretório temporário; o orçamento passa a limitar a
+                       memória usada pelos downloads.
+        """
+        self.drive_client = GoogleDriveClient(
+            credentials_path, api_endpoint=api_endpoint, max_concurrency=concurrency
+        )
+        self.concurrency = concurrency
+        self.recursive = recursive
         self.folder_id = folder_id
+        self.metadata_only = metadata_only
+        self.header_only = header_only
+        self.in_memory = in_memory
+        self.disk_budget = DiskBudget(disk_budget) if disk_budget is not None else None
+        # Bytes reservados no orçamento por arquivo ainda não liberado (remote_id -> bytes)
+        self._reserved: Dict[str, int] = {}
+        self._reserved_lock = threading.Lock()
+        self._download_executor = None
         # Cria um diretório temporário para baixar os arquivos
         self.temp_dir = tempfile.mkdtemp(prefix="olaf_drive_")
         logging.info(f"Diretório temporário para o Drive criado em: {self.temp_dir}")
 
-    def get_files(self) -> List[FileReference]:
+    def iter_files(self) -> Iterator[FileReference]:
         """
-        Baixa os arquivos do Drive para uma pasta local temporária e retorna
-        as referências, preservando o ID original do Drive.
+        Lista os arquivos do Drive e gera as referências à medida que as
+        páginas da listagem chegam, preservando o ID original do Drive.
+
+        Os arquivos não são baixados aqui: cada referência recebe um 'fetcher'
+        que baixa o arquivo para a pasta temporária apenas quando o conteúdo
+        for realmente necessário (ex: em uma falha do cache de metadados).
 
         Arquivos que já estão no formato renomeado são ignorados e não são
         baixados.
         """
-        query = f"'{self.folder_id}' in parents and trashed = false"
-        all_drive_files = self.drive_client.list_files(query=query, page_size=1000)
-        
-        # --- LÓGICA DE FILTRAGEM ADICIONADA ---
-        RENAMED_FILE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}')
-        files_to_process = []
-        skipped_count = 0
+        all_drive_files = self.drive_client.walk_folder(
+            self.folder_id, fields=self.file_fields, recursive=self.recursive, max_workers=self.concurrency
+        )
 
+        skipped_count = 0
+        listed_count = 0
+        from_api_count = 0
         for drive_file in all_drive_files:
             if RENAMED_FILE_PATTERN.match(drive_file['name']):
                 skipped_count += 1
                 continue
-            files_to_process.append(drive_file)
+
+            listed_count += 1
+            file_ref = self.reference_for(drive_file)
+            if file_ref.metadata:
+                from_api_count += 1
+            yield file_ref
 
         if skipped_count > 0:
             logging.info(f"Ignorados {skipped_count} arquivos que já parecem ter sido renomeados.")
-        # --- FIM DA LÓGICA DE FILTRAGEM ---
-
-        local_files = []
-        # O loop agora itera sobre a lista já filtrada
-        for drive_file in files_to_process:
-            logging.info(f"Baixando '{drive_file['name']}' do Google Drive...")
-            destination_path = os.path.join(self.temp_dir, drive_file['name'])
-            
-            self.drive_client.download_file(drive_file['id'], destination_path)
-            
-            local_files.append(
-                FileReference(
-                    local_path=destination_path,
-                    name=drive_file['name'],
-                    remote_id=drive_file['id']
-                )
+        if self.metadata_only:
+            logging.info(
+                f"Data de captura obtida da API do Drive para {from_api_count} de {listed_count} arquivos; "
+                f"os demais serão baixados."
+            )
+
+    @property
+    def file_fields(self) -> str:
+        """
+        Campos de cada arquivo pedidos à API do Drive.
+        """
+        if self.metadata_only:
+            return f"{DEFAULT_FILE_FIELDS}, imageMediaMetadata(time)"
+        return DEFAULT_FILE_FIELDS
+
+    def reference_for(self, drive_file: dict) -> FileReference:
+        """
+        Cria a referência de um arquivo listado pela API, ainda sem baixá-lo.
+        """
+        return FileReference(
+            local_path=None,
+            name=drive_file['name'],
+            remote_id=drive_file['id'],
+            size=int(drive_file['size']) if drive_file.get('size') else None,
+            modified_time=drive_file.get('modifiedTime'),
+            checksum=drive_file.get('md5Checksum'),
+            parent_id=(drive_file.get('parents') or [None])[0],
+            metadata=self._api_metadata(drive_file),
+            fetcher=self._download
+        )
+
+    def watcher(self, poll_interval: float):
+        """
+        Observa a pasta pela API de mudanças do Drive, consultada a cada
+        'poll_interval' segundos. O token da última consulta processada é
+        salvo, de modo que uma nova execução continua de onde a anterior parou.
+        """
+        from watch_service import DriveChangesWatcher
+        return DriveChangesWatcher(self, poll_interval)
+
+    def _api_metadata(self, drive_file: dict):
+        """
+        Retorna os metadados que a própria API do Drive já informa sobre o
+        arquivo, no formato das tags do ExifTool, ou None.
+        """
+        if not self.metadata_only:
+            return None
+        capture_time = drive_file.get('imageMediaMetadata', {}).get('time')
+        if capture_time and DRIVE_IMAGE_TIME_PATTERN.match(capture_time):
+            return {'CreateDate': capture_time}
+        return None
+
+    def fetch_all(self, files: Iterable[FileReference]) -> Iterator[FileReference]:
+        """
+        Baixa os arquivos em paralelo e os devolve assim que cada download
+        termina, para que a extração comece sem esperar os demais.
+        """
+        files = list(files)
+        if len(files) <= 1 or self.concurrency <= 1:
+            yield from super().fetch_all(files)
+            return
+
+        # O executor (e a conexão HTTP de cada uma das suas threads) é reaproveitado
+        # entre as chamadas, o que evita reconectar a cada lote no modo watch
+        if self._download_executor is None:
+            self._download_executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="olaf-download"
             )
-            
-        return local_files
+        futures = {self._download_executor.submit(file_ref.ensure_local): file_ref for file_ref in files}
+        try:
+            for future in as_completed(futures):
+                file_ref = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Não foi possível baixar '{file_ref.name}' do Google Drive: {e}")
+                yield file_ref
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _download(self, file_ref: FileReference) -> str:
+        """
+        Baixa um arquivo do Drive para a pasta temporária e retorna o caminho local.
+
+        No modo somente cabeçalho, grava apenas os bytes iniciais necessários
+        para o leitor EXIF; o arquivo completo só é baixado se o formato não
+        for reconhecido ou se as datas não forem encontradas no cabeçalho.
+        """
+        # O orçamento é reservado antes de ocupar uma vaga do limitador, de modo
+        # que um download à espera de espaço não impede os demais de terminar
+        reserved = file_ref.size or 0
+        self._reserve(file_ref, reserved)
+        try:
+            # O limitador adaptativo controla quantos downloads rodam ao mesmo tempo
+            with self.drive_client.limiter, metrics.stage("download"):
+                if self.in_memory:
+                    file_ref.content = self._download_content(file_ref)
+                    path, size = None, len(file_ref.content)
+                else:
+                    # O ID garante nomes únicos mesmo com arquivos homônimos na pasta
+                    path = os.path.join(self.temp_dir, f"{file_ref.remote_id}_{file_ref.name}")
+                    self._download_to(file_ref, path)
+                    size = os.path.getsize(path)
+        except BaseException:
+            self.release(file_ref)
+            raise
+        if self.disk_budget is not None:
+            self.disk_budget.resize(reserved, size)
+            with self._reserved_lock:
+                self._reserved[file_ref.remote_id] = size
+        metrics.incr("files_downloaded")
+        metrics.incr("bytes_downloaded", size)
+        return path
+
+    def _reserve(self, file_ref: FileReference, size: int):
+        if self.disk_budget is None:
+            return
+        self.disk_budget.acquire(size)
+        with self._reserved_lock:
+            self._reserved[file_ref.remote_id] = size
+
+    def _download_to(self, file_ref: FileReference, destination_path: str):
+        content = self._download_header(file_ref) if self.header_only else None
+        if content is not None:
+            with open(destination_path, 'wb') as fh:
+                fh.write(content)
+            return
+
+        logging.debug(f"Baixando '{file_ref.name}' do Google Drive...")
+        self.drive_client.download_file(file_ref.remote_id, destination_path)
+
+    def _download_content(self, file_ref: FileReference) -> bytes:
+        content = self._download_header(file_ref) if self.header_only else None
+        if content is not None:
+            return content
+
+        logging.debug(f"Baixando '{file_ref.name}' do Google Drive para a memória...")
+        return self.drive_client.download_content(file_ref.remote_id)
+
+    def _download_header(self, file_ref: FileReference) -> Optional[bytes]:
+        """
+        Baixa por intervalos apenas o cabeçalho do arquivo.
+
+        Returns:
+            Os bytes do cabeçalho, ou None se ele não contiver datas EXIF
+            legíveis (e o arquivo precisar ser baixado por completo).
+        """
+        def fetch(start: int, end: int) -> bytes:
+            return self.drive_client.download_range(file_ref.remote_id, start, end)
+
+        buffer = exif_reader.HeadBuffer(fetch, initial_size=HEADER_INITIAL_SIZE)
+        record = exif_reader.read_exif_buffer(buffer)
+        if not record:
+            logging.debug(f"Cabeçalho de '{file_ref.name}' sem datas legíveis; baixando o arquivo completo.")
+            return None
+
+        metrics.incr("header_only_downloads")
+        logging.debug(f"Baixado apenas o cabeçalho de '{file_ref.name}' ({len(buffer.data)} bytes).")
+        return buffer.data
+
+    def release(self, file_ref: FileReference):
+        """
+        Remove a cópia temporária (em disco ou em memória) de um arquivo já
+        extraído e devolve o seu espaço ao orçamento.
+        """
+        if file_ref.local_path and os.path.dirname(file_ref.local_path) == self.temp_dir:
+            try:
+                os.remove(file_ref.local_path)
+            except FileNotFoundError:
+                pass
+            file_ref.local_path = None
+        file_ref.content = None
+        if self.disk_budget is not None:
+            with self._reserved_lock:
+                size = self._reserved.pop(file_ref.remote_id, 0)
+            self.disk_budget.release(size)
+
+    @property
+    def bounded_downloads(self) -> bool:
+        return self.disk_budget is not None or self.in_memory
 
     def cleanup(self):
         """
-        Remove o diretório temporário e todo o seu conteúdo.
+        Encerra os downloads e remove o diretório temporário e todo o seu conteúdo.
         """
+        if self._download_executor is not None:
+            self._download_executor.shutdown(wait=True, cancel_futures=True)
+            self._download_executor = None
+        if self.disk_budget is not None:
+            logging.info(
+                f"Orçamento de downloads: pico de {self.disk_budget.peak / 1024 / 1024:.1f} MiB "
+                f"de {self.disk_budget.limit / 1024 / 1024:.1f} MiB."
+            )
         logging.info(f"Limpando diretório temporário: {self.temp_dir}")
         shutil.rmtree(self.temp_dir)
\ No newline at end of file
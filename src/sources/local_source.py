@@ -1,25 +1,260 @@
+import fnmatch
+import logging
 import os
-from typing import List
-from .base_source import BaseSource, FileReference
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from stat import S_ISREG
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from .base_source import BaseSource, FileReference, PHOTO_EXTENSIONS, RENAMED_FILE_PATTERN, SIDECAR_EXTENSIONS
+from rename_planner import TEMP_SUFFIX
+
+# Número padrão de pastas listadas ao mesmo tempo na busca recursiva. A
+# listagem espera principalmente pelo sistema de arquivos (ex: NAS), não
+# pela CPU, por isso o valor não depende do número de processadores.
+DEFAULT_SCAN_WORKERS = 8
+# Número máximo de arquivos repassados de cada vez durante a listagem de uma
+# pasta, para que pastas enormes não precisem ser listadas por inteiro antes
+# de a extração começar.
+SCAN_BATCH_SIZE = 1000
+
+
+class FileFilter:
+    """
+    Decide quais arquivos da pasta são processados.
+
+    Um padrão sem curingas vale como extensão ("mov" ou ".mov") e como nome
+    exato de arquivo ou pasta ("Lixeira"). Com curingas (*, ? ou [), é um
+    glob comparado com o nome ou, se contiver "/", com o caminho relativo à
+    pasta. Sem padrões de inclusão, são aceitas as extensões de
+    PHOTO_EXTENSIONS (e as de SIDECAR_EXTENSIONS, se 'sidecars' for True).
+    Arquivos e pastas ocultos são sempre ignorados, e os padrões de exclusão
+    também se aplicam às subpastas.
+    """
+
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None,
+                 sidecars: bool = False):
+        self.include_extensions, self._include_name, self._include_path = self._compile(include or ())
+        if not include:
+            self.include_extensions = PHOTO_EXTENSIONS | SIDECAR_EXTENSIONS if sidecars else PHOTO_EXTENSIONS
+        self.exclude_extensions, self._exclude_name, self._exclude_path = self._compile(exclude or ())
+
+    @staticmethod
+    def _compile(patterns: Iterable[str]):
+        """
+        Separa os padrões em extensões e globs, e junta os globs em uma única
+        expressão regular para o nome e outra para o caminho relativo (ou None).
+        """
+        extensions, name_globs, path_globs = set(), [], []
+        for pattern in patterns:
+            if not any(char in pattern for char in "*?["):
+                extensions.add("." + pattern.lower().lstrip("."))
+            # Todo padrão também vale como glob; sem curingas, casa só o nome exato
+            (path_globs if "/" in pattern else name_globs).append(fnmatch.translate(pattern))
+
+        def combine(globs):
+            return re.compile("|".join(globs)) if globs else None
+        return frozenset(extensions), combine(name_globs), combine(path_globs)
+
+    @staticmethod
+    def _matches(name_regex, path_regex, name: str, relative_dir: str) -> bool:
+        if name_regex is not None and name_regex.match(name):
+            return True
+        return path_regex is not None and path_regex.match(f"{relative_dir}/{name}" if relative_dir else name) is not None
+
+    def accepts(self, name: str, relative_dir: str = "") -> bool:
+        """
+        Retorna True se o arquivo 'name', na subpasta 'relative_dir' (caminho
+        relativo à pasta, com "/"), deve ser processado.
+        """
+        if name.startswith("."):
+            return False
+        dot = name.rfind(".")
+        extension = name[dot:].lower() if dot > 0 else ""
+        if extension in self.exclude_extensions or self._matches(self._exclude_name, self._exclude_path, name, relative_dir):
+            return False
+        return extension in self.include_extensions or self._matches(self._include_name, self._include_path, name, relative_dir)
+
+    def accepts_dir(self, name: str, relative_dir: str = "") -> bool:
+        """
+        Retorna True se a subpasta 'name', dentro de 'relative_dir', deve ser percorrida.
+        """
+        return not name.startswith(".") and not self._matches(self._exclude_name, self._exclude_path, name, relative_dir)
+
+
+class DirectoryScan(NamedTuple):
+    """Parte da listagem de uma pasta."""
+    files: List[FileReference]
+    # (caminho, caminho relativo) de cada subpasta a percorrer; só preenchido na última parte
+    subdirectories: List[Tuple[str, str]]
+    renamed: int = 0
+    filtered: int = 0
+    # True na última parte da pasta
+    complete: bool = True
+
 
 class LocalSource(BaseSource):
     """
     Implementação da fonte de dados para uma pasta local.
     """
-    def __init__(self, path: str):
+    def __init__(self, path: str, recursive: bool = False, include: Optional[Iterable[str]] = None,
+                 exclude: Optional[Iterable[str]] = None, scan_workers: int = DEFAULT_SCAN_WORKERS,
+                 sidecars: bool = False):
+        """
+        Args:
+            path: A pasta com as fotos.
+            recursive: Se True, inclui os arquivos de todas as subpastas.
+            include: Extensões ou globs dos arquivos processados (ver FileFilter).
+                     Se None, apenas as extensões de fotos conhecidas.
+            exclude: Extensões ou globs de arquivos e subpastas ignorados.
+            scan_workers: Número máximo de subpastas listadas ao mesmo tempo.
+            sidecars: Se True, inclui por padrão os sidecars (.xmp, .aae),
+                      renomeados junto com a foto de mesmo nome (ver capture_groups).
+        """
         if not os.path.isdir(path):
             raise FileNotFoundError(f"O diretório especificado não existe: {path}")
         self.path = path
+        self.recursive = recursive
+        self.filter = FileFilter(include, exclude, sidecars)
+        self.scan_workers = scan_workers
+
+    def iter_files(self) -> Iterator[FileReference]:
+        """
+        Busca os arquivos da pasta (e das subpastas, se recursivo) e os gera
+        como referências, à medida que cada pasta é listada.
+
+        A listagem usa os.scandir, que informa o tipo de cada entrada sem um
+        stat por arquivo; o stat (tamanho e data, usados pelo cache) só é
+        feito nos arquivos aceitos pelo filtro. Arquivos que já estão no
+        formato renomeado são ignorados, como no DriveSource.
+        """
+        scans = self._walk() if self.recursive else self._scan_directory(self.path, "")
+        renamed = filtered = 0
+        for scan in scans:
+            renamed += scan.renamed
+            filtered += scan.filtered
+            yield from scan.files
+
+        if renamed:
+            logging.info(f"Ignorados {renamed} arquivos que já parecem ter sido renomeados.")
+        if filtered:
+            logging.info(f"Ignorados {filtered} arquivos que não são fotos ou foram excluídos pelos filtros.")
+
+    def _walk(self) -> Iterator[DirectoryScan]:
+        """
+        Lista as subpastas em paralelo, com até 'scan_workers' pastas ao
+        mesmo tempo, e gera as partes de cada listagem à medida que chegam.
+        """
+        results: "queue.Queue[DirectoryScan]" = queue.Queue(maxsize=self.scan_workers * 2)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # Espera por espaço na fila, desistindo se o consumidor tiver parado
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan(directory: str, relative: str):
+            try:
+                for part in self._scan_directory(directory, relative):
+                    if not put(part):
+                        return
+            except Exception as e:
+                logging.error(f"Falha ao listar a pasta {directory}: {e}")
+                put(DirectoryScan([], []))
+
+        directories = deque([(self.path, "")])
+        active = 0
+        executor = ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix="olaf-scan")
+        try:
+            while directories or active:
+                while directories and active < self.scan_workers:
+                    executor.submit(scan, *directories.popleft())
+                    active += 1
+                part = results.get()
+                if part.complete:
+                    active -= 1
+                    directories.extend(part.subdirectories)
+                yield part
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def _scan_directory(self, directory: str, relative: str) -> Iterator[DirectoryScan]:
+        """
+        Lista uma pasta e gera os arquivos aceitos em partes de até
+        SCAN_BATCH_SIZE; a última parte traz as subpastas a percorrer.
+        """
+        files, subdirectories = [], []
+        renamed = filtered = 0
+        accepts, is_renamed = self.filter.accepts, RENAMED_FILE_PATTERN.match
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if len(files) >= SCAN_BATCH_SIZE:
+                    yield DirectoryScan(files, [], renamed, filtered, complete=False)
+                    files, renamed, filtered = [], 0, 0
+                name = entry.name
+                try:
+                    # O tipo vem da própria listagem (d_type), sem um stat por entrada
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and self.filter.accepts_dir(name, relative):
+                            subdirectories.append((entry.path, f"{relative}/{name}" if relative else name))
+                        continue
+                    if not entry.is_file() or name.endswith(TEMP_SUFFIX):
+                        continue
+                    if is_renamed(name):
+                        renamed += 1
+                        continue
+                    if not accepts(name, relative):
+                        filtered += 1
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Removido durante a listagem
+                    continue
+                files.append(FileReference(
+                    local_path=entry.path,
+                    name=name,
+                    size=stat.st_size,
+                    modified_time=str(stat.st_mtime_ns)
+                ))
+        yield DirectoryScan(files, subdirectories, renamed, filtered)
+
+    def reference_for(self, filename: str) -> Optional[FileReference]:
+        """
+        Cria a referência de um arquivo da pasta.
+
+        Returns:
+            A FileReference, ou None se o nome não for um arquivo regular
+            (ex: subpasta ou arquivo já removido) ou não passar pelo filtro.
+        """
+        relative_dir, name = os.path.split(filename)
+        if not self.filter.accepts(name, relative_dir.replace(os.sep, "/")):
+            return None
+        full_path = os.path.join(self.path, filename)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        return FileReference(
+            local_path=full_path,
+            name=name,
+            size=stat.st_size,
+            modified_time=str(stat.st_mtime_ns)
+        )
 
-    def get_files(self) -> List[FileReference]:
+    def watcher(self, poll_interval: float):
         """
-        Busca arquivos em uma pasta local e os retorna como referências.
+        Observa a pasta com inotify (Linux) ou, onde ele não estiver
+        disponível, comparando listagens a cada 'poll_interval' segundos.
         """
-        files = []
-        for filename in os.listdir(self.path):
-            full_path = os.path.join(self.path, filename)
-            if os.path.isfile(full_path):
-                files.append(
-                    FileReference(local_path=full_path, name=filename)
-                )
-        return files
\ No newline at end of file
+        from watch_service import LocalWatcher
+        return LocalWatcher(self, poll_interval)
@@ -0,0 +1,126 @@
+# src/startup_profile.py
+
+import builtins
+import importlib
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# Opção da linha de comando que ativa o perfil de inicialização. É verificada
+# diretamente em sys.argv, antes do argparse, para medir também as
+# importações feitas no carregamento do main.
+FLAG = "--profile-startup"
+
+
+class ImportProfiler:
+    """
+    Mede o tempo de importação de cada módulo carregado enquanto está
+    instalado, separando o tempo próprio do módulo do tempo gasto em
+    importações aninhadas.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # módulo -> (tempo acumulado, tempo próprio), em segundos
+        self.records: Dict[str, Tuple[float, float]] = {}
+        self._local = threading.local()
+        self._original_import = None
+        self._original_import_module = None
+
+    def install(self):
+        """
+        Passa a medir as importações (instrução import e importlib.import_module).
+        """
+        if self._original_import is not None:
+            return
+        original_import = builtins.__import__
+        original_import_module = importlib.import_module
+        self._original_import = original_import
+        self._original_import_module = original_import_module
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level:
+                # Importações relativas: o nome real depende do pacote de origem
+                package = (globals or {}).get("__package__") or ""
+                name_key = f"{package}.{name}" if name else package
+            else:
+                name_key = name
+            return self._timed(name_key, lambda: original_import(name, globals, locals, fromlist, level))
+
+        def timed_import_module(name, package=None):
+            return self._timed(name, lambda: original_import_module(name, package))
+
+        builtins.__import__ = timed_import
+        importlib.import_module = timed_import_module
+
+    def uninstall(self):
+        """
+        Restaura o mecanismo de importação original.
+        """
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        importlib.import_module = self._original_import_module
+        self._original_import = None
+        self._original_import_module = None
+
+    def _timed(self, name: str, load):
+        if name in sys.modules:
+            return load()
+        stack: List[float] = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return load()
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if name in sys.modules and name not in self.records:
+                self.records[name] = (elapsed, elapsed - nested)
+
+    def report(self, limit: int = 25) -> str:
+        """
+        Monta o relatório com os módulos mais lentos e o tempo total desde a
+        instalação do perfil.
+
+        Args:
+            limit: Número máximo de módulos listados.
+        """
+        total = time.perf_counter() - self.started
+        lines = [
+            f"Perfil de inicialização: {total * 1000:.1f} ms até o início do processamento, "
+            f"{len(self.records)} módulos importados.",
+            f"{'acumulado (ms)':>15} {'próprio (ms)':>13}  módulo",
+        ]
+        ranked = sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (cumulative, own) in ranked[:limit]:
+            lines.append(f"{cumulative * 1000:>15.1f} {own * 1000:>13.1f}  {name}")
+        return "\n".join(lines)
+
+
+_profiler = None
+
+
+def start_if_requested(argv: List[str]):
+    """
+    Instala o perfil de importação se a opção FLAG estiver presente.
+    """
+    global _profiler
+    if FLAG in argv and _profiler is None:
+        _profiler = ImportProfiler()
+        _profiler.install()
+
+
+def finish():
+    """
+    Desinstala o perfil (se ativo) e imprime o relatório no stderr.
+    """
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.uninstall()
+    print(_profiler.report(), file=sys.stderr)
+    _profiler = None
@@ -3,8 +3,9 @@
 import re
 import os
 import logging
-import subprocess
+from typing import Optional
 from raw_service import ExifMetadataExtractor
+from exiftool_service import ExifToolPool
 
 class TuplesService:
     """
@@ -12,14 +13,17 @@ class TuplesService:
     extraída dos metadados dos arquivos RAW presentes em um diretório.
     """
 
-    def __init__(self, dir_path: str):
+    def __init__(self, dir_path: str, pool: Optional[ExifToolPool] = None):
         """
         Inicializa o serviço com o caminho do diretório contendo os arquivos RAW.
 
         Args:
             dir_path (str): Caminho para o diretório.
+            pool (ExifToolPool, optional): Pool de processos ExifTool persistentes.
+                                           Se None, usa o pool global.
         """
         self.dir_path = dir_path
+        self.pool = pool
         # Gera a lista de caminhos completos dos arquivos no diretório
         self.file_paths = self.file_paths_to_list()
 
@@ -56,6 +60,9 @@ class TuplesService:
         if paths_list is None:
             paths_list = self.file_paths
 
+        # Extrai a data de criação de todos os arquivos em lotes
+        records = ExifMetadataExtractor.extract_batch(paths_list, tags=("CreateDate",), pool=self.pool)
+
         list_of_tuples = []
         # Itera sobre cada caminho na lista
         for path in paths_list:
@@ -63,10 +70,7 @@ class TuplesService:
             file_name_with_extension = os.path.basename(path)
             # Separa o nome do arquivo da extensão
             file_name, _ = os.path.splitext(file_name_with_extension)
-            # Inicializa o extractor para o arquivo RAW
-            extractor = ExifMetadataExtractor(path)
-            # Extrai a data de criação utilizando a flag "-CreateDate"
-            file_date = extractor.extract_date("-CreateDate")
+            file_date = records.get(path, {}).get("CreateDate")
             # Adiciona uma tupla com o nome e a data à lista
             list_of_tuples.append((file_name, file_date))
         return list_of_tuples
@@ -1,5 +1,7 @@
 import os
 import re
+from itertools import islice
+from typing import Iterable, Iterator, List
 
 
 def parse_photographer_name(filename: str) -> str | None:
@@ -61,4 +63,37 @@ def sanitize_for_filename(name: str) -> str:
     name = re.sub(r'[ç]', 'c', name, flags=re.IGNORECASE)
     # Remove quaisquer caracteres restantes que não sejam letras, números ou hífen
     name = re.sub(r'[^a-zA-Z0-9-]', '', name)
-    return name
\ No newline at end of file
+    return name
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """
+    Divide um iterável em listas de no máximo 'size' elementos.
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def state_dir(*parts: str) -> str:
+    """
+    Retorna um caminho dentro do diretório de estado do OLAF
+    (XDG_STATE_HOME/olaf ou ~/.local/state/olaf).
+    """
+    state_home = os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, "olaf", *parts)
+
+def parse_size(text: str) -> int:
+    """
+    Converte um tamanho como "500M", "2G" ou "1048576" em bytes (sufixos
+    K, M, G e T em potências de 1024, com ou sem "B"/"iB").
+
+    Raises:
+        ValueError: Se o texto não for um tamanho válido.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*', text, flags=re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamanho inválido: '{text}'")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
@@ -0,0 +1,414 @@
+# src/watch_service.py
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import utils
+from rename_planner import TEMP_SUFFIX
+from sources.base_source import BaseSource, FileReference, RENAMED_FILE_PATTERN
+
+# Constantes do inotify (linux/inotify.h).
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# Cabeçalho de cada evento: wd, mask, cookie, len (seguido do nome com 'len' bytes).
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+# Espera após uma falha na consulta ou no processamento de um lote; dobra a
+# cada falha seguida, até WATCH_MAX_BACKOFF segundos.
+WATCH_INITIAL_BACKOFF = 1.0
+WATCH_MAX_BACKOFF = 300.0
+
+# Mesmo valor de drive_service.FOLDER_MIME_TYPE, repetido aqui para que a
+# observação de pastas locais não carregue o cliente do Drive.
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def _is_candidate(name: str) -> bool:
+    # Ignora arquivos ocultos, já renomeados e os nomes temporários do próprio OLAF
+    return not (name.startswith(".") or name.endswith(TEMP_SUFFIX) or RENAMED_FILE_PATTERN.match(name))
+
+
+class Inotify:
+    """
+    Acesso mínimo ao inotify do Linux via ctypes, sem dependências externas.
+    """
+
+    def __init__(self, path: str, mask: int = IN_CLOSE_WRITE | IN_MOVED_TO):
+        """
+        Args:
+            path: Diretório observado.
+            mask: Eventos observados. O padrão avisa quando um arquivo termina
+                  de ser gravado ou é movido para dentro do diretório.
+
+        Raises:
+            OSError: Se o inotify não estiver disponível ou a observação falhar.
+        """
+        libc = self._load_libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 falhou: {os.strerror(errno)}")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Não foi possível observar '{path}': {os.strerror(errno)}")
+
+    @staticmethod
+    def _load_libc():
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify só está disponível no Linux.")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("A libc não oferece inotify.")
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+
+    def read(self, timeout: float) -> Iterator[Tuple[int, str]]:
+        """
+        Espera até 'timeout' segundos por eventos e gera (mask, nome) para
+        cada um que chegou.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LocalWatcher:
+    """
+    Observa uma pasta local e informa os arquivos novos que aparecerem nela.
+
+    Usa inotify quando disponível; caso contrário, compara listagens
+    sucessivas e só informa um arquivo quando o seu tamanho para de mudar
+    entre duas listagens.
+    """
+
+    def __init__(self, source, poll_interval: float):
+        """
+        Args:
+            source: A LocalSource observada.
+            poll_interval: Intervalo entre listagens, quando o inotify não
+                           estiver disponível.
+        """
+        self.source = source
+        self.poll_interval = poll_interval
+        try:
+            self._inotify: Optional[Inotify] = Inotify(source.path)
+            logging.info(f"Observando '{source.path}' com inotify.")
+        except OSError as e:
+            self._inotify = None
+            logging.info(f"inotify indisponível ({e}); observando '{source.path}' "
+                         f"a cada {poll_interval:g}s.")
+        # Arquivos já existentes não são processados pelo modo watch
+        self._sizes: Dict[str, int] = self._snapshot()
+        self._known: Set[str] = set(self._sizes)
+
+    def poll(self, timeout: float) -> List[FileReference]:
+        """
+        Espera até 'timeout' segundos e retorna as referências dos arquivos
+        novos detectados (possivelmente nenhum).
+        """
+        if self._inotify is not None:
+            names = self._read_events(timeout)
+        else:
+            names = self._compare_snapshots(timeout)
+        references = []
+        for name in names:
+            file_ref = self.source.reference_for(name)
+            if file_ref is not None:
+                references.append(file_ref)
+        return references
+
+    def _read_events(self, timeout: float) -> List[str]:
+        names = []
+        for mask, name in self._inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                # Eventos perdidos: considera todos os arquivos ainda não renomeados
+                logging.warning("Fila do inotify transbordou; relendo a pasta inteira.")
+                names.extend(self._snapshot())
+            elif name and not mask & (IN_ISDIR | IN_IGNORED) and _is_candidate(name):
+                names.append(name)
+        return names
+
+    def _compare_snapshots(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self.poll_interval))
+        previous = self._sizes
+        self._sizes = self._snapshot()
+        names = []
+        for name, size in self._sizes.items():
+            # Só informa o arquivo quando o tamanho estiver estável entre duas listagens
+            if name not in self._known and previous.get(name) == size:
+                self._known.add(name)
+                names.append(name)
+        # Esquece nomes que sumiram (ex: renomeados), para detectá-los se voltarem
+        self._known.intersection_update(self._sizes)
+        return names
+
+    def _snapshot(self) -> Dict[str, int]:
+        sizes = {}
+        with os.scandir(self.source.path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and _is_candidate(entry.name):
+                        sizes[entry.name] = entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+        return sizes
+
+    def commit(self):
+        """
+        Chamado após cada lote processado. Não há estado a salvar para pastas locais.
+        """
+        pass
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def default_token_path(folder_id: str) -> str:
+    """
+    Retorna o arquivo onde é salvo o token da API de mudanças de uma pasta do Drive.
+    """
+    return utils.state_dir("drive_tokens", f"{folder_id}.json")
+
+
+class DriveChangesWatcher:
+    """
+    Observa uma pasta do Drive pela API de mudanças (changes.list).
+
+    O token da consulta é salvo em disco após cada lote processado; ao
+    reiniciar, o modo watch continua do último token salvo em vez de listar a
+    pasta inteira de novo.
+    """
+
+    def __init__(self, source, poll_interval: float, token_path: Optional[str] = None):
+        """
+        Args:
+            source: A DriveSource observada.
+            poll_interval: Intervalo entre consultas à API, em segundos.
+            token_path: Arquivo do token. Se None, usa default_token_path.
+        """
+        self.source = source
+        self.client = source.drive_client
+        self.poll_interval = poll_interval
+        self.token_path = token_path or default_token_path(source.folder_id)
+        self._folders: Set[str] = {source.folder_id}
+        if source.recursive:
+            self._folders.update(self._list_subfolders(source.folder_id))
+
+        self._token = self._load_token()
+        if self._token is None:
+            self._token = self.client.get_start_page_token()
+            self._save_token()
+            logging.info("Modo watch do Drive iniciado; apenas arquivos novos serão processados.")
+        else:
+            logging.info(f"Continuando do token de mudanças salvo em: {self.token_path}")
+        self._next_poll = 0.0
+
+    def poll(self, timeout: float) -> List[FileReference]:
+        """
+        Consulta as mudanças, se já tiver passado o intervalo desde a última
+        consulta, e retorna as referências dos arquivos novos ou alterados.
+        """
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self._next_poll = time.monotonic() + self.poll_interval
+
+        changes, self._token = self.client.list_changes(self._token, fields=self.source.file_fields)
+        references = []
+        for change in changes:
+            drive_file = change.get('file')
+            if change.get('removed') or not drive_file or drive_file.get('trashed'):
+                continue
+            if not self._folders.intersection(drive_file.get('parents', [])):
+                continue
+            if drive_file.get('mimeType') == FOLDER_MIME_TYPE:
+                if self.source.recursive:
+                    self._folders.add(drive_file['id'])
+                continue
+            if _is_candidate(drive_file['name']):
+                references.append(self.source.reference_for(drive_file))
+        return references
+
+    def _list_subfolders(self, folder_id: str) -> Set[str]:
+        folders: Set[str] = set()
+        pending = [folder_id]
+        while pending:
+            query = f"'{pending.pop()}' in parents and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+            for folder in self.client.iter_files(query=query, fields="id"):
+                if folder['id'] not in folders:
+                    folders.add(folder['id'])
+                    pending.append(folder['id'])
+        return folders
+
+    def _load_token(self) -> Optional[str]:
+        try:
+            with open(self.token_path, encoding="utf-8") as fh:
+                return json.load(fh).get("page_token")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Token de mudanças ilegível em '{self.token_path}' ({e}); começando do estado atual.")
+            return None
+
+    def _save_token(self):
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        temp_path = f"{self.token_path}{TEMP_SUFFIX}"
+        with open(temp_path, "w", encoding="utf-8") as fh:
+            json.dump({"folder_id": self.source.folder_id, "page_token": self._token}, fh)
+        os.replace(temp_path, self.token_path)
+
+    def commit(self):
+        """
+        Salva o token atual. Chamado quando todos os arquivos já consultados
+        foram processados.
+        """
+        self._save_token()
+
+    def close(self):
+        pass
+
+
+class BatchSource(BaseSource):
+    """
+    Expõe um lote de arquivos novos de outra fonte como uma fonte própria,
+    para que cada lote do modo watch passe pelo mesmo process_files de uma
+    execução normal. Os demais atributos (ex: drive_client) são os da fonte
+    original.
+    """
+
+    def __init__(self, source: BaseSource, files: List[FileReference]):
+        self.source = source
+        self.files = files
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def iter_files(self) -> Iterator[FileReference]:
+        return iter(self.files)
+
+    def fetch_all(self, files):
+        return self.source.fetch_all(files)
+
+    def release(self, file_ref: FileReference):
+        self.source.release(file_ref)
+
+    @property
+    def bounded_downloads(self) -> bool:
+        return self.source.bounded_downloads
+
+    def cleanup(self):
+        """
+        Remove apenas as cópias temporárias baixadas para este lote; a fonte
+        original continua aberta para os próximos.
+        """
+        for file_ref in self.files:
+            if file_ref.remote_id:
+                self.source.release(file_ref)
+
+
+def watch(source: BaseSource, handle_batch: Callable[[List[FileReference]], None],
+          debounce: float = 2.0, max_batch: int = 200, poll_interval: float = 15.0,
+          stop: Optional[threading.Event] = None):
+    """
+    Observa a fonte até 'stop' ser sinalizado (ou Ctrl+C), agrupando os
+    arquivos novos em lotes.
+
+    Um lote é processado quando nenhum arquivo novo chega por 'debounce'
+    segundos, ou assim que acumula 'max_batch' arquivos.
+
+    Uma falha na consulta da fonte ou no processamento de um lote (ex: a rede
+    caiu) não encerra a observação: o erro é registrado e a próxima tentativa
+    espera um intervalo crescente. Os arquivos de um lote que falhou continuam
+    pendentes, e o watcher só confirma o progresso (watcher.commit()) quando
+    não resta nenhum arquivo pendente.
+
+    Args:
+        source: Fonte observada (ver BaseSource.watcher).
+        handle_batch: Função que processa um lote de referências.
+        debounce: Tempo de espera sem novidades antes de processar o lote.
+        max_batch: Tamanho máximo de cada lote.
+        poll_interval: Intervalo entre consultas, para fontes sem notificações.
+        stop: Evento que encerra a observação.
+    """
+    stop = stop or threading.Event()
+    watcher = source.watcher(poll_interval)
+    # Chave -> referência; um arquivo gravado em várias etapas entra uma vez só
+    pending: Dict[str, FileReference] = {}
+    last_seen = 0.0
+    backoff = WATCH_INITIAL_BACKOFF
+
+    def wait_after_failure():
+        nonlocal backoff
+        logging.info(f"Nova tentativa em {backoff:g}s.")
+        stop.wait(backoff)
+        backoff = min(backoff * 2, WATCH_MAX_BACKOFF)
+
+    try:
+        logging.info("Modo watch ativo. Pressione Ctrl+C para encerrar.")
+        while not stop.is_set():
+            timeout = debounce if not pending else max(0.0, last_seen + debounce - time.monotonic())
+            try:
+                found = watcher.poll(min(timeout, 1.0))
+            except Exception as e:
+                logging.error(f"Falha ao consultar a fonte por arquivos novos: {e}")
+                wait_after_failure()
+                continue
+            for file_ref in found:
+                pending[file_ref.remote_id or file_ref.local_path] = file_ref
+                last_seen = time.monotonic()
+
+            if pending and (len(pending) >= max_batch or time.monotonic() - last_seen >= debounce):
+                batch = list(pending.values())[:max_batch]
+                logging.info(f"Processando lote de {len(batch)} arquivo(s) novo(s).")
+                try:
+                    handle_batch(batch)
+                except Exception as e:
+                    logging.error(f"Falha ao processar o lote de {len(batch)} arquivo(s); "
+                                      f"eles continuam pendentes: {e}")
+                    wait_after_failure()
+                    continue
+                for file_ref in batch:
+                    pending.pop(file_ref.remote_id or file_ref.local_path, None)
+                backoff = WATCH_INITIAL_BACKOFF
+                if not pending:
+                    try:
+                        watcher.commit()
+                    except OSError as e:
+                        logging.error(f"Não foi possível salvar o progresso do modo watch: {e}")
+    finally:
+        watcher.close()
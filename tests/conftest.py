@@ -0,0 +1,10 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Os módulos do OLAF se importam pelo nome (ex: "import metrics"), como ao rodar src/main.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# O Drive simulado (fake_drive) e o gerador de acervos ficam em benchmarks/
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,79 @@
+# tests/test_drive_metadata_only.py
+
+import sys
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import corpus
+import main
+from fake_drive import FakeDrive, FakeDriveServer
+
+# Datas de captura das fotos servidas pelo Drive simulado, por nome de arquivo.
+CAPTURES = {
+    "IMG_0001.JPG": "2024:05:01 10:00:03",
+    "IMG_0002.JPG": "2024:05:01 10:00:01",
+    "IMG_0003.JPG": "2024:05:01 10:00:02",
+    "IMG_0004.JPG": "2024:05:01 10:00:04",
+}
+
+
+def write_photo(path, date: str):
+    tiff = corpus.build_tiff({}, {corpus.TAG_DATE_TIME_ORIGINAL: date, corpus.TAG_CREATE_DATE: date})
+    path.write_bytes(corpus.build_jpeg(tiff, payload_size=512))
+
+
+@pytest.fixture
+def fake_drive(tmp_path, monkeypatch):
+    folder = tmp_path / "drive"
+    folder.mkdir()
+    for name, date in CAPTURES.items():
+        write_photo(folder / name, date)
+    drive = FakeDrive(str(folder))
+    server = FakeDriveServer(drive, port=0)
+    server.start_background()
+    monkeypatch.setenv("GDRIVE_API_ENDPOINT", server.url)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    yield drive
+    server.shutdown()
+    server.server_close()
+
+
+def hide_capture_time(drive: FakeDrive, name: str):
+    # Simula um arquivo para o qual o Drive não informa imageMediaMetadata.time (ex: um RAW)
+    item_id = next(item_id for item_id, item in drive.items.items() if item["name"] == name)
+    drive.items[item_id].setdefault("_cache", {})["captureTime"] = None
+
+
+def run(monkeypatch, *options: str):
+    monkeypatch.setattr(sys, "argv", ["main.py", "process", "drive", "--folder-id", "root",
+                                      "--no-cache", "--no-journal", *options])
+    main.main()
+
+
+def current_names(drive: FakeDrive):
+    return sorted(item["name"] for item in drive.items.values())
+
+
+def test_metadata_only_renames_without_downloading(fake_drive, monkeypatch):
+    run(monkeypatch, "--metadata-only")
+
+    assert fake_drive.stats["files.get_media"] == 0
+    assert current_names(fake_drive) == [f"2024-05-01_10-00-0{second}.jpg" for second in range(1, 5)]
+
+
+def test_metadata_only_downloads_only_files_without_capture_time(fake_drive, monkeypatch):
+    hide_capture_time(fake_drive, "IMG_0004.JPG")
+    hide_capture_time(fake_drive, "IMG_0002.JPG")
+    run(monkeypatch, "--metadata-only")
+
+    assert fake_drive.stats["files.get_media"] == 2
+    assert current_names(fake_drive) == [f"2024-05-01_10-00-0{second}.jpg" for second in range(1, 5)]
+
+
+def test_without_metadata_only_every_file_is_downloaded(fake_drive, monkeypatch):
+    run(monkeypatch)
+
+    assert fake_drive.stats["files.get_media"] == len(CAPTURES)
+    assert current_names(fake_drive) == [f"2024-05-01_10-00-0{second}.jpg" for second in range(1, 5)]
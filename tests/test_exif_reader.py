@@ -0,0 +1,149 @@
+# tests/test_exif_reader.py
+
+import struct
+
+import pytest
+
+import exif_reader
+from pipeline import PhotoEntry
+from processing_service import CAPTURE_OPTIONAL_TAGS, DATE_TAG, capture_details
+from raw_service import ExifMetadataExtractor
+from sort_service import sort_entries, sort_entries_with_pandas
+
+ASCII, SHORT, LONG, UNDEFINED = 2, 3, 4, 7
+
+
+def ifd(endian: str, entries, offset: int, next_offset: int = 0) -> bytes:
+    """
+    Monta um IFD em 'offset' (relativo à base dos seus offsets). Cada entrada
+    é (tag, tipo, contagem, bytes); valores maiores que 4 bytes são gravados
+    logo depois do IFD.
+    """
+    table = struct.pack(endian + "H", len(entries))
+    data = b""
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    for tag, type_, count, raw in entries:
+        if len(raw) <= 4:
+            table += struct.pack(endian + "HHI", tag, type_, count) + raw.ljust(4, b"\0")
+        else:
+            table += struct.pack(endian + "HHII", tag, type_, count, data_offset + len(data))
+            data += raw + b"\0" * (len(raw) % 2)
+    return table + struct.pack(endian + "I", next_offset) + data
+
+
+def ascii_entry(tag: int, text: str):
+    raw = text.encode("ascii") + b"\0"
+    return tag, ASCII, len(raw), raw
+
+
+def canon_maker_note(endian: str, offset: int, sequence: int) -> bytes:
+    # ShotInfo: valores de 16 bits; a posição 9 é o SequenceNumber
+    shot_info = [0] * 34
+    shot_info[0] = 2 * len(shot_info)
+    shot_info[exif_reader.CANON_SEQUENCE_INDEX] = sequence
+    raw = struct.pack(f"{endian}{len(shot_info)}H", *shot_info)
+    return ifd(endian, [(exif_reader.CANON_SHOT_INFO, SHORT, len(shot_info), raw)], offset)
+
+
+def fujifilm_maker_note(endian: str, offset: int, sequence: int) -> bytes:
+    # Sempre little-endian, com offsets relativos ao início da MakerNote
+    entries = [(0x1100, SHORT, 1, struct.pack("<H", 1)),
+               (exif_reader.FUJIFILM_SEQUENCE_NUMBER, SHORT, 1, struct.pack("<H", sequence))]
+    return exif_reader.FUJIFILM_MAKER_NOTE + struct.pack("<I", 12) + ifd("<", entries, 12)
+
+
+def build_tiff(make: str, date: str, subsec: str, maker_note=None, sequence: int = 0, endian: str = "<") -> bytes:
+    """
+    Monta um TIFF com Make no IFD0 e, no ExifIFD, CreateDate, a fração de
+    segundo e (opcionalmente) a MakerNote da câmera, gravada logo depois.
+    """
+    def pointer(tag: int, type_: int, count: int, offset: int):
+        return tag, type_, count, struct.pack(endian + "I", offset)
+
+    def aligned(offset: int) -> int:
+        return offset + offset % 2
+
+    make_entry = ascii_entry(exif_reader.TAG_MAKE, make)
+    exif_offset = aligned(8 + len(ifd(endian, [make_entry, pointer(exif_reader.TAG_EXIF_IFD, LONG, 1, 0)], 8)))
+    ifd0 = ifd(endian, [make_entry, pointer(exif_reader.TAG_EXIF_IFD, LONG, 1, exif_offset)], 8)
+
+    exif_entries = [ascii_entry(0x9004, date), ascii_entry(0x9292, subsec)]
+    note = b""
+    if maker_note is not None:
+        size = len(maker_note(endian, 0, sequence))
+        note_offset = aligned(exif_offset + len(ifd(endian, exif_entries + [
+            pointer(exif_reader.TAG_MAKER_NOTE, UNDEFINED, size, 0)], exif_offset)))
+        exif_entries.append(pointer(exif_reader.TAG_MAKER_NOTE, UNDEFINED, size, note_offset))
+        note = maker_note(endian, note_offset, sequence)
+    exif = ifd(endian, exif_entries, exif_offset)
+
+    tiff = (b"II" if endian == "<" else b"MM") + struct.pack(endian + "HI", 42, 8) + ifd0
+    tiff += b"\0" * (exif_offset - len(tiff)) + exif
+    if note:
+        tiff += b"\0" * (note_offset - len(tiff)) + note
+    return tiff
+
+
+def build_jpeg(tiff: bytes) -> bytes:
+    app1 = b"Exif\0\0" + tiff
+    return b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9"
+
+
+def read(data: bytes):
+    return exif_reader.read_exif(lambda start, end: data[start:end])
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+def test_reads_canon_sequence_number(endian):
+    record = read(build_jpeg(build_tiff("Canon", "2024:05:01 10:20:30", "25", canon_maker_note, 7, endian)))
+    assert record == {"CreateDate": "2024:05:01 10:20:30", "SubSecTimeDigitized": "25", "SequenceNumber": "7"}
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+def test_reads_fujifilm_sequence_number(endian):
+    record = read(build_jpeg(build_tiff("FUJIFILM", "2024:05:01 10:20:30", "25", fujifilm_maker_note, 3, endian)))
+    assert record["SequenceNumber"] == "3"
+
+
+def test_other_makes_have_no_sequence_number():
+    record = read(build_jpeg(build_tiff("NIKON CORPORATION", "2024:05:01 10:20:30", "25", canon_maker_note, 7)))
+    assert record == {"CreateDate": "2024:05:01 10:20:30", "SubSecTimeDigitized": "25"}
+
+
+def test_broken_maker_note_keeps_dates():
+    data = bytearray(build_jpeg(build_tiff("Canon", "2024:05:01 10:20:30", "25", canon_maker_note, 7)))
+    # Trunca o arquivo no meio do ShotInfo
+    record = read(bytes(data[:-60]))
+    assert record == {"CreateDate": "2024:05:01 10:20:30", "SubSecTimeDigitized": "25"}
+
+
+class NoExifTool:
+    executable = "exiftool"
+
+    def execute(self, *args):
+        raise AssertionError("o leitor rápido deveria bastar")
+
+
+@pytest.mark.parametrize("sort_photos", [sort_entries, sort_entries_with_pandas])
+def test_same_nanosecond_frames_follow_sequence_number(tmp_path, sort_photos):
+    if sort_photos is sort_entries_with_pandas:
+        pytest.importorskip("pandas")
+    # Mesma data e mesma fração de segundo; os nomes estão na ordem inversa da captura
+    frames = {"IMG_0001.JPG": 3, "IMG_0002.JPG": 2, "IMG_0003.JPG": 1}
+    paths = []
+    for name, sequence in frames.items():
+        path = tmp_path / name
+        path.write_bytes(build_jpeg(build_tiff("Canon", "2024:05:01 10:20:30", "250", canon_maker_note, sequence)))
+        paths.append(str(path))
+
+    records = ExifMetadataExtractor.extract_batch(paths, tags=(DATE_TAG,), pool=NoExifTool(),
+                                                  optional_tags=CAPTURE_OPTIONAL_TAGS)
+    photos = []
+    for path in paths:
+        details = capture_details(records[path])
+        photos.append(PhotoEntry(date=records[path][DATE_TAG], local_path=path, name=path.rsplit("/", 1)[1],
+                                 remote_id=None, photographer=None, **details))
+
+    entries = sort_photos(photos, "milliseconds")
+    assert [entry.name for entry in entries] == ["IMG_0003.JPG", "IMG_0002.JPG", "IMG_0001.JPG"]
+    assert {entry.new_name_date for entry in entries} == {"2024-05-01_10-20-30-250"}
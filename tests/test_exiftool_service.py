@@ -0,0 +1,56 @@
+# tests/test_exiftool_service.py
+
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from exiftool_service import ExifToolWorker
+
+# ExifTool simulado no modo -stay_open: antes de cada resposta, escreve no
+# stderr bem mais do que cabe no buffer de um pipe.
+FAKE_EXIFTOOL = textwrap.dedent("""\
+    import sys
+
+    args = []
+    for line in sys.stdin:
+        line = line.rstrip("\\n")
+        if line.startswith("-execute"):
+            echo = args[args.index("-echo4") + 1] if "-echo4" in args else ""
+            sys.stderr.write("Warning: [minor] aviso repetido\\n" * 30000)
+            sys.stderr.flush()
+            sys.stdout.write(f"saida {len(args)}\\n{{ready{line[len('-execute'):]}}}\\n")
+            sys.stdout.flush()
+            sys.stderr.write(echo + "\\n")
+            sys.stderr.flush()
+            args = []
+        elif line == "False" and args[-1:] == ["-stay_open"]:
+            break
+        else:
+            args.append(line)
+""")
+
+
+@pytest.fixture
+def fake_exiftool(tmp_path):
+    script = tmp_path / "exiftool"
+    script.write_text(f"#!{sys.executable}\n{FAKE_EXIFTOOL}")
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_large_stderr_does_not_block_the_worker(fake_exiftool):
+    worker = ExifToolWorker(fake_exiftool)
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(worker.execute("-j", f"/fotos/{index}.jpg")
+                                                            for index in range(3)), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    if thread.is_alive():
+        # O worker travado segura o lock que close() usaria
+        worker._process.kill()
+        pytest.fail("o worker travou com o stderr cheio")
+    worker.close()
+    # Cada comando tem os dois argumentos e o -echo4 com o seu marcador
+    assert results == ["saida 4\n"] * 3
@@ -0,0 +1,128 @@
+# tests/test_sort_service.py
+
+import random
+from datetime import datetime
+
+import pytest
+
+from pipeline import PhotoEntry
+from rename_planner import plan_renames
+from sort_service import INPUT_DATE_FORMAT, NAME_FORMATS, sort_entries, sort_entries_with_pandas
+
+pytest.importorskip("pandas")
+
+INVALID_DATES = [None, "", "0000:00:00 00:00:00", "2023:02:30 10:00:00", "2023:13:01 00:00:00",
+                 "2023:01:01 25:00:00", "2023-01-01 10:00:00", "2023:01:01 10:00:00Z", "lixo"]
+
+
+def photo(index: int, date, subsec=None, offset=None, sequence=None, remote: bool = False,
+          directory: str = "/fotos", photographer=None) -> PhotoEntry:
+    name = f"IMG_{index:05d}.JPG"
+    return PhotoEntry(
+        date=date,
+        local_path=None if remote else f"{directory}/{name}",
+        name=name,
+        remote_id=f"id{index}" if remote else None,
+        photographer=photographer,
+        subsec=subsec,
+        offset=offset,
+        sequence=sequence,
+    )
+
+
+def random_photos(count: int, seed: int):
+    """
+    Fotos sintéticas com datas repetidas, inválidas e ausentes, frações de
+    segundo, fusos e sequências.
+    """
+    rng = random.Random(seed)
+    photos = []
+    for index in range(count):
+        if rng.random() < 0.1:
+            date = rng.choice(INVALID_DATES)
+        else:
+            # Poucas datas distintas para forçar empates na ordenação
+            date = datetime(rng.choice([1999, 2013, 2024]), rng.randint(1, 12), rng.randint(1, 28),
+                            rng.randint(0, 23), rng.randint(0, 59), rng.choice([0, 30])).strftime(INPUT_DATE_FORMAT)
+        photos.append(photo(
+            index, date,
+            subsec=rng.choice([None, "", "5", "05", "50", "125", "999999", 7, "x"]),
+            offset=rng.choice([None, "+02:00", "-03:00", "+0530", "Z"]),
+            sequence=rng.choice([None, 0, 1, 2, "3", "Single"]),
+            remote=rng.random() < 0.5,
+            photographer=rng.choice([None, "Ana", "João Silva"]),
+        ))
+    return photos
+
+
+def assert_same(photos, name_format: str):
+    native = sort_entries(photos, name_format)
+    assert native == sort_entries_with_pandas(photos, name_format)
+    return native
+
+
+@pytest.mark.parametrize("name_format", NAME_FORMATS)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_backends_match_on_random_photos(seed, name_format):
+    photos = random_photos(2000, seed)
+    assert_same(photos, name_format)
+    # Com fusos em todas as fotos, a ordem passa a ser a do instante em UTC
+    assert_same([entry._replace(offset=entry.offset or "-03:00") for entry in photos], name_format)
+
+
+@pytest.mark.parametrize("name_format", NAME_FORMATS)
+def test_invalid_dates_are_dropped_by_both_backends(name_format):
+    photos = [photo(index, date) for index, date in enumerate(INVALID_DATES)]
+    photos.append(photo(len(photos), "2024:05:01 10:20:30"))
+    entries = assert_same(photos, name_format)
+    assert [entry.name for entry in entries] == [photos[-1].name]
+
+
+@pytest.mark.parametrize("name_format", NAME_FORMATS)
+def test_identical_timestamps_keep_input_order(name_format):
+    photos = [photo(index, "2024:05:01 10:20:30", subsec="125") for index in range(5)]
+    entries = assert_same(photos, name_format)
+    assert [entry.name for entry in entries] == [entry.name for entry in photos]
+
+
+def test_subsec_and_sequence_break_ties():
+    photos = [
+        photo(0, "2024:05:01 10:20:30", subsec="5"),
+        photo(1, "2024:05:01 10:20:30", subsec="25", sequence=2),
+        photo(2, "2024:05:01 10:20:30", subsec="25", sequence=1),
+        photo(3, "2024:05:01 10:20:30"),
+    ]
+    entries = assert_same(photos, "milliseconds")
+    assert [entry.name for entry in entries] == ["IMG_00003.JPG", "IMG_00002.JPG", "IMG_00001.JPG", "IMG_00000.JPG"]
+    assert [entry.new_name_date for entry in entries] == [
+        "2024-05-01_10-20-30-000", "2024-05-01_10-20-30-250", "2024-05-01_10-20-30-250", "2024-05-01_10-20-30-500",
+    ]
+
+
+def test_offsets_order_by_utc_only_when_every_photo_has_one():
+    # 10:00 em São Paulo (13:00 UTC) é depois de 12:00 em Lisboa no verão (11:00 UTC)
+    photos = [photo(0, "2024:05:01 10:00:00", offset="-03:00"), photo(1, "2024:05:01 12:00:00", offset="+01:00")]
+    assert [entry.name for entry in assert_same(photos, "seconds")] == ["IMG_00001.JPG", "IMG_00000.JPG"]
+    # Sem fuso em alguma foto, vale o horário local registrado
+    photos.append(photo(2, "2024:05:01 11:00:00"))
+    assert [entry.name for entry in assert_same(photos, "seconds")] == ["IMG_00000.JPG", "IMG_00002.JPG",
+                                                                        "IMG_00001.JPG"]
+
+
+@pytest.mark.parametrize("name_format", NAME_FORMATS)
+def test_collision_suffixes_match(tmp_path, name_format):
+    directory = str(tmp_path)
+    photos = [photo(index, "2024:05:01 10:20:30", subsec=subsec, directory=directory, photographer=photographer)
+              for index, (subsec, photographer) in enumerate([("1", None), ("1", None), ("2", None),
+                                                              ("1", "Ana"), ("1", None)])]
+    for entry in photos:
+        (tmp_path / entry.name).touch()
+
+    def targets(entries):
+        return [step.target.rsplit("/", 1)[1] for step in plan_renames(entries).local_renames]
+
+    native = targets(sort_entries(photos, name_format))
+    assert native == targets(sort_entries_with_pandas(photos, name_format))
+    if name_format == "seconds":
+        assert native == ["2024-05-01_10-20-30.jpg", "2024-05-01_10-20-30_1.jpg", "2024-05-01_10-20-30_Ana.jpg",
+                          "2024-05-01_10-20-30_2.jpg", "2024-05-01_10-20-30_3.jpg"]